@@ -0,0 +1,41 @@
+"""add memory_embeddings for long-term memory retrieval
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+Each row is one user/assistant exchange with its embedding, scoped to a
+(user, avatar) pair. The WebSocket pipeline loads a pair's rows into an
+in-memory NumPy index and injects the top-k matches into each turn instead
+of replaying long histories.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "memory_embeddings",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("avatar_id", sa.String(), sa.ForeignKey("avatars.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("session_id", sa.String(), sa.ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_text", sa.Text(), nullable=False),
+        sa.Column("assistant_text", sa.Text(), nullable=False),
+        sa.Column("embedding", sa.LargeBinary(), nullable=False),
+        sa.Column("embedder", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_memory_user_avatar_created", "memory_embeddings", ["user_id", "avatar_id", "created_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_memory_user_avatar_created", "memory_embeddings")
+    op.drop_table("memory_embeddings")
@@ -0,0 +1,37 @@
+"""add stored_objects manifest for generated-object retention
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+Every generated video chunk is recorded with its session and an expiry, so
+chunks are deleted when their session ends or is deleted, or when they
+expire, instead of accumulating in storage forever.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stored_objects",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("session_id", sa.String(), nullable=True),
+        sa.Column("kind", sa.String(), nullable=False, server_default="video_chunk"),
+        sa.Column("pinned", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_stored_objects_session_id", "stored_objects", ["session_id"])
+    op.create_index("ix_stored_objects_expires_at", "stored_objects", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stored_objects_expires_at", "stored_objects")
+    op.drop_index("ix_stored_objects_session_id", "stored_objects")
+    op.drop_table("stored_objects")
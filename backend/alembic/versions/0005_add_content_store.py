@@ -0,0 +1,44 @@
+"""add content-addressed storage tables
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Uploaded and generated files are stored once per distinct content
+(content_blobs, keyed by SHA-256, reference counted); the per-entity keys
+callers use map onto them through content_refs.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "content_blobs",
+        sa.Column("hash", sa.String(64), primary_key=True),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("stored", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_content_blobs_refcount", "content_blobs", ["refcount"])
+    op.create_table(
+        "content_refs",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("hash", sa.String(64), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_content_refs_hash", "content_refs", ["hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_content_refs_hash", "content_refs")
+    op.drop_table("content_refs")
+    op.drop_index("ix_content_blobs_refcount", "content_blobs")
+    op.drop_table("content_blobs")
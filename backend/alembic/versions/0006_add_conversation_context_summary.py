@@ -0,0 +1,24 @@
+"""add context_summary to conversations
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+Context compaction's rolling summary gets its own column; `summary` stays
+the user-facing summary written by the summarize endpoint.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("conversations", sa.Column("context_summary", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("conversations", "context_summary")
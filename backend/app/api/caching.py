@@ -0,0 +1,90 @@
+"""
+Read-through caching for hot GET endpoints.
+
+The frontend polls the avatar, session and conversation lists, and each
+poll used to be a Postgres query. `@cached_route(group)` caches a route's
+result in `cache_service` (in-process L1 over Redis) keyed by the calling
+user and the route's parameters; mutating endpoints call
+`invalidate_routes(user_id, group, …)` after they commit.
+
+Invalidation bumps a per-user, per-group version that is part of every
+key, so it is O(1) (no key scans) and a result computed before a write can
+only land under the old version, which nobody reads again; old entries
+simply expire after ROUTE_CACHE_TTL_SECS. The TTL also bounds staleness
+for changes made outside the API (direct DB edits). Background writers
+(summary jobs, context compaction) invalidate like the routes do.
+
+Results are cached as plain column values, not response models: the route's
+`response_model` still validates them on every response, so URL signing
+(`_sign_url`) is never served from the cache.
+"""
+
+import functools
+import hashlib
+import json
+import uuid
+from typing import Any, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import inspect as sa_inspect
+
+from app.config import settings
+from app.services.cache import cache_service
+
+# Versions outlive the cached results they guard.
+_VERSION_TTL_SECS = 86400
+# Route parameters that aren't part of the cache key.
+_UNKEYED_PARAMS = ("db", "current_user")
+
+
+def _user_id(current_user) -> str:
+    return current_user.id if current_user else "demo-user"
+
+
+def _version_key(group: str, user_id: str) -> str:
+    return f"routes.{group}:ver:{user_id}"
+
+
+def _plain(result: Any) -> Any:
+    """ORM rows → column dicts, then JSON-compatible values."""
+    if isinstance(result, (list, tuple)):
+        return [_plain(item) for item in result]
+    if hasattr(result, "__table__"):
+        result = {attr.key: getattr(result, attr.key) for attr in sa_inspect(result).mapper.column_attrs}
+    return jsonable_encoder(result)
+
+
+def cached_route(group: str) -> Callable:
+    """Cache a GET route per user and parameters until `group` is invalidated."""
+
+    def decorator(route: Callable) -> Callable:
+        @functools.wraps(route)
+        async def wrapper(*args, **kwargs):
+            if not settings.ROUTE_CACHE_ENABLED:
+                return await route(*args, **kwargs)
+            user_id = _user_id(kwargs.get("current_user"))
+            version = await cache_service.get(_version_key(group, user_id)) or "0"
+            params = json.dumps(
+                {k: v for k, v in kwargs.items() if k not in _UNKEYED_PARAMS}, sort_keys=True, default=str,
+            )
+            digest = hashlib.sha1(params.encode()).hexdigest()[:16]
+            key = f"routes.{group}:{user_id}:{version}:{route.__name__}:{digest}"
+
+            cached = await cache_service.get(key)
+            if cached is not None:
+                return cached
+            result = _plain(await route(*args, **kwargs))
+            await cache_service.set(key, result, ttl=settings.ROUTE_CACHE_TTL_SECS)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate_routes(user_id: Optional[str], *groups: str) -> None:
+    """Drop `user_id`'s cached results for the given route groups."""
+    for group in groups:
+        await cache_service.set(
+            _version_key(group, user_id or "demo-user"), uuid.uuid4().hex[:12], ttl=_VERSION_TTL_SECS,
+        )
@@ -0,0 +1,49 @@
+"""
+`/uploads` behind nginx (UPLOADS_ACCEL_REDIRECT=true).
+
+Serving uploaded images and rendered video chunks through StaticFiles puts
+every byte through the ASGI stack and its middleware. In accel mode this
+route only validates the path and answers with an empty response carrying
+`X-Accel-Redirect`; nginx then streams the file itself from its `internal`
+location (UPLOADS_ACCEL_PREFIX) with sendfile, range requests and ETags.
+Without nginx in front, leave the flag off and the StaticFiles mount in
+main.py serves the directory as before.
+
+This is path validation, not access control: as with the StaticFiles
+mount, anyone who knows a key can fetch it. Keys are unguessable (UUIDs
+and content hashes), and that is the only protection local uploads have.
+"""
+
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Response, status
+
+from app.config import settings
+
+router = APIRouter()
+
+# Top-level directories of the uploads tree that clients may fetch
+# (cas/ holds content-addressed avatar images and video chunks).
+_SERVED_PREFIXES = ("avatars", "videos", "cas")
+
+
+def _servable(key: str) -> bool:
+    parts = key.split("/")
+    return (
+        len(parts) >= 2
+        and parts[0] in _SERVED_PREFIXES
+        and "\\" not in key
+        and all(part not in ("", ".", "..") for part in parts)
+    )
+
+
+@router.api_route("/uploads/{key:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_upload(key: str) -> Response:
+    """Reject keys outside the served directories (or escaping them), then hand the transfer to nginx."""
+    if not _servable(key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return Response(headers={
+        "X-Accel-Redirect": settings.UPLOADS_ACCEL_PREFIX.rstrip("/") + "/" + quote(key),
+        # Keys are never rewritten in place (new renders get new keys).
+        "Cache-Control": f"public, max-age={settings.UPLOADS_CACHE_MAX_AGE_SECS}",
+    })
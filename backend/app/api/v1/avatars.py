@@ -11,8 +11,12 @@ from sqlalchemy import select
 from app.database import get_db
 from app.models import User, Avatar
 from app.schemas import AvatarResponse, AvatarRename, AvatarMetadataUpdate
+from app.services.content_store import content_store
 from app.services.storage import storage_service
 from app.services.avatar_processor import avatar_processor
+from app.services.memory import memory_service
+from app.services.semantic_cache import semantic_cache
+from app.api.caching import cached_route, invalidate_routes
 from app.api.v1.users import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -60,18 +64,21 @@ async def upload_avatar(
             str(temp_orig), str(temp_processed)
         )
 
-        image_key = f"avatars/{avatar_id}/image.jpg"
-        image_url = await storage_service.upload_file(
-            temp_processed.read_bytes(), image_key, content_type="image/jpeg"
+        # Uploaded straight from disk (skipped if the same bytes are already
+        # stored); the temp files are removed below.
+        image_key = await content_store.put_path(
+            str(temp_processed), f"avatars/{avatar_id}/image.jpg", content_type="image/jpeg", move=False
         )
+        image_url = storage_service.get_url(image_key)
 
         thumb_path = Path(metadata.get("thumbnail_path", ""))
-        thumb_key = f"avatars/{avatar_id}/thumbnail.jpg"
-        thumbnail_url = await storage_service.upload_file(
-            thumb_path.read_bytes() if thumb_path.exists() else temp_processed.read_bytes(),
-            thumb_key,
+        thumb_key = await content_store.put_path(
+            str(thumb_path if thumb_path.is_file() else temp_processed),
+            f"avatars/{avatar_id}/thumbnail.jpg",
             content_type="image/jpeg",
+            move=False,
         )
+        thumbnail_url = storage_service.get_url(thumb_key)
 
     except HTTPException:
         raise
@@ -98,12 +105,14 @@ async def upload_avatar(
     db.add(avatar)
     await db.commit()
     await db.refresh(avatar)
+    await invalidate_routes(avatar.user_id, "avatars")
 
     logger.info(f"Avatar created: {avatar_id} for user {_user_id(current_user)}")
     return avatar
 
 
 @router.get("/", response_model=List[AvatarResponse])
+@cached_route("avatars")
 async def list_avatars(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=200),
@@ -123,6 +132,7 @@ async def list_avatars(
 
 
 @router.get("/{avatar_id}", response_model=AvatarResponse)
+@cached_route("avatars")
 async def get_avatar(
     avatar_id: str,
     db: AsyncSession = Depends(get_db),
@@ -162,6 +172,7 @@ async def set_avatar_voice(
         avatar.voice_id = normalized
         await db.commit()
         await db.refresh(avatar)
+        await invalidate_routes(avatar.user_id, "avatars")
         logger.info(f"Avatar {avatar_id} voice set to: {normalized!r}")
         return avatar
     except Exception as e:
@@ -202,6 +213,10 @@ async def update_avatar_metadata(
         avatar.avatar_metadata = existing
         await db.commit()
         await db.refresh(avatar)
+        await invalidate_routes(avatar.user_id, "avatars")
+        # Cached answers were written under the old persona.
+        if "system_prompt" in update_data or update_data.get("semantic_cache") is False:
+            semantic_cache.invalidate(avatar_id)
         logger.info(f"Avatar {avatar_id} metadata updated: {list(update_data.keys())}")
         return avatar
     except Exception as e:
@@ -232,6 +247,7 @@ async def rename_avatar(
         avatar.name = name
         await db.commit()
         await db.refresh(avatar)
+        await invalidate_routes(avatar.user_id, "avatars")
         logger.info(f"Avatar {avatar_id} renamed to: {name!r}")
         return avatar
     except Exception as e:
@@ -255,10 +271,12 @@ async def delete_avatar(
         raise HTTPException(status_code=403, detail="Not authorised to delete this avatar")
 
     try:
-        await storage_service.delete_file(avatar.s3_key)
-        await storage_service.delete_file(avatar.s3_key.replace("image.jpg", "thumbnail.jpg"))
+        await content_store.release([f"avatars/{avatar_id}/image.jpg", f"avatars/{avatar_id}/thumbnail.jpg"])
         await db.delete(avatar)
         await db.commit()
+        await invalidate_routes(avatar.user_id, "avatars")
+        semantic_cache.invalidate(avatar_id)
+        memory_service.forget_avatar(avatar_id)
         logger.info(f"Avatar deleted: {avatar_id}")
     except Exception as e:
         logger.error(f"Failed to delete avatar {avatar_id}: {e}")
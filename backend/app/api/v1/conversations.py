@@ -8,8 +8,9 @@ from pydantic import BaseModel, Field
 
 from app.database import get_db
 from app.models import Conversation, Message, Session, User
-from app.schemas import ConversationResponse
-from app.services.llm import llm_service
+from app.schemas import ConversationResponse, SummaryJobResponse
+from app.services.summaries import enqueue_summary, job_status
+from app.api.caching import cached_route, invalidate_routes
 from app.api.v1.users import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -32,6 +33,7 @@ async def _get_owned_session(session_id: str, uid: str, db: AsyncSession) -> Ses
 
 
 @router.get("/", response_model=List[ConversationResponse])
+@cached_route("conversations")
 async def list_conversations(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
@@ -137,6 +139,7 @@ async def create_conversation(
         db.add(conversation)
         await db.commit()
         await db.refresh(conversation)
+        await invalidate_routes(session.user_id, "conversations")
         logger.info(f"Conversation created: {conversation.id}")
         return conversation
     except HTTPException:
@@ -174,6 +177,7 @@ async def rename_conversation(
         conversation.title = payload.title.strip()
         await db.commit()
         await db.refresh(conversation)
+        await invalidate_routes(_user_id(current_user), "conversations")
         return conversation
     except HTTPException:
         raise
@@ -186,106 +190,99 @@ async def rename_conversation(
         )
 
 
-# Cap raw input length to keep the summary call cheap and within token budget.
-# At ~4 chars/token, 32 kB ≈ 8k input tokens — plenty for a chat summary.
-_SUMMARY_MAX_INPUT_CHARS = 32_000
+async def _get_owned_conversation(conversation_id: str, uid: str, db: AsyncSession) -> Conversation:
+    result = await db.execute(select(Conversation).where(Conversation.id == conversation_id))
+    conversation = result.scalar_one_or_none()
+    if not conversation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+    await _get_owned_session(conversation.session_id, uid, db)
+    return conversation
 
 
-@router.post("/{conversation_id}/summarize", response_model=ConversationResponse)
+@router.post(
+    "/{conversation_id}/summarize",
+    response_model=SummaryJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def summarize_conversation(
     conversation_id: str,
     db: AsyncSession = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user),
 ):
     """
-    Generate a short LLM summary of the conversation and persist it to
-    `Conversation.summary`. Idempotent — calling twice just refreshes.
+    Queue a short LLM summary of the conversation, persisted to
+    `Conversation.summary` by a background job. Returns immediately; poll
+    `GET /{conversation_id}/summarize/{job_id}`. Concurrent requests for
+    the same conversation join the job already in flight.
     """
     try:
-        result = await db.execute(
-            select(Conversation).where(Conversation.id == conversation_id)
-        )
-        conversation = result.scalar_one_or_none()
-        if not conversation:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-
-        await _get_owned_session(conversation.session_id, _user_id(current_user), db)
+        conversation = await _get_owned_conversation(conversation_id, _user_id(current_user), db)
 
-        # Fetch the conversation's messages
-        msgs_result = await db.execute(
-            select(Message)
+        has_messages = await db.execute(
+            select(Message.id)
             .where(Message.session_id == conversation.session_id)
             .where(Message.role.in_(("user", "assistant")))
-            .order_by(Message.created_at)
+            .limit(1)
         )
-        messages = msgs_result.scalars().all()
-        if not messages:
+        if has_messages.scalar_one_or_none() is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Nothing to summarize — conversation has no messages yet",
             )
 
-        # Render as a plain transcript. Keep within input cap to avoid runaway token cost.
-        lines: list[str] = []
-        for m in messages:
-            speaker = "User" if m.role == "user" else "Assistant"
-            lines.append(f"{speaker}: {m.content}")
-        transcript = "\n".join(lines)
-        if len(transcript) > _SUMMARY_MAX_INPUT_CHARS:
-            transcript = transcript[-_SUMMARY_MAX_INPUT_CHARS:]
-            transcript = "[…earlier turns truncated…]\n" + transcript
-
-        summary_prompt = (
-            "Summarize the conversation below in 2–3 short sentences. "
-            "Focus on what was discussed and any conclusions or decisions. "
-            "Write in third person. Do not start with 'This conversation' "
-            "or 'The user'. No preamble.\n\n"
-            f"{transcript}"
+        job = await enqueue_summary(conversation_id)
+        logger.info(
+            f"Summary job {job.job_id} for conversation {conversation_id}"
+            f"{' (coalesced)' if job.coalesced else ''}"
+        )
+        return SummaryJobResponse(
+            job_id=job.job_id,
+            conversation_id=conversation_id,
+            status=job.status,
+            coalesced=job.coalesced,
         )
-        from app.services.llm import LLMRateLimited, LLMAuthError, LLMUnavailable, LLMError
-        try:
-            summary = await llm_service.generate_response(
-                messages=[{"role": "user", "content": summary_prompt}],
-                system_prompt="You write concise neutral summaries.",
-            )
-        except LLMRateLimited:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Summary service rate-limited — try again in a moment",
-            )
-        except LLMAuthError:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Summary service is misconfigured",
-            )
-        except LLMUnavailable:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="Summary service unavailable",
-            )
-        except LLMError as e:
-            logger.error("summarize_failed", extra={"reason": str(e)})
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="Summary service error",
-            )
-
-        conversation.summary = (summary or "").strip()
-        await db.commit()
-        await db.refresh(conversation)
-        logger.info(f"Conversation {conversation_id} summarized ({len(messages)} msgs)")
-        return conversation
     except HTTPException:
         raise
     except Exception as e:
-        await db.rollback()
-        logger.error(f"Failed to summarize conversation: {e}")
+        logger.error(f"Failed to queue conversation summary: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to summarize conversation",
         )
 
 
+@router.get("/{conversation_id}/summarize/{job_id}", response_model=SummaryJobResponse)
+async def get_summary_job(
+    conversation_id: str,
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user),
+):
+    """Status of a summary job; includes the summary once it's done."""
+    try:
+        conversation = await _get_owned_conversation(conversation_id, _user_id(current_user), db)
+        job_state = job_status(job_id)
+        if job_state == "done":
+            await db.refresh(conversation)
+            # A Celery worker can't reach this process's L1, so the poll
+            # that sees the job finish drops the cached lists too.
+            await invalidate_routes(_user_id(current_user), "conversations")
+        return SummaryJobResponse(
+            job_id=job_id,
+            conversation_id=conversation_id,
+            status=job_state,
+            summary=conversation.summary if job_state == "done" else None,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get summary job status: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get summary status",
+        )
+
+
 @router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_conversation(
     conversation_id: str,
@@ -304,6 +301,7 @@ async def delete_conversation(
         await _get_owned_session(conversation.session_id, _user_id(current_user), db)
         await db.delete(conversation)
         await db.commit()
+        await invalidate_routes(_user_id(current_user), "conversations")
         logger.info(f"Conversation deleted: {conversation_id}")
     except HTTPException:
         raise
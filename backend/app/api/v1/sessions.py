@@ -9,8 +9,10 @@ import logging
 
 from app.database import get_db
 from app.models import Session, Avatar, Message, User
+from app.services.retention import retention_service
 from app.schemas import SessionCreate, SessionResponse
 from app.websocket import websocket_manager
+from app.api.caching import cached_route, invalidate_routes
 from app.api.v1.users import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -53,6 +55,7 @@ async def create_session(
         db.add(session)
         await db.commit()
         await db.refresh(session)
+        await invalidate_routes(uid, "sessions")
 
         logger.info(f"Session created: {session.id} (user={uid})")
         return session
@@ -65,6 +68,7 @@ async def create_session(
 
 
 @router.get("/", response_model=List[SessionResponse])
+@cached_route("sessions")
 async def list_sessions(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
@@ -133,8 +137,10 @@ async def end_session(
 
         await db.commit()
         await db.refresh(session)
+        await invalidate_routes(session.user_id, "sessions")
 
         await websocket_manager.disconnect(session_id)
+        retention_service.release_session_later(session_id)
 
         logger.info(f"Session ended: {session_id}")
         return session
@@ -239,6 +245,8 @@ async def delete_session(
 
         await db.delete(session)
         await db.commit()
+        await invalidate_routes(session.user_id, "sessions", "conversations")
+        retention_service.release_session_later(session_id)
         logger.info(f"Session deleted: {session_id}")
 
     except HTTPException:
@@ -22,8 +22,11 @@ import io
 
 from sqlalchemy import select, update
 
+from app.api.caching import invalidate_routes
 from app.api.v1.users import get_current_user
 from app.models import User
+from app.services.cache import cache_service
+from app.services.executors import storage_executor
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +75,14 @@ async def _save_index(data: list[dict]) -> None:
         tmp = VOICE_INDEX.with_suffix(".tmp")
         tmp.write_text(json.dumps(data, indent=2, default=str))
         tmp.replace(VOICE_INDEX)
+    # Voice lookups by id are cached (see websocket._get_voice_entry).
+    await cache_service.delete_pattern("voices:*")
+
+
+def _reencode_wav(audio_bytes: bytes, wav_path: Path) -> None:
+    """Decode with soundfile (WAV, FLAC, OGG) and write a clean WAV. Blocking."""
+    data, samplerate = sf.read(io.BytesIO(audio_bytes))
+    sf.write(str(wav_path), data, samplerate)
 
 
 def _owned(entry: dict, uid: str) -> bool:
@@ -116,16 +127,14 @@ async def clone_voice(
 
         # Try reading with soundfile (handles WAV, FLAC, OGG)
         try:
-            buf = io.BytesIO(audio_bytes)
-            data, samplerate = sf.read(buf)
-            sf.write(str(wav_path), data, samplerate)
+            await storage_executor.run(_reencode_wav, audio_bytes, wav_path)
         except Exception as sf_err:
             logger.debug(f"soundfile could not read audio, falling back to ffmpeg: {sf_err}")
             # Fallback: save raw bytes and let ffmpeg handle conversion
             raw_path = VOICE_DIR / f"{voice_id}_raw"
-            raw_path.write_bytes(audio_bytes)
+            await storage_executor.run(raw_path.write_bytes, audio_bytes)
             try:
-                await asyncio.to_thread(
+                await storage_executor.run(
                     subprocess.run,
                     # 24kHz mono — matches Chatterbox's recommended reference format
                     ["ffmpeg", "-y", "-i", str(raw_path), "-ar", "24000", "-ac", "1", str(wav_path)],
@@ -332,6 +341,9 @@ async def delete_voice(
         from app.database import AsyncSessionLocal
         from app.models import Avatar
         async with AsyncSessionLocal() as db:
+            owners = (await db.execute(
+                select(Avatar.user_id).where(Avatar.voice_id == voice_id).distinct()
+            )).scalars().all()
             result = await db.execute(
                 update(Avatar)
                 .where(Avatar.voice_id == voice_id)
@@ -339,6 +351,8 @@ async def delete_voice(
             )
             cleared = result.rowcount or 0
             await db.commit()
+        for owner in owners:
+            await invalidate_routes(owner, "avatars")
     except Exception as e:
         logger.warning(f"Could not clear avatar voice references for {voice_id}: {e}")
 
@@ -29,6 +29,10 @@ celery_app.conf.update(
             'task': 'cleanup_old_files',
             'schedule': crontab(hour=3, minute=0),  # Run daily at 3 AM
         },
+        'expire-generated-objects': {
+            'task': 'expire_generated_objects',
+            'schedule': float(settings.RETENTION_SWEEP_SECS),
+        },
     },
 )
 
@@ -78,8 +82,13 @@ def generate_video_task(self, session_id: str, text: str, avatar_image_path: str
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
 
-        # Generate speech audio
+        # Generate speech audio. Offline work can wait for the primary model
+        # rather than falling back while it loads.
         audio_path = tempfile.mktemp(suffix='.wav')
+        try:
+            loop.run_until_complete(tts_service.initialize())
+        except Exception as e:
+            logger.warning(f"TTS model unavailable, falling back: {e}")
         loop.run_until_complete(tts_service.synthesize(text, audio_path))
 
         # Generate animation
@@ -105,6 +114,59 @@ def generate_video_task(self, session_id: str, text: str, avatar_image_path: str
         raise self.retry(exc=e, countdown=30 * (self.request.retries + 1))
 
 
+_worker_loop = None
+
+
+def _run_async(coro):
+    """
+    Run a coroutine on this worker process's long-lived event loop. Pooled
+    clients (DB engine, LLM HTTP client) bind to the loop they were first
+    used on, so a fresh loop per task would strand their connections.
+    """
+    import asyncio
+
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+
+@celery_app.task(name="summarize_conversation", bind=True, max_retries=2)
+def summarize_conversation_task(self, conversation_id: str):
+    """Summarize a conversation's transcript tail (coalesced per conversation)."""
+    from app.services.llm import LLMRateLimited
+    from app.services.summaries import release_job, summarize_conversation
+
+    try:
+        summary = _run_async(summarize_conversation(conversation_id))
+    except LLMRateLimited as e:
+        if self.request.retries < self.max_retries:
+            # Keep the coalescing key: the retry is still the in-flight job.
+            raise self.retry(exc=e, countdown=e.retry_after or 30 * (self.request.retries + 1))
+        release_job(conversation_id, self.request.id)
+        raise
+    except Exception as e:
+        logger.error(f"Failed to summarize conversation {conversation_id}: {e}")
+        release_job(conversation_id, self.request.id)
+        raise
+    release_job(conversation_id, self.request.id)
+    return {"conversation_id": conversation_id, "summarized": summary is not None, "status": "completed"}
+
+
+@celery_app.task(name="expire_generated_objects")
+def expire_generated_objects_task():
+    """Delete generated video chunks (and their manifest rows) past their expiry."""
+    from app.services.retention import retention_service
+
+    try:
+        deleted = _run_async(retention_service.expire())
+    except Exception as e:
+        logger.error(f"Expiring generated objects failed: {e}")
+        raise
+    return {"deleted": deleted}
+
+
 @celery_app.task(name="cleanup_old_files")
 def cleanup_old_files_task():
     """Background task to cleanup old temporary files older than 24 hours"""
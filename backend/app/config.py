@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import model_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 import os
 
@@ -30,10 +30,27 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    # In-process L1 in front of Redis (app/services/cache.py); replicas drop
+    # entries written elsewhere via pub/sub on CACHE_INVALIDATION_CHANNEL.
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_MAX_BYTES: int = 33554432  # 32 MiB of serialized values
+    CACHE_L1_TTL_SECS: int = 30
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    # Read-through caching of hot list/get endpoints (app/api/caching.py),
+    # invalidated by the mutating endpoints.
+    ROUTE_CACHE_ENABLED: bool = True
+    ROUTE_CACHE_TTL_SECS: int = 60
     
     # Storage — local by default; set USE_LOCAL_STORAGE=false to use S3
     USE_LOCAL_STORAGE: bool = True
     LOCAL_STORAGE_PATH: str = "uploads"
+    # Behind nginx: /uploads requests are authorized by the app and the
+    # bytes served by nginx (X-Accel-Redirect to this internal location).
+    # Off, the app serves the directory itself (development).
+    UPLOADS_ACCEL_REDIRECT: bool = False
+    UPLOADS_ACCEL_PREFIX: str = "/_uploads/"
+    UPLOADS_CACHE_MAX_AGE_SECS: int = 86400
 
     # AWS (only needed when USE_LOCAL_STORAGE=false)
     AWS_ACCESS_KEY_ID: str = ""
@@ -41,6 +58,44 @@ class Settings(BaseSettings):
     AWS_REGION: str = "us-east-1"
     S3_BUCKET_NAME: str = "avatar-system-storage"
     CLOUDFRONT_DOMAIN: Optional[str] = None
+    # S3-compatible endpoint (MinIO, LocalStack); empty = AWS
+    S3_ENDPOINT_URL: str = ""
+    # Shared S3 client: pooled keep-alive connections reused across calls
+    S3_MAX_POOL_CONNECTIONS: int = 50
+    S3_KEEPALIVE_SECS: int = 60
+    S3_CONNECT_TIMEOUT_SECS: float = 5.0
+    S3_READ_TIMEOUT_SECS: float = 60.0
+    # Uploads at/above the threshold go multipart, PART bytes at a time with
+    # up to CONCURRENCY parts in flight (S3 needs parts of at least 5 MiB).
+    S3_MULTIPART_THRESHOLD_BYTES: int = 16 * 1024 * 1024
+    S3_MULTIPART_PART_BYTES: int = 8 * 1024 * 1024
+    S3_MULTIPART_CONCURRENCY: int = 4
+    # URLs handed to clients are presigned (unless served via CloudFront).
+    # Signatures are reused within a window, so a URL is valid for
+    # TTL..TTL+WINDOW seconds.
+    S3_PRESIGN_URLS: bool = True
+    S3_PRESIGN_TTL_SECS: int = 3600
+    S3_PRESIGN_WINDOW_SECS: int = 300
+    # Write-behind (S3 only): serve rendered chunks from this node's /uploads
+    # right away and copy them to S3 in the background, with retries.
+    STORAGE_WRITE_BEHIND: bool = False
+    WRITE_BEHIND_CONCURRENCY: int = 4
+    WRITE_BEHIND_MAX_ATTEMPTS: int = 5
+    WRITE_BEHIND_RETRY_BASE_SECS: float = 1.0
+    # Local copies outlive the upload so clients mid-playback aren't cut off.
+    WRITE_BEHIND_LOCAL_RETENTION_SECS: int = 300
+    WRITE_BEHIND_DRAIN_SECS: float = 20.0
+    # Store avatar images and video chunks once per distinct content (SHA-256
+    # keyed, reference counted; see app/services/content_store.py).
+    CONTENT_ADDRESSED_STORAGE: bool = True
+    # Generated video chunks are recorded per session and deleted when the
+    # session ends or is deleted, or after VIDEO_CHUNK_TTL_SECS at the
+    # latest; chunks the semantic cache replays are kept for
+    # SEMANTIC_CACHE_CHUNK_TTL_SECS instead. Expired ones are swept every
+    # RETENTION_SWEEP_SECS by the Celery beat task.
+    VIDEO_CHUNK_TTL_SECS: int = 86400
+    SEMANTIC_CACHE_CHUNK_TTL_SECS: int = 604800
+    RETENTION_SWEEP_SECS: int = 900
     
     # API Keys
     ANTHROPIC_API_KEY: str = ""
@@ -51,10 +106,83 @@ class Settings(BaseSettings):
     # Anthropic models (2026): claude-opus-4-7 (most capable), claude-sonnet-4-6
     # (balanced — current default), claude-haiku-4-5 (fastest). OpenAI users
     # should override LLM_MODEL via .env (e.g. gpt-4o, gpt-4o-mini).
-    LLM_PROVIDER: str = "anthropic"  # anthropic, openai
+    LLM_PROVIDER: str = "anthropic"  # anthropic, openai, fake (offline load testing)
     LLM_MODEL: str = "claude-sonnet-4-6"
     LLM_TEMPERATURE: float = 0.7
     LLM_MAX_TOKENS: int = 2000
+    # Context compaction: once a session holds more than COMPACT_AFTER raw
+    # messages, everything but the newest RECENT_MESSAGES is folded into a
+    # rolling summary (Conversation.context_summary) in the background.
+    LLM_CONTEXT_COMPACTION_ENABLED: bool = True
+    LLM_CONTEXT_RECENT_MESSAGES: int = 12
+    LLM_CONTEXT_COMPACT_AFTER: int = 20
+    # Input-token budget for the history sent each turn (system prompt and
+    # summary included). Per-model/provider overrides as JSON, e.g.
+    # LLM_CONTEXT_TOKEN_BUDGETS='{"claude-haiku-4-5": 4000, "openai": 6000}'.
+    LLM_CONTEXT_TOKEN_BUDGET: int = 8000
+    LLM_CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {}
+    # Warm the Anthropic prompt cache for an avatar's system prompt when a
+    # session connects, so the first turn reads instead of writes. Skipped for
+    # prompts below the model's minimum cacheable length; deduplicated per
+    # prompt for a little under the 5-minute ephemeral cache TTL.
+    LLM_PREWARM_ENABLED: bool = True
+    LLM_PREWARM_MIN_TOKENS: int = 1024
+    LLM_PROMPT_CACHE_TTL_SECS: int = 240
+    # Hedged streaming: if the primary hasn't produced a first token within
+    # LLM_HEDGE_TTFT_SECS, the secondary (same provider unless overridden) is
+    # started too and whichever streams first wins. Unset LLM_SECONDARY_MODEL
+    # disables the secondary; TTFT <= 0 keeps it as a failure-only fallback.
+    LLM_SECONDARY_PROVIDER: str = ""
+    LLM_SECONDARY_MODEL: str = ""
+    LLM_HEDGE_TTFT_SECS: float = 2.5
+    # Circuit breaker: after this many consecutive unavailable/rate-limited
+    # errors a provider is skipped for the cooldown, then probed again.
+    LLM_BREAKER_FAILURES: int = 3
+    LLM_BREAKER_COOLDOWN_SECS: float = 30.0
+    # Admission control, per provider: open streams are capped, and input
+    # tokens/minute are budgeted (0 = learn the limit from rate-limit
+    # response headers). 429s before the first token are retried with
+    # jittered backoff; waiting longer than the timeout raises LLMRateLimited.
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_TOKENS_PER_MINUTE: int = 0
+    LLM_RATE_LIMIT_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY_SECS: float = 0.5
+    LLM_ADMISSION_TIMEOUT_SECS: float = 30.0
+    # LLM_PROVIDER=fake — offline stand-in for load/latency tests. Streams a
+    # deterministic echo (or LLM_FAKE_SCRIPT replies, in order) at a chosen
+    # TTFT and token rate, with optional jitter and injected failures.
+    LLM_FAKE_TTFT_MS: int = 300
+    LLM_FAKE_TOKENS_PER_SEC: float = 40.0
+    LLM_FAKE_JITTER: float = 0.2
+    LLM_FAKE_ERROR_RATE: float = 0.0
+    LLM_FAKE_ERROR: str = "unavailable"  # unavailable | rate_limited
+    LLM_FAKE_SCRIPT: str = ""
+    LLM_FAKE_RESPONSE_WORDS: int = 40
+    LLM_FAKE_SEED: Optional[int] = None
+
+    # Semantic response cache — opt-in per avatar (avatar_metadata
+    # "semantic_cache": true). Questions whose embedding is at least
+    # SEMANTIC_CACHE_THRESHOLD cosine-similar to a cached one are answered
+    # from the cache, skipping the LLM (and TTS/animation when the stored
+    # chunks match the session's voice and language).
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 500  # per avatar
+    # sentence-transformers model. If it can't be loaded, embeddings fall back
+    # to hashed n-grams and the semantic cache stays off (logged once).
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+
+    # Long-term memory — past exchanges with an avatar are embedded and the
+    # top-k most relevant are injected into each turn. While enabled and
+    # EMBEDDING_MODEL is available, only the recent window
+    # (LLM_CONTEXT_RECENT_MESSAGES) is rehydrated on connect, so prompts stay
+    # constant-size however long the history is. Without a model, memory is
+    # off and the full window is rehydrated.
+    MEMORY_ENABLED: bool = True
+    MEMORY_TOP_K: int = 4
+    MEMORY_MIN_SIMILARITY: float = 0.25
+    MEMORY_MAX_ENTRIES: int = 5000  # per user/avatar pair, newest kept
+    MEMORY_SNIPPET_CHARS: int = 300
     
     # Avatar Engine
     AVATAR_ENGINE: str = "musetalk"  # musetalk, simple
@@ -67,12 +195,49 @@ class Settings(BaseSettings):
     # only ~1% lower WER than large-v3. Falls back to base/small if VRAM is tight.
     STT_PROVIDER: str = "whisper"  # whisper, google, azure
     WHISPER_MODEL: str = "large-v3-turbo"  # tiny, base, small, medium, large-v3, large-v3-turbo
+    # Batched mode: clips arriving within the window are decoded together via
+    # faster-whisper's BatchedInferencePipeline (higher throughput at peak).
+    STT_BATCH_ENABLED: bool = False
+    STT_BATCH_WINDOW_MS: int = 50
+    STT_BATCH_MAX_SIZE: int = 8
+    # beam | greedy | auto — auto switches to greedy once this many clips are
+    # being decoded at once.
+    STT_DECODE_POLICY: str = "auto"
+    STT_GREEDY_LOAD_THRESHOLD: int = 4
+    # Decoding profile: accuracy | latency | auto. "latency" decodes greedily
+    # with a shorter VAD silence window and sends short clips to the smaller
+    # WHISPER_FAST_MODEL; "auto" picks latency once the greedy threshold is hit.
+    # Sessions can override this over the WebSocket (set_stt_profile).
+    STT_PROFILE: str = "auto"
+    WHISPER_FAST_MODEL: str = "base"  # empty = always use WHISPER_MODEL
+    STT_SHORT_CLIP_SECS: float = 6.0
+    STT_LATENCY_VAD_SILENCE_MS: int = 250
+    # When a session has no language set, the first utterance's detected
+    # language is pinned for the rest of the session if Whisper is at least
+    # this confident.
+    STT_LANGUAGE_PIN_MIN_PROB: float = 0.5
     
     # TTS Configuration
     # chatterbox: Resemble AI's open-source SOTA TTS (default, voice cloning + 23 langs)
     TTS_PROVIDER: str = "chatterbox"
+    # Fast engine raced against the primary once it misses the deadline
+    # (empty string disables the secondary entirely). 0 = failure-only fallback.
+    TTS_SECONDARY_PROVIDER: str = "gtts"
+    TTS_HEDGE_DEADLINE_SECS: float = 4.0
     TTS_VOICE: str = "default"
     
+    # Worker pools — one bounded thread pool per pipeline stage so a burst of
+    # STT jobs can't starve TTS. Keep STT+TTS workers × torch threads at or
+    # below the physical core count on CPU-only deployments.
+    STT_EXECUTOR_WORKERS: int = 2
+    TTS_EXECUTOR_WORKERS: int = 2
+    # gTTS is network-bound; its own pool keeps the hedge from queueing
+    # behind Chatterbox jobs that are still holding TTS workers.
+    GTTS_EXECUTOR_WORKERS: int = 4
+    STORAGE_EXECUTOR_WORKERS: int = 8
+    IMAGE_EXECUTOR_WORKERS: int = 2
+    EMBEDDING_EXECUTOR_WORKERS: int = 1
+
     # Security
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
     JWT_SECRET_KEY: str
@@ -91,6 +256,12 @@ class Settings(BaseSettings):
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+
+    # Conversation summaries (Celery job). Only the newest
+    # SUMMARY_MAX_INPUT_CHARS of transcript are read (~4 chars/token).
+    SUMMARY_MAX_INPUT_CHARS: int = 32_000
+    # Backstop expiry of the per-conversation in-flight job key.
+    SUMMARY_JOB_TTL_SECS: int = 300
     
     # File Upload
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, JSON, Float, Index
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, JSON, Float, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -111,6 +111,73 @@ class Conversation(Base):
     session_id = Column(String, ForeignKey("sessions.id"), nullable=False, index=True)
     title = Column(String, nullable=True)
     summary = Column(Text, nullable=True)
+    # Rolling summary of the turns context compaction has folded away; only
+    # the LLM sees it. `summary` is the user-facing one.
+    context_summary = Column(Text, nullable=True)
     message_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class MemoryEmbedding(Base):
+    """One user/assistant exchange embedded for long-term memory retrieval."""
+    __tablename__ = "memory_embeddings"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    avatar_id = Column(String, ForeignKey("avatars.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    user_text = Column(Text, nullable=False)
+    assistant_text = Column(Text, nullable=False)
+    # float32 unit vector, row-major bytes; `embedder` names the model that
+    # produced it so a model change triggers re-embedding instead of garbage.
+    embedding = Column(LargeBinary, nullable=False)
+    embedder = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Index load: `WHERE user_id=? AND avatar_id=? ORDER BY created_at DESC`
+        Index("ix_memory_user_avatar_created", "user_id", "avatar_id", "created_at"),
+    )
+
+
+class StoredObject(Base):
+    """
+    Manifest entry for a generated storage object (video chunks), so it can
+    be expired or deleted with its session. No FK to sessions: the rows must
+    outlive a deleted session until its objects are gone.
+    """
+    __tablename__ = "stored_objects"
+
+    key = Column(String, primary_key=True)
+    session_id = Column(String, nullable=True, index=True)
+    kind = Column(String, nullable=False, default="video_chunk")
+    # Referenced by the semantic cache: kept past session end, until expiry.
+    pinned = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class ContentBlob(Base):
+    """
+    One stored copy of some bytes, keyed by their SHA-256. `refcount` counts
+    the content_refs pointing at it; -1 marks a blob being deleted.
+    """
+    __tablename__ = "content_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    key = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0, index=True)
+    # False until the bytes are known to be in storage.
+    stored = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ContentRef(Base):
+    """Logical key (e.g. avatars/{id}/image.jpg) → content blob."""
+    __tablename__ = "content_refs"
+
+    key = Column(String, primary_key=True)
+    hash = Column(String(64), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
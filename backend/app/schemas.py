@@ -1,8 +1,14 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from typing import Optional, Dict, Any
 from datetime import datetime
 
 
+def _sign_url(url: Optional[str]) -> Optional[str]:
+    """Stored object URL → the (presigned) URL a client may fetch."""
+    from app.services.storage import storage_service
+    return storage_service.sign_url(url)
+
+
 # User Schemas
 class UserBase(BaseModel):
     email: EmailStr
@@ -46,6 +52,12 @@ class AvatarResponse(AvatarBase):
 
     model_config = {"from_attributes": True, "populate_by_name": True}
 
+    @model_validator(mode="after")
+    def _signed_urls(self):
+        self.image_url = _sign_url(self.image_url)
+        self.thumbnail_url = _sign_url(self.thumbnail_url)
+        return self
+
 
 # Session Schemas
 class SessionCreate(BaseModel):
@@ -86,6 +98,18 @@ class MessageResponse(MessageBase):
 
     model_config = {"from_attributes": True, "populate_by_name": True}
 
+    @model_validator(mode="after")
+    def _signed_urls(self):
+        self.audio_url = _sign_url(self.audio_url)
+        self.video_url = _sign_url(self.video_url)
+        chunks = (self.message_metadata or {}).get("video_chunks")
+        if chunks:
+            self.message_metadata = {
+                **self.message_metadata,
+                "video_chunks": [{**c, "video_url": _sign_url(c.get("video_url"))} for c in chunks],
+            }
+        return self
+
 
 # Conversation Schemas
 class ConversationResponse(BaseModel):
@@ -100,6 +124,16 @@ class ConversationResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class SummaryJobResponse(BaseModel):
+    """Status of a background conversation-summary job."""
+    job_id: str
+    conversation_id: str
+    status: str  # queued | running | done | failed | unknown
+    # True when this request joined a job that was already in flight.
+    coalesced: bool = False
+    summary: Optional[str] = None
+
+
 class AvatarRename(BaseModel):
     name: str = Field(..., min_length=1, max_length=200)
 
@@ -115,6 +149,8 @@ class AvatarMetadataUpdate(BaseModel):
     personality: Optional[str] = Field(default=None, max_length=2000)
     background_color: Optional[str] = Field(default=None, max_length=32)
     animation_style: Optional[str] = Field(default=None, max_length=32)
+    # Opt in to the semantic response cache (FAQ/kiosk avatars).
+    semantic_cache: Optional[bool] = None
 
     model_config = {"extra": "forbid"}
 
@@ -6,6 +6,7 @@ import asyncio
 from pathlib import Path
 from typing import Optional, Tuple
 from app.config import settings
+from app.services.executors import image_executor
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +32,11 @@ class AvatarProcessor:
         Returns:
             Tuple of (output_path, metadata)
         """
+        # OpenCV/Pillow work is CPU-bound — keep it off the event loop and
+        # on its own pool so uploads can't starve STT/TTS workers.
+        return await image_executor.run(self._process_image_sync, image_path, output_path)
+
+    def _process_image_sync(self, image_path: str, output_path: str) -> Tuple[str, dict]:
         try:
             logger.info(f"Processing avatar image: {image_path}")
             
@@ -45,7 +51,7 @@ class AvatarProcessor:
             orig_width, orig_height = image.size
             
             # Detect face and crop
-            face_box = await self._detect_face(np.array(image))
+            face_box = self._detect_face(np.array(image))
             
             if face_box:
                 x, y, w, h = face_box
@@ -71,7 +77,7 @@ class AvatarProcessor:
             image = image.resize((self.resolution, self.resolution), Image.Resampling.LANCZOS)
             
             # Enhance image
-            image = await self._enhance_image(image)
+            image = self._enhance_image(image)
             
             # Save processed image
             Path(output_path).parent.mkdir(parents=True, exist_ok=True)
@@ -97,7 +103,7 @@ class AvatarProcessor:
             logger.error(f"Failed to process avatar image: {e}")
             raise
     
-    async def _detect_face(self, image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    def _detect_face(self, image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
         """Detect face in image using OpenCV"""
         try:
             # Load face cascade
@@ -126,7 +132,7 @@ class AvatarProcessor:
             logger.warning(f"Face detection error: {e}")
             return None
     
-    async def _enhance_image(self, image: Image.Image) -> Image.Image:
+    def _enhance_image(self, image: Image.Image) -> Image.Image:
         """Enhance image quality"""
         try:
             from PIL import ImageEnhance
@@ -152,6 +158,14 @@ class AvatarProcessor:
         size: Tuple[int, int] = (256, 256)
     ) -> str:
         """Create thumbnail from image"""
+        return await image_executor.run(self._create_thumbnail_sync, image_path, thumbnail_path, size)
+
+    def _create_thumbnail_sync(
+        self,
+        image_path: str,
+        thumbnail_path: str,
+        size: Tuple[int, int],
+    ) -> str:
         try:
             image = Image.open(image_path)
             image.thumbnail(size, Image.Resampling.LANCZOS)
@@ -1,13 +1,100 @@
+"""
+Two-tier cache: an in-process LRU (L1) in front of Redis (L2).
+
+`get()` answers from L1 when it can — no network round trip and no JSON
+decode — and otherwise reads Redis and keeps the decoded value in L1 for
+up to CACHE_L1_TTL_SECS. L1 is bounded by entry count and by the size of
+the serialized values (CACHE_L1_MAX_ENTRIES / CACHE_L1_MAX_BYTES).
+
+Writes (`set`, `delete`, `delete_pattern`) update Redis and publish the
+affected keys on CACHE_INVALIDATION_CHANNEL; every replica subscribes and
+drops those keys from its L1, so a write on one node isn't served stale by
+another. If the subscription drops, L1 is cleared (messages may have been
+missed) and the subscriber reconnects; the L1 TTL bounds staleness if an
+invalidation is lost anyway. Without Redis, L1 alone serves this process.
+
+Keys are `namespace:rest`; lookups are counted per namespace in
+`cache_lookups_total{namespace,result}` (l1_hit, l2_hit, miss). Cached
+values are shared between callers: treat them as read-only.
+"""
+
+import asyncio
+import fnmatch
 import json
 import logging
-from typing import Any, Optional
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
 
 import redis.asyncio as aioredis
+from prometheus_client import Counter, Gauge
 
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by key namespace and result", ["namespace", "result"]
+)
+CACHE_L1_ENTRIES = Gauge("cache_l1_entries", "Entries in the in-process cache tier")
+CACHE_INVALIDATIONS_RECEIVED = Counter(
+    "cache_invalidations_received_total", "Invalidation messages applied from other replicas"
+)
+
+
+def _namespace(key: str) -> str:
+    return key.split(":", 1)[0] if ":" in key else "default"
+
+
+class _LocalTier:
+    """LRU of decoded values with per-entry expiry, bounded by count and bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            self.discard(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[2]
+
+    def put(self, key: str, value: Any, size: int, ttl: float) -> None:
+        self.discard(key)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+        CACHE_L1_ENTRIES.set(len(self._entries))
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+            CACHE_L1_ENTRIES.set(len(self._entries))
+
+    def discard_matching(self, pattern: str) -> None:
+        for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+            self.discard(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        CACHE_L1_ENTRIES.set(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class CacheService:
     """Redis-based caching service for API responses and frequently accessed data."""
@@ -15,6 +102,13 @@ class CacheService:
     def __init__(self):
         self.redis: Optional[aioredis.Redis] = None
         self.default_ttl = 300  # 5 minutes
+        self.local = _LocalTier(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_MAX_BYTES)
+        # Identifies this process's own invalidation messages.
+        self._origin = uuid.uuid4().hex
+        # Bumped on every invalidation, so a Redis read that raced one isn't
+        # put back into L1.
+        self._generation = 0
+        self._listener: Optional[asyncio.Task] = None
 
     async def initialize(self):
         """Initialize Redis connection."""
@@ -29,27 +123,60 @@ class CacheService:
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             self.redis = None
+            return
+        self._start_listener()
+
+    def _l1_ttl(self, ttl: Optional[int]) -> float:
+        if not settings.CACHE_L1_ENABLED:
+            return 0
+        return min(settings.CACHE_L1_TTL_SECS, ttl or self.default_ttl)
 
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
+        namespace = _namespace(key)
+        found, value = self.local.get(key)
+        if found:
+            CACHE_LOOKUPS.labels(namespace, "l1_hit").inc()
+            return value
         if not self.redis:
+            CACHE_LOOKUPS.labels(namespace, "miss").inc()
             return None
+        generation = self._generation
         try:
-            value = await self.redis.get(key)
-            if value:
-                return json.loads(value)
-            return None
+            raw = await self.redis.get(key)
         except Exception as e:
             logger.warning(f"Cache get error for key={key}: {e}")
             return None
+        if not raw:
+            CACHE_LOOKUPS.labels(namespace, "miss").inc()
+            return None
+        CACHE_LOOKUPS.labels(namespace, "l2_hit").inc()
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"Cache get error for key={key}: {e}")
+            return None
+        if generation == self._generation:
+            self.local.put(key, value, len(raw), self._l1_ttl(None))
+        return value
 
     async def set(self, key: str, value: Any, ttl: int = None) -> bool:
         """Set value in cache with TTL."""
+        try:
+            serialized = json.dumps(value, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Cache set error for key={key}: {e}")
+            return False
+        # A get already reading the old value from Redis must not cache it
+        # over this one.
+        self._generation += 1
+        # Cache the decoded form, so an L1 hit returns what an L2 hit would.
+        self.local.put(key, json.loads(serialized), len(serialized), self._l1_ttl(ttl))
         if not self.redis:
             return False
         try:
-            serialized = json.dumps(value, default=str)
             await self.redis.set(key, serialized, ex=ttl or self.default_ttl)
+            await self._publish(keys=[key])
             return True
         except Exception as e:
             logger.warning(f"Cache set error for key={key}: {e}")
@@ -57,10 +184,12 @@ class CacheService:
 
     async def delete(self, key: str) -> bool:
         """Delete value from cache."""
+        self._invalidate_local(keys=[key])
         if not self.redis:
             return False
         try:
             await self.redis.delete(key)
+            await self._publish(keys=[key])
             return True
         except Exception as e:
             logger.warning(f"Cache delete error for key={key}: {e}")
@@ -68,6 +197,7 @@ class CacheService:
 
     async def delete_pattern(self, pattern: str) -> int:
         """Delete all keys matching pattern."""
+        self._invalidate_local(pattern=pattern)
         if not self.redis:
             return 0
         try:
@@ -76,6 +206,7 @@ class CacheService:
                 keys.append(key)
             if keys:
                 await self.redis.delete(*keys)
+            await self._publish(pattern=pattern)
             return len(keys)
         except Exception as e:
             logger.warning(f"Cache delete_pattern error for pattern={pattern}: {e}")
@@ -91,8 +222,80 @@ class CacheService:
             logger.warning(f"Cache increment error for key={key}: {e}")
             return None
 
+    # ── cross-replica invalidation ────────────────────────────────────────────
+
+    async def _publish(self, keys: Iterable[str] = (), pattern: Optional[str] = None) -> None:
+        message = {"origin": self._origin, "keys": list(keys)}
+        if pattern is not None:
+            message["pattern"] = pattern
+        await self.redis.publish(settings.CACHE_INVALIDATION_CHANNEL, json.dumps(message))
+
+    def _apply_invalidation(self, raw: str) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        if message.get("origin") == self._origin:
+            return  # already applied locally
+        self._invalidate_local(message.get("keys", []), message.get("pattern"))
+        CACHE_INVALIDATIONS_RECEIVED.inc()
+
+    def _invalidate_local(self, keys: Iterable[str] = (), pattern: Optional[str] = None) -> None:
+        self._generation += 1
+        for key in keys:
+            self.local.discard(key)
+        if pattern:
+            self.local.discard_matching(pattern)
+
+    def _start_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen(), name="cache-invalidation")
+
+    async def _listen(self) -> None:
+        delay = 1.0
+        while self.redis is not None:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                # Anything cached before (re)subscribing may have missed its
+                # invalidation.
+                self._generation += 1
+                self.local.clear()
+                delay = 1.0
+                async for message in pubsub.listen():
+                    if message and message.get("type") == "message":
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscription lost, retrying in {delay:.0f}s: {e}")
+                self._generation += 1
+                self.local.clear()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "l1_entries": len(self.local),
+            "l1_enabled": settings.CACHE_L1_ENABLED,
+            "invalidation_listener": self._listener is not None and not self._listener.done(),
+        }
+
     async def cleanup(self):
         """Close Redis connection."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        self.local.clear()
         if self.redis:
             await self.redis.close()
             logger.info("Redis cache connection closed")
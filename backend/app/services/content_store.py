@@ -0,0 +1,278 @@
+"""
+Content-addressed, deduplicating layer over `storage_service`.
+
+Avatar images, thumbnails and rendered video chunks are addressed by
+per-entity keys (`avatars/{id}/image.jpg`, `videos/{session}/…`), so the
+same bytes uploaded twice, or the same sentence rendered for many
+sessions, used to be stored once per key. With CONTENT_ADDRESSED_STORAGE
+on, `put_path()` hashes the file (SHA-256) and stores it once under
+`cas/{hh}/{sha256}{ext}`:
+
+  * `content_blobs` has one row per distinct content with a reference
+    count; `content_refs` maps each logical key onto its blob.
+  * If the blob is already stored, the write is skipped entirely.
+  * `release()` drops logical keys; blobs whose count reaches zero are
+    deleted (skipping any whose write-behind upload is still running —
+    the periodic `collect()` sweep picks those up later).
+
+A blob is deleted by first *claiming* it (refcount 0 → -1) in the
+database, so a concurrent `put_path()` of the same content can't revive
+it half-deleted: it waits for the deletion to finish and stores the bytes
+afresh. Keys that were never mapped (stored before this layer, or with
+the flag off) are deleted as-is.
+
+Callers store and serve the returned blob key; only `release()` takes the
+logical keys.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import Counter as Tally
+from pathlib import PurePosixPath
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app.config import settings
+from app.services.executors import storage_executor
+from app.services.storage import storage_service
+from app.services.write_behind import write_behind
+
+logger = logging.getLogger(__name__)
+
+CONTENT_STORE_PUTS = Counter(
+    "content_store_puts_total", "Content-addressed writes by result", ["result"]
+)
+CONTENT_STORE_BLOBS_DELETED = Counter(
+    "content_store_blobs_deleted_total", "Unreferenced content blobs deleted"
+)
+
+_HASH_BLOCK = 1024 * 1024
+# How long a put waits for a concurrent deletion of the same content.
+_CLAIM_RETRIES = 50
+_CLAIM_RETRY_SECS = 0.1
+_COLLECT_BATCH = 1000
+
+Publisher = Callable[..., Awaitable[object]]
+
+
+def _hash_file(path: str) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def _blob_key(digest: str, logical_key: str) -> str:
+    return f"cas/{digest[:2]}/{digest}{PurePosixPath(logical_key).suffix.lower()}"
+
+
+class ContentStore:
+    """SHA-256-addressed blobs with reference-counted logical keys."""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+
+    def _db(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CONTENT_ADDRESSED_STORAGE
+
+    async def put_path(
+        self,
+        src_path: str,
+        logical_key: str,
+        content_type: str = "application/octet-stream",
+        move: bool = True,
+        publish: Optional[Publisher] = None,
+    ) -> str:
+        """
+        Store a file under `logical_key` and return the storage key to serve
+        it from. `publish(src_path, key, content_type=...)` uploads new
+        content (default: `storage_service.upload_path`) and must consume
+        the source when `move` is set; deduplicated sources are removed here.
+        """
+        if not self.enabled:
+            await self._publish(publish, src_path, logical_key, content_type, move)
+            return logical_key
+
+        digest, size = await storage_executor.run(_hash_file, src_path)
+        key, upload = await self._acquire(digest, _blob_key(digest, logical_key), size)
+        try:
+            if upload:
+                await self._publish(publish, src_path, key, content_type, move)
+                await self._mark_stored(digest)
+            elif move:
+                await storage_executor.run(os.unlink, src_path)
+        except BaseException:
+            # Also on cancellation (barge-in), or the count would leak.
+            await asyncio.shield(self._decref([digest]))
+            raise
+        CONTENT_STORE_PUTS.labels("stored" if upload else "deduplicated").inc()
+        previous = await self._map(logical_key, digest)
+        if previous is not None:
+            # The key held a reference of its own, even to these same bytes.
+            await self._decref([previous])
+        return key
+
+    @staticmethod
+    async def _publish(publish: Optional[Publisher], src_path: str, key: str, content_type: str, move: bool) -> None:
+        if publish is not None:
+            await publish(src_path, key, content_type=content_type)
+        else:
+            await storage_service.upload_path(src_path, key, content_type=content_type, move=move)
+
+    async def _acquire(self, digest: str, key: str, size: int) -> Tuple[str, bool]:
+        """Take a reference on the blob; returns (its key, whether to upload the bytes)."""
+        from app.models import ContentBlob
+        from sqlalchemy import update
+        from sqlalchemy.exc import IntegrityError
+
+        for _ in range(_CLAIM_RETRIES):
+            async with self._db() as db:
+                bumped = await db.execute(
+                    update(ContentBlob)
+                    .where(ContentBlob.hash == digest, ContentBlob.refcount >= 0)
+                    .values(refcount=ContentBlob.refcount + 1)
+                )
+                if bumped.rowcount:
+                    blob = await db.get(ContentBlob, digest)
+                    await db.commit()
+                    # Not yet stored: another put is still uploading it, and
+                    # writing the same bytes again is harmless.
+                    return blob.key, not blob.stored
+                db.add(ContentBlob(hash=digest, key=key, size=size, refcount=1, stored=False))
+                try:
+                    await db.commit()
+                    return key, True
+                except IntegrityError:
+                    await db.rollback()  # inserted concurrently, or being deleted
+            await asyncio.sleep(_CLAIM_RETRY_SECS)
+        raise RuntimeError(f"Content blob {digest} is stuck in deletion")
+
+    async def _mark_stored(self, digest: str) -> None:
+        from app.models import ContentBlob
+        from sqlalchemy import update
+
+        async with self._db() as db:
+            await db.execute(update(ContentBlob).where(ContentBlob.hash == digest).values(stored=True))
+            await db.commit()
+
+    async def _map(self, logical_key: str, digest: str) -> Optional[str]:
+        """Point `logical_key` at `digest`; returns the hash it pointed at before."""
+        from app.models import ContentRef
+
+        async with self._db() as db:
+            ref = await db.get(ContentRef, logical_key)
+            previous = ref.hash if ref is not None else None
+            if ref is None:
+                db.add(ContentRef(key=logical_key, hash=digest))
+            else:
+                ref.hash = digest
+            await db.commit()
+        return previous
+
+    async def release(self, logical_keys: List[str]) -> List[str]:
+        """
+        Drop logical keys, deleting content nothing else references.
+        Returns the keys that couldn't be released (retry later).
+        """
+        from app.models import ContentRef
+        from sqlalchemy import delete, select
+
+        if not logical_keys:
+            return []
+        async with self._db() as db:
+            refs: Dict[str, str] = dict((await db.execute(
+                select(ContentRef.key, ContentRef.hash).where(ContentRef.key.in_(logical_keys))
+            )).all())
+            if refs:
+                await db.execute(delete(ContentRef).where(ContentRef.key.in_(list(refs))))
+                await db.commit()
+        if refs:
+            await self._decref(list(refs.values()))
+
+        # Never mapped: stored under the logical key itself.
+        unmapped = [k for k in logical_keys if k not in refs]
+        failed = [k for k in unmapped if write_behind.is_pending(k)]
+        failed += await self._delete_objects([k for k in unmapped if not write_behind.is_pending(k)])
+        return failed
+
+    async def _decref(self, digests: List[str]) -> None:
+        from app.models import ContentBlob
+        from sqlalchemy import update
+
+        async with self._db() as db:
+            for digest, n in Tally(digests).items():
+                await db.execute(
+                    update(ContentBlob)
+                    .where(ContentBlob.hash == digest, ContentBlob.refcount > 0)
+                    .values(refcount=ContentBlob.refcount - n)
+                )
+            await db.commit()
+        await self.collect(list(set(digests)))
+
+    async def collect(self, digests: Optional[List[str]] = None) -> int:
+        """
+        Delete unreferenced blobs (all of them, or just `digests`). Returns
+        how many were deleted. Run periodically to catch blobs skipped
+        because their upload was still in flight.
+        """
+        from app.models import ContentBlob
+        from sqlalchemy import delete, select, update
+
+        query = select(ContentBlob.hash, ContentBlob.key).where(ContentBlob.refcount <= 0)
+        if digests is not None:
+            query = query.where(ContentBlob.hash.in_(digests))
+        async with self._db() as db:
+            candidates = (await db.execute(query.limit(_COLLECT_BATCH))).all()
+            claimed: Dict[str, str] = {}
+            for digest, key in candidates:
+                if write_behind.is_pending(key):
+                    continue
+                won = await db.execute(
+                    update(ContentBlob)
+                    .where(ContentBlob.hash == digest, ContentBlob.refcount <= 0)
+                    .values(refcount=-1)
+                )
+                if won.rowcount:
+                    claimed[digest] = key
+            await db.commit()
+        if not claimed:
+            return 0
+
+        failed = set(await self._delete_objects(list(claimed.values())))
+        deleted = [d for d, k in claimed.items() if k not in failed]
+        async with self._db() as db:
+            if deleted:
+                await db.execute(delete(ContentBlob).where(ContentBlob.hash.in_(deleted), ContentBlob.refcount == -1))
+            retry = [d for d, k in claimed.items() if k in failed]
+            if retry:
+                await db.execute(update(ContentBlob).where(ContentBlob.hash.in_(retry)).values(refcount=0))
+            await db.commit()
+        CONTENT_STORE_BLOBS_DELETED.inc(len(deleted))
+        return len(deleted)
+
+    @staticmethod
+    async def _delete_objects(keys: List[str]) -> List[str]:
+        if not keys:
+            return []
+        failed = set(await storage_service.delete_many(keys))
+        if write_behind.enabled:
+            failed |= set(await write_behind.discard_local(keys))
+        return [k for k in keys if k in failed]
+
+
+content_store = ContentStore()
@@ -0,0 +1,105 @@
+"""
+Small local text embedder.
+
+Uses sentence-transformers (`EMBEDDING_MODEL`, MiniLM by default). If the
+package or model is unavailable it falls back to a hashed bag of words +
+character trigrams so `encode` never fails. That fallback is purely
+lexical: a rephrasing ("what are your opening hours" / "what are the
+opening hours?") scores about the same as a question with the opposite
+meaning ("... open on Saturday" / "... close on Saturday"), roughly 0.83–0.86
+for both, so no similarity threshold separates them. Callers that act on
+similarity must check `semantic` first.
+
+Vectors are L2-normalised float32, so cosine similarity is a dot product.
+Encoding runs on the dedicated `embedding_executor`.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.executors import embedding_executor
+
+try:  # Optional — real semantic embeddings.
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+# Dimensionality of the hashed fallback.
+_HASH_DIM = 512
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _hashed_embedding(text: str) -> np.ndarray:
+    vec = np.zeros(_HASH_DIM, dtype=np.float32)
+    words = _WORD_RE.findall(text.lower())
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    for feature in features:
+        # crc32, not hash(): stable across processes and restarts.
+        h = zlib.crc32(feature.encode("utf-8"))
+        vec[h % _HASH_DIM] += 1.0 if (h >> 16) & 1 else -1.0
+    return vec
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class Embedder:
+    """Lazily loaded sentence embedder with a dependency-free fallback."""
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name if model_name is not None else settings.EMBEDDING_MODEL
+        self._model = None
+        self._load_failed = False
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if SentenceTransformer is None or not self.model_name or self._load_failed:
+            return None
+        with self._lock:
+            if self._model is None and not self._load_failed:
+                try:
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+                    logger.info(f"Embedding model loaded: {self.model_name}")
+                except Exception as e:
+                    self._load_failed = True
+                    logger.warning(f"Embedding model {self.model_name} unavailable, using hashed fallback: {e}")
+            return self._model
+
+    @property
+    def semantic(self) -> bool:
+        """False once it's known that only the hashed fallback is available."""
+        return SentenceTransformer is not None and bool(self.model_name) and not self._load_failed
+
+    @property
+    def backend(self) -> str:
+        return self.model_name if self._model is not None else "hashed"
+
+    def encode_sync(self, texts: List[str]) -> np.ndarray:
+        """Return an (n, d) matrix of unit vectors."""
+        model = self._get_model()
+        if model is not None:
+            return _normalize(np.asarray(model.encode(texts), dtype=np.float32))
+        return _normalize(np.stack([_hashed_embedding(t) for t in texts]))
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        return await embedding_executor.run(self.encode_sync, texts)
+
+
+embedder = Embedder()
@@ -0,0 +1,194 @@
+"""
+Named, bounded thread pools for blocking work.
+
+Everything used to go through `asyncio.to_thread`, i.e. the loop's single
+default executor. A burst of Whisper jobs could then occupy every worker and
+starve TTS, and the default pool (min(32, cpu+4) threads) happily
+oversubscribes cores that torch is already spreading its own intra-op
+threads across.
+
+Each pipeline stage now gets its own pool sized from settings:
+
+  * `stt_executor`     — Whisper decode + model load
+  * `tts_executor`     — Chatterbox generate/save
+  * `gtts_executor`    — gTTS requests + MP3→WAV conversion (network-bound,
+                         kept apart so the TTS hedge isn't stuck behind
+                         the Chatterbox jobs it's racing)
+  * `storage_executor` — file reads/writes, voice-sample conversion
+  * `image_executor`   — avatar image processing (OpenCV / Pillow)
+  * `embedding_executor` — sentence embeddings for the semantic cache
+
+Usage mirrors `asyncio.to_thread` (context vars — e.g. the request id used
+in logs — are propagated):
+
+    text = await stt_executor.run(self._transcribe_sync, audio, language)
+
+Every pool exports Prometheus metrics labelled by executor name: queue wait
+time, run time, queued tasks, busy workers and utilization (busy / size).
+`executor_stats()` returns the same numbers for /health/details.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from prometheus_client import Gauge, Histogram
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Weight of the newest sample in the queue-wait EWMA reported by /health/details.
+_EWMA_ALPHA = 0.2
+
+_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+EXECUTOR_QUEUE_WAIT = Histogram(
+    "executor_queue_wait_seconds",
+    "Time a job spent queued before a worker picked it up",
+    ["executor"],
+    buckets=_WAIT_BUCKETS,
+)
+EXECUTOR_RUN_TIME = Histogram(
+    "executor_run_seconds",
+    "Time a job spent running on a worker",
+    ["executor"],
+    buckets=_WAIT_BUCKETS + (60, 120, 300),
+)
+EXECUTOR_QUEUED = Gauge("executor_queued_tasks", "Jobs waiting for a worker", ["executor"])
+EXECUTOR_BUSY = Gauge("executor_busy_workers", "Workers currently running a job", ["executor"])
+EXECUTOR_UTILIZATION = Gauge(
+    "executor_utilization_ratio", "Busy workers / pool size", ["executor"]
+)
+
+
+class InstrumentedExecutor:
+    """A lazily created, bounded ThreadPoolExecutor with queue/utilization metrics."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._queued = 0
+        self._wait_ewma: Optional[float] = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"{self.name}-worker",
+                )
+            return self._pool
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future:
+        """
+        Queue `fn(*args, **kwargs)` on this pool and return its thread future.
+
+        A job that's already running can't be interrupted: cancelling the task
+        awaiting it leaves the worker busy until `fn` returns. Callers that must
+        act once that happens (e.g. remove what the job writes) hook the future.
+        """
+        ctx = contextvars.copy_context()
+        # `dequeued` is flipped exactly once — by the worker when it starts, or
+        # when the job is cancelled before a worker got to it.
+        state = {"dequeued": False}
+        submitted = time.perf_counter()
+        self._enqueue()
+        future = self._get_pool().submit(ctx.run, self._invoke, state, submitted, fn, *args, **kwargs)
+        future.add_done_callback(lambda f: f.cancelled() and self._dequeue(state))
+        return future
+
+    async def run(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """Run `fn(*args, **kwargs)` on this pool and await the result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _invoke(self, state: dict, submitted: float, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        started = time.perf_counter()
+        wait = started - submitted
+        self._dequeue(state)
+        with self._lock:
+            self._busy += 1
+            busy = self._busy
+            self._wait_ewma = (
+                wait if self._wait_ewma is None
+                else _EWMA_ALPHA * wait + (1 - _EWMA_ALPHA) * self._wait_ewma
+            )
+        EXECUTOR_QUEUE_WAIT.labels(self.name).observe(wait)
+        EXECUTOR_BUSY.labels(self.name).set(busy)
+        EXECUTOR_UTILIZATION.labels(self.name).set(busy / self.max_workers)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            EXECUTOR_RUN_TIME.labels(self.name).observe(time.perf_counter() - started)
+            with self._lock:
+                self._busy -= 1
+                busy = self._busy
+            EXECUTOR_BUSY.labels(self.name).set(busy)
+            EXECUTOR_UTILIZATION.labels(self.name).set(busy / self.max_workers)
+
+    def _enqueue(self) -> None:
+        with self._lock:
+            self._queued += 1
+            queued = self._queued
+        EXECUTOR_QUEUED.labels(self.name).set(queued)
+
+    def _dequeue(self, state: dict) -> None:
+        with self._lock:
+            if state["dequeued"]:
+                return
+            state["dequeued"] = True
+            self._queued -= 1
+            queued = self._queued
+        EXECUTOR_QUEUED.labels(self.name).set(queued)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "busy": self._busy,
+                "queued": self._queued,
+                "utilization": round(self._busy / self.max_workers, 3),
+                "queue_wait_ewma_secs": self._wait_ewma,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+stt_executor = InstrumentedExecutor("stt", settings.STT_EXECUTOR_WORKERS)
+tts_executor = InstrumentedExecutor("tts", settings.TTS_EXECUTOR_WORKERS)
+gtts_executor = InstrumentedExecutor("gtts", settings.GTTS_EXECUTOR_WORKERS)
+storage_executor = InstrumentedExecutor("storage", settings.STORAGE_EXECUTOR_WORKERS)
+image_executor = InstrumentedExecutor("image", settings.IMAGE_EXECUTOR_WORKERS)
+embedding_executor = InstrumentedExecutor("embedding", settings.EMBEDDING_EXECUTOR_WORKERS)
+
+_EXECUTORS: Dict[str, InstrumentedExecutor] = {
+    e.name: e
+    for e in (
+        stt_executor, tts_executor, gtts_executor, storage_executor, image_executor, embedding_executor,
+    )
+}
+
+
+def executor_stats() -> dict:
+    return {name: e.stats() for name, e in _EXECUTORS.items()}
+
+
+def shutdown_executors() -> None:
+    for e in _EXECUTORS.values():
+        e.shutdown()
+    logger.info("Executor pools shut down")
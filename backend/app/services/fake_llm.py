@@ -0,0 +1,137 @@
+"""
+Offline stand-in LLM provider (`LLM_PROVIDER=fake`).
+
+Streams deterministic or scripted text with realistic timing so the
+WebSocket pipeline (sentence splitting, TTS/animation overlap, barge-in,
+admission control, hedging) can be load-tested without network access or
+token spend:
+
+  * `LLM_FAKE_TTFT_MS`          — delay before the first token
+  * `LLM_FAKE_TOKENS_PER_SEC`   — steady-state streaming rate
+  * `LLM_FAKE_JITTER`           — ± fraction applied to every delay
+  * `LLM_FAKE_ERROR_RATE`       — probability a call fails before its first
+                                  token, as `LLM_FAKE_ERROR` ("unavailable"
+                                  or "rate_limited")
+  * `LLM_FAKE_SCRIPT`           — optional file of replies (JSON list of
+                                  strings, or plain text with replies
+                                  separated by blank lines), served in order
+  * `LLM_FAKE_SEED`             — seed for jitter/error draws
+
+Without a script the reply echoes the last user message and pads it to
+`LLM_FAKE_RESPONSE_WORDS`, so output is a pure function of the input.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import random
+import re
+from pathlib import Path
+from typing import AsyncGenerator, Dict, Iterator, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_FILLER = (
+    "Here is a little more detail so the reply is long enough to exercise "
+    "sentence splitting. Each sentence should reach the speech pipeline "
+    "while the rest is still streaming. That keeps the avatar talking "
+    "without gaps."
+).split()
+
+# One "token" per word, keeping the whitespace that follows it.
+_TOKEN_RE = re.compile(r"\S+\s*")
+
+
+def _load_script(path: str) -> List[str]:
+    raw = Path(path).read_text(encoding="utf-8")
+    try:
+        replies = json.loads(raw)
+    except json.JSONDecodeError:
+        replies = [p.strip() for p in re.split(r"\n\s*\n", raw)]
+    replies = [str(r) for r in replies if str(r).strip()]
+    if not replies:
+        raise ValueError(f"LLM_FAKE_SCRIPT {path!r} contains no replies")
+    return replies
+
+
+class FakeLLM:
+    """Scripted/deterministic token source with configurable timing and faults."""
+
+    def __init__(
+        self,
+        ttft: float = 0.3,
+        tokens_per_sec: float = 40.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error: str = "unavailable",
+        script: Optional[List[str]] = None,
+        response_words: int = 40,
+        seed: Optional[int] = None,
+    ):
+        self.ttft = max(0.0, ttft)
+        self.tokens_per_sec = tokens_per_sec
+        self.jitter = max(0.0, min(jitter, 1.0))
+        self.error_rate = error_rate
+        self.error = error
+        self.response_words = response_words
+        self._script: Optional[Iterator[str]] = itertools.cycle(script) if script else None
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_settings(cls) -> "FakeLLM":
+        script = _load_script(settings.LLM_FAKE_SCRIPT) if settings.LLM_FAKE_SCRIPT else None
+        return cls(
+            ttft=settings.LLM_FAKE_TTFT_MS / 1000,
+            tokens_per_sec=settings.LLM_FAKE_TOKENS_PER_SEC,
+            jitter=settings.LLM_FAKE_JITTER,
+            error_rate=settings.LLM_FAKE_ERROR_RATE,
+            error=settings.LLM_FAKE_ERROR,
+            script=script,
+            response_words=settings.LLM_FAKE_RESPONSE_WORDS,
+            seed=settings.LLM_FAKE_SEED,
+        )
+
+    def reply_for(self, messages: List[Dict[str, str]]) -> str:
+        if self._script is not None:
+            return next(self._script)
+        last_user = next(
+            (m.get("content") for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        if not isinstance(last_user, str):  # content blocks
+            last_user = " ".join(b.get("text", "") for b in last_user if isinstance(b, dict))
+        words = f"You said: {last_user.strip()}.".split()
+        filler = itertools.cycle(_FILLER)
+        while len(words) < self.response_words:
+            words.append(next(filler))
+        return " ".join(words)
+
+    def _delay(self, base: float) -> float:
+        if self.jitter:
+            base *= 1 + self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, base)
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate <= 0 or self._rng.random() >= self.error_rate:
+            return
+        from app.services.llm import LLMRateLimited, LLMUnavailable
+        if self.error == "rate_limited":
+            raise LLMRateLimited("fake provider: injected 429", retry_after=0.0)
+        raise LLMUnavailable("fake provider: injected outage")
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+        reply = self.reply_for(messages)
+        await asyncio.sleep(self._delay(self.ttft))
+        self._maybe_fail()
+        interval = 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        for i, token in enumerate(_TOKEN_RE.findall(reply)):
+            if i:
+                await asyncio.sleep(self._delay(interval))
+            yield token
+
+    async def generate(self, messages: List[Dict[str, str]]) -> str:
+        return "".join([token async for token in self.stream(messages)])
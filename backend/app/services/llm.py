@@ -1,14 +1,29 @@
 """
 LLM facade for the chat pipeline.
 
-Provider-agnostic interface that currently supports Anthropic (default) and
-OpenAI. The Anthropic path takes advantage of:
+Provider-agnostic interface that currently supports Anthropic (default),
+OpenAI, and an offline `fake` provider (app/services/fake_llm.py) for load
+and latency testing. The Anthropic path takes advantage of:
 
   * **Prompt caching** — the system prompt is wrapped in a content block
     with `cache_control={"type": "ephemeral"}`. Cached reads cost ~10% of
     fresh input, which dominates per-token cost for chatty avatars that
     share a system prompt across many turns. Workspace-isolated as of
-    Anthropic's Feb 2026 change.
+    Anthropic's Feb 2026 change. Streaming turns add breakpoints on the two
+    newest history messages, so the next turn reads the whole previous
+    conversation prefix from cache instead of reprocessing it; per-session
+    cache hit ratios are logged as `llm_cache`. `prewarm()` writes the cache
+    entry for a system prompt in the background when a session connects, so
+    even the first turn starts warm.
+  * **Rolling summary** — callers may pass `summary`, a compacted digest
+    of turns that no longer fit the raw history window. It travels as a
+    second system block *after* the cached system prompt, so refreshing
+    the summary never invalidates the system prompt's cache entry.
+  * **Token-budgeted context** — `build_context` packs the newest turns
+    into `LLM_CONTEXT_TOKEN_BUDGET` (overridable per model/provider) using
+    a local estimate: tiktoken when installed, otherwise a chars/words
+    heuristic. The estimate is cached on each message dict under
+    `"tokens"` (and persisted to `Message.tokens`) so it's computed once.
   * **Extended thinking (opt-in)** — when callers pass `thinking=True`
     we set `thinking={"type": "enabled", "budget_tokens": ...}` so the
     model reasons internally before answering. Reserved for hard turns;
@@ -17,17 +32,42 @@ OpenAI. The Anthropic path takes advantage of:
 Exceptions are re-raised as `LLMError` subclasses so the WebSocket pipeline
 can distinguish rate-limit / auth / network failures and surface
 appropriate user-facing messages.
+
+Routing: with `LLM_SECONDARY_MODEL` set, the service owns a secondary
+route (another provider, or a faster model on the same one). Streams start
+on the primary; if no token arrives within `LLM_HEDGE_TTFT_SECS` the
+secondary is started too and whichever streams first wins — the other is
+cancelled. Each route tracks a TTFT EWMA and a circuit breaker that opens
+after `LLM_BREAKER_FAILURES` consecutive `LLMUnavailable`/`LLMRateLimited`
+errors, so a struggling provider is skipped until its cooldown passes.
+
+Admission: every call first passes its provider's `ProviderLimiter`
+(app/services/llm_limiter.py) — concurrency cap, input-TPM budget and
+retry-after gate. A 429 that arrives before any token has streamed is
+retried with jittered exponential backoff (`LLM_RATE_LIMIT_RETRIES`).
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+import math
+import random
+import time
+from dataclasses import dataclass
 from typing import AsyncGenerator, Dict, List, Optional
 
 import anthropic
 import openai
 
+try:  # Optional — exact counts for OpenAI models, a close proxy for Claude.
+    import tiktoken
+except ImportError:  # pragma: no cover
+    tiktoken = None
+
 from app.config import settings
+from app.services.llm_limiter import LLM_RATE_LIMIT_RETRIES, get_limiter, retry_after_secs
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +81,57 @@ DEFAULT_SYSTEM_PROMPT = (
 # budget low. Increase for research/agentic use cases.
 _DEFAULT_THINKING_BUDGET = 4096
 
+_SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+_COMPACTION_SYSTEM_PROMPT = (
+    "You maintain a running summary of a spoken conversation between a user "
+    "and an AI avatar. Preserve names, facts, preferences, open questions and "
+    "commitments; drop small talk. Write compact third-person prose, at most "
+    "about 200 words. No preamble."
+)
+
+
+# Weight of the newest sample in the per-route TTFT EWMA.
+_EWMA_ALPHA = 0.2
+
+# Returned by a route's first-chunk probe when the stream ended with no text.
+_END_OF_STREAM = object()
+
+# Role/framing tokens each message costs on top of its content.
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _load_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # encoding files unavailable offline
+        return None
+
+
+_ENCODING = _load_encoding()
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate for `text` (no API round-trip)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    # ~3.5 chars/token for English prose; the word count floor keeps short,
+    # space-heavy text (lists, numbers) from being undercounted.
+    return math.ceil(max(len(text) / 3.5, len(text.split()) * 1.3))
+
+
+def message_tokens(message: dict) -> int:
+    """Token estimate for a history message, cached on the dict itself."""
+    tokens = message.get("tokens")
+    if tokens is None:
+        tokens = estimate_tokens(message.get("content") or "") + _MESSAGE_OVERHEAD_TOKENS
+        message["tokens"] = tokens
+    return tokens
+
 
 class LLMError(Exception):
     """Base class — chat pipeline catches this and emits a typed WS error."""
@@ -49,6 +140,15 @@ class LLMError(Exception):
 class LLMRateLimited(LLMError):
     """Provider returned 429."""
 
+    def __init__(self, message: str = "", retry_after: Optional[float] = None, headers=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.headers = headers
+
+
+class LLMAdmissionTimeout(LLMRateLimited):
+    """No local capacity within LLM_ADMISSION_TIMEOUT_SECS — the provider was never called."""
+
 
 class LLMAuthError(LLMError):
     """Provider returned 401/403 — usually a misconfigured API key."""
@@ -58,20 +158,169 @@ class LLMUnavailable(LLMError):
     """Network failure, timeout, or 5xx from the provider."""
 
 
-def _cacheable_system(system_prompt: Optional[str]) -> list[dict]:
+@dataclass
+class ProviderStats:
+    """Rolling TTFT stats and circuit-breaker state for one LLM route."""
+
+    calls: int = 0
+    failures: int = 0
+    cancelled: int = 0
+    hedges_won: int = 0
+    ttft_ewma_secs: Optional[float] = None
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    # Set once the breaker has opened; the first call after the cooldown is a
+    # probe — one more failure reopens it immediately.
+    tripped: bool = False
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def record_success(self, ttft: Optional[float] = None) -> None:
+        self.consecutive_failures = 0
+        self.tripped = False
+        if ttft is not None:
+            self.ttft_ewma_secs = (
+                ttft if self.ttft_ewma_secs is None
+                else _EWMA_ALPHA * ttft + (1 - _EWMA_ALPHA) * self.ttft_ewma_secs
+            )
+
+    def record_failure(self, exc: BaseException) -> None:
+        self.failures += 1
+        # Our own admission queue being full says nothing about the route.
+        if not isinstance(exc, (LLMUnavailable, LLMRateLimited)) or isinstance(exc, LLMAdmissionTimeout):
+            return
+        self.consecutive_failures += 1
+        if self.tripped or self.consecutive_failures >= settings.LLM_BREAKER_FAILURES:
+            self.tripped = True
+            self.consecutive_failures = 0
+            self.open_until = time.monotonic() + settings.LLM_BREAKER_COOLDOWN_SECS
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "hedges_won": self.hedges_won,
+            "ttft_ewma_secs": self.ttft_ewma_secs,
+            "circuit_open": not self.available(),
+        }
+
+
+def _input_estimate(
+    messages: List[Dict[str, str]],
+    system_prompt: Optional[str],
+    summary: Optional[str],
+) -> int:
+    """Rough input size for admission. Doesn't cache onto the (API-bound) dicts."""
+    total = estimate_tokens(system_prompt or DEFAULT_SYSTEM_PROMPT) + estimate_tokens(summary or "")
+    for m in messages:
+        content = m.get("content")
+        text = content if isinstance(content, str) else " ".join(
+            b.get("text", "") for b in content or [] if isinstance(b, dict)
+        )
+        total += estimate_tokens(text) + _MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def _response_headers(stream) -> Optional[dict]:
+    response = getattr(stream, "response", None)
+    return getattr(response, "headers", None)
+
+
+def _retry_delay(attempt: int, exc: LLMRateLimited) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's retry-after."""
+    backoff = random.uniform(0, settings.LLM_RETRY_BASE_DELAY_SECS * (2 ** attempt))
+    return max(backoff, exc.retry_after or 0.0)
+
+
+async def _first_chunk(agen: AsyncGenerator[str, None]):
+    """Pull the first chunk of a stream (or `_END_OF_STREAM`)."""
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _END_OF_STREAM
+
+
+async def _unsupported_stream(provider: str) -> AsyncGenerator[str, None]:
+    raise LLMError(f"Unsupported LLM provider: {provider}")
+    yield  # pragma: no cover — makes this an async generator
+
+
+async def _close_losers(streams: Dict[asyncio.Task, tuple], winner: Optional[asyncio.Task]) -> None:
+    """Cancel every route but the winner and close its underlying stream."""
+    losers = [t for t in streams if t is not winner]
+    for task in losers:
+        if not task.done():
+            task.cancel()
+            streams[task][0].stats.cancelled += 1
+    if losers:
+        await asyncio.gather(*losers, return_exceptions=True)
+    for task in losers:
+        try:
+            await streams[task][1].aclose()
+        except Exception:
+            pass
+
+
+def _cacheable_system(system_prompt: Optional[str], summary: Optional[str] = None) -> list[dict]:
     """
     Build a system block list with prompt-cache marking applied to the
     (long-lived) system prompt. The SDK accepts either a plain string OR
     a list of blocks; blocks are needed to attach `cache_control` per-block.
     """
     text = system_prompt or DEFAULT_SYSTEM_PROMPT
-    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+    blocks = [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+    if summary:
+        blocks.append({"type": "text", "text": _SUMMARY_PREFIX + summary})
+    return blocks
+
+
+def _with_breakpoint(message: Dict[str, str]) -> dict:
+    content = message["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    else:
+        content = [dict(block) for block in content]
+    content[-1]["cache_control"] = {"type": "ephemeral"}
+    return {"role": message["role"], "content": content}
+
+
+def _cacheable_messages(messages: List[Dict[str, str]]) -> List[dict]:
+    """
+    Put cache breakpoints on the last two messages. Anthropic looks back
+    from a breakpoint for the longest previously written prefix, so this
+    turn reads everything up to last turn's breakpoint and writes the
+    extended prefix for the next one. The newest message may carry per-turn
+    additions (recalled memories) that the next turn won't resend, so the
+    prefix ending just before it is written as well. Together with the
+    system block that's 3 of the 4 allowed breakpoints.
+    """
+    if not messages:
+        return messages
+    head = messages[:-2]
+    return [*head, *(_with_breakpoint(m) for m in messages[-2:])]
+
+
+def _openai_system(
+    messages: List[Dict[str, str]],
+    system_prompt: Optional[str],
+    summary: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """Prepend system prompt / rolling summary as system messages."""
+    prefix = []
+    if system_prompt:
+        prefix.append({"role": "system", "content": system_prompt})
+    if summary:
+        prefix.append({"role": "system", "content": _SUMMARY_PREFIX + summary})
+    return prefix + messages if prefix else messages
 
 
 def _map_anthropic_exception(exc: Exception) -> LLMError:
     """Translate Anthropic SDK exceptions into the typed LLMError hierarchy."""
     if isinstance(exc, anthropic.RateLimitError):
-        return LLMRateLimited(str(exc))
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        return LLMRateLimited(str(exc), retry_after_secs(headers), headers)
     if isinstance(exc, (anthropic.AuthenticationError, anthropic.PermissionDeniedError)):
         return LLMAuthError(str(exc))
     if isinstance(exc, (anthropic.APITimeoutError, anthropic.APIConnectionError, anthropic.InternalServerError)):
@@ -84,7 +333,8 @@ def _map_anthropic_exception(exc: Exception) -> LLMError:
 
 def _map_openai_exception(exc: Exception) -> LLMError:
     if isinstance(exc, openai.RateLimitError):
-        return LLMRateLimited(str(exc))
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        return LLMRateLimited(str(exc), retry_after_secs(headers), headers)
     if isinstance(exc, (openai.AuthenticationError, openai.PermissionDeniedError)):
         return LLMAuthError(str(exc))
     if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
@@ -93,18 +343,47 @@ def _map_openai_exception(exc: Exception) -> LLMError:
 
 
 class LLMService:
-    """LLM Service for AI responses."""
+    """LLM Service for AI responses. Optionally hedges onto a secondary route."""
 
-    def __init__(self):
-        self.provider = settings.LLM_PROVIDER
-        self.model = settings.LLM_MODEL
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        secondary: Optional["LLMService"] = None,
+    ):
+        self.provider = provider or settings.LLM_PROVIDER
+        self.model = model or settings.LLM_MODEL
+        self.name = f"{self.provider}:{self.model}"
         self.temperature = settings.LLM_TEMPERATURE
         self.max_tokens = settings.LLM_MAX_TOKENS
+        self.secondary = secondary
+        # <= 0 disables hedging: the secondary only runs after the primary fails.
+        self.hedge_ttft = settings.LLM_HEDGE_TTFT_SECS
+        self.stats = ProviderStats()
+        # session_id -> cumulative {"read", "write", "uncached"} input tokens
+        self._cache_stats: Dict[str, Dict[str, int]] = {}
+        # prompt-cache key -> monotonic time until which it's assumed warm
+        self._warm_until: Dict[str, float] = {}
+        self._prewarm_tasks: Dict[str, asyncio.Task] = {}
 
         if self.provider == "anthropic":
             self.client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
         elif self.provider == "openai":
             self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        elif self.provider == "fake":
+            from app.services.fake_llm import FakeLLM
+            self.client = FakeLLM.from_settings()
+
+    # ── routing ──────────────────────────────────────────────────────────────
+
+    def _routes(self) -> List["LLMService"]:
+        """Routes to try, in order, skipping any whose breaker is open."""
+        routes = [self] + ([self.secondary] if self.secondary else [])
+        return [r for r in routes if r.stats.available()] or routes
+
+    def provider_stats(self) -> dict:
+        routes = [self] + ([self.secondary] if self.secondary else [])
+        return {r.name: r.stats.as_dict() for r in routes}
 
     # ── non-streaming ────────────────────────────────────────────────────────
 
@@ -113,11 +392,69 @@ class LLMService:
         messages: List[Dict[str, str]],
         system_prompt: Optional[str] = None,
         thinking: bool = False,
+        summary: Optional[str] = None,
+    ) -> str:
+        """Generate on the first healthy route, failing over on outages/429s."""
+        errors: List[LLMError] = []
+        for route in self._routes():
+            route.stats.calls += 1
+            try:
+                text = await route._admitted_generate(messages, system_prompt, thinking, summary)
+            except LLMError as e:
+                route.stats.record_failure(e)
+                if not isinstance(e, (LLMUnavailable, LLMRateLimited)):
+                    raise
+                logger.warning(f"LLM route {route.name} failed ({type(e).__name__}) — failing over")
+                errors.append(e)
+                continue
+            route.stats.record_success()
+            return text
+        raise errors[0]
+
+    async def _admitted_generate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        thinking: bool,
+        summary: Optional[str],
+    ) -> str:
+        limiter = get_limiter(self.provider)
+        tokens = _input_estimate(messages, system_prompt, summary)
+        attempt = 0
+        while True:
+            try:
+                async with limiter.admit(tokens):
+                    return await self._generate_single(messages, system_prompt, thinking, summary)
+            except LLMRateLimited as e:
+                if not self._should_retry(limiter, e, attempt):
+                    raise
+                delay = _retry_delay(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _should_retry(self, limiter, exc: LLMRateLimited, attempt: int) -> bool:
+        limiter.observe_headers(exc.headers)
+        if exc.retry_after:
+            limiter.block_for(exc.retry_after)
+        if attempt >= settings.LLM_RATE_LIMIT_RETRIES:
+            return False
+        LLM_RATE_LIMIT_RETRIES.labels(self.provider).inc()
+        logger.info(f"{self.name} rate-limited — retry {attempt + 1}/{settings.LLM_RATE_LIMIT_RETRIES}")
+        return True
+
+    async def _generate_single(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        thinking: bool,
+        summary: Optional[str],
     ) -> str:
         if self.provider == "anthropic":
-            return await self._generate_anthropic(messages, system_prompt, thinking)
+            return await self._generate_anthropic(messages, system_prompt, thinking, summary)
         if self.provider == "openai":
-            return await self._generate_openai(messages, system_prompt)
+            return await self._generate_openai(messages, system_prompt, summary)
+        if self.provider == "fake":
+            return await self.client.generate(messages)
         raise LLMError(f"Unsupported LLM provider: {self.provider}")
 
     async def _generate_anthropic(
@@ -125,12 +462,13 @@ class LLMService:
         messages: List[Dict[str, str]],
         system_prompt: Optional[str],
         thinking: bool,
+        summary: Optional[str] = None,
     ) -> str:
         kwargs: dict = {
             "model": self.model,
             "max_tokens": self.max_tokens,
             "temperature": self.temperature,
-            "system": _cacheable_system(system_prompt),
+            "system": _cacheable_system(system_prompt, summary),
             "messages": messages,
         }
         # Extended thinking — model "thinks" privately before answering. The
@@ -164,9 +502,9 @@ class LLMService:
         self,
         messages: List[Dict[str, str]],
         system_prompt: Optional[str] = None,
+        summary: Optional[str] = None,
     ) -> str:
-        if system_prompt:
-            messages = [{"role": "system", "content": system_prompt}] + messages
+        messages = _openai_system(messages, system_prompt, summary)
 
         try:
             response = await self.client.chat.completions.create(
@@ -188,31 +526,179 @@ class LLMService:
         self,
         messages: List[Dict[str, str]],
         system_prompt: Optional[str] = None,
+        summary: Optional[str] = None,
+        session_id: Optional[str] = None,
     ) -> AsyncGenerator[str, None]:
-        if self.provider == "anthropic":
-            async for chunk in self._stream_anthropic(messages, system_prompt):
-                yield chunk
-        elif self.provider == "openai":
-            async for chunk in self._stream_openai(messages, system_prompt):
+        """
+        Stream from the first route to produce a token. The primary starts
+        alone; past the TTFT budget (or as soon as it fails) the next route
+        joins the race. Once a route has streamed its first token it is
+        committed to — mid-stream errors propagate, since text already went out.
+
+        A hedge is only worth it if it can start right away on a different
+        route: one that would queue behind the limiter the primary is already
+        waiting on just doubles the queue. Failover after an error isn't
+        subject to that.
+        """
+        routes = self._routes()
+        args = (messages, system_prompt, summary, session_id)
+        tokens = _input_estimate(messages, system_prompt, summary)
+        streams: Dict[asyncio.Task, tuple] = {}
+
+        def _start(route: "LLMService") -> None:
+            route.stats.calls += 1
+            agen = route._admitted_stream(*args)
+            task = asyncio.create_task(_first_chunk(agen), name=f"llm-{route.name}")
+            streams[task] = (route, agen, time.perf_counter())
+
+        winner: Optional[asyncio.Task] = None
+        errors: List[BaseException] = []
+        hedged = False
+        try:
+            _start(routes[0])
+            pending = set(streams)
+            timeout = self.hedge_ttft if self.hedge_ttft > 0 and len(routes) > 1 else None
+
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                timeout = None
+
+                for task in done:
+                    route = streams[task][0]
+                    exc = task.exception()
+                    if exc is None:
+                        winner = task
+                        break
+                    route.stats.record_failure(exc)
+                    errors.append(exc)
+                    logger.warning(f"LLM route {route.name} failed before first token: {exc}")
+                if winner is not None:
+                    break
+
+                # TTFT budget blown, or the running route failed — bring in the next.
+                started = {streams[t][0] for t in streams}
+                nxt = next((r for r in routes if r not in started), None)
+                if nxt is not None and not done and not self._can_hedge(routes[0], nxt, tokens):
+                    logger.info(
+                        f"{routes[0].name} missed {self.hedge_ttft:g}s TTFT budget — "
+                        f"not hedging onto {nxt.name}, it can't be admitted immediately"
+                    )
+                    nxt = None
+                if nxt is not None:
+                    if not done:
+                        hedged = True
+                        logger.info(
+                            f"{routes[0].name} missed {self.hedge_ttft:g}s TTFT budget — "
+                            f"hedging onto {nxt.name}"
+                        )
+                    _start(nxt)
+                    pending = {t for t in streams if not t.done()}
+
+            if winner is None:
+                raise errors[0] if errors else LLMError("No LLM route available")
+        finally:
+            await _close_losers(streams, winner)
+
+        route, agen, started_at = streams[winner]
+        route.stats.record_success(time.perf_counter() - started_at)
+        if hedged and route is not routes[0]:
+            route.stats.hedges_won += 1
+        first = winner.result()
+        try:
+            if first is _END_OF_STREAM:
+                return
+            yield first
+            async for chunk in agen:
                 yield chunk
-        else:
-            raise LLMError(f"Unsupported LLM provider: {self.provider}")
+        except LLMError as e:
+            route.stats.record_failure(e)
+            raise
+        finally:
+            await agen.aclose()
+
+    @staticmethod
+    def _can_hedge(primary: "LLMService", route: "LLMService", tokens: int) -> bool:
+        if route.name == primary.name:
+            return False
+        return get_limiter(route.provider).can_admit_now(tokens)
+
+    async def _admitted_stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        summary: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        `_stream_single` behind the provider's limiter. The slot is held until
+        the stream is exhausted or closed. A 429 before the first token is
+        retried (the user has seen nothing yet); after it, it propagates.
+        """
+        limiter = get_limiter(self.provider)
+        tokens = _input_estimate(messages, system_prompt, summary)
+        attempt = 0
+        streamed = False
+        while True:
+            try:
+                async with limiter.admit(tokens):
+                    agen = self._stream_single(messages, system_prompt, summary, session_id)
+                    try:
+                        first = await _first_chunk(agen)
+                        if first is _END_OF_STREAM:
+                            return
+                        streamed = True
+                        yield first
+                        async for chunk in agen:
+                            yield chunk
+                        return
+                    finally:
+                        await agen.aclose()
+            except LLMRateLimited as e:
+                if streamed or not self._should_retry(limiter, e, attempt):
+                    raise
+                delay = _retry_delay(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _stream_single(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        summary: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        if self.provider == "anthropic":
+            return self._stream_anthropic(messages, system_prompt, summary, session_id)
+        if self.provider == "openai":
+            return self._stream_openai(messages, system_prompt, summary)
+        if self.provider == "fake":
+            return self.client.stream(messages)
+        return _unsupported_stream(self.provider)
 
     async def _stream_anthropic(
         self,
         messages: List[Dict[str, str]],
         system_prompt: Optional[str] = None,
+        summary: Optional[str] = None,
+        session_id: Optional[str] = None,
     ) -> AsyncGenerator[str, None]:
         try:
             async with self.client.messages.stream(
                 model=self.model,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
-                system=_cacheable_system(system_prompt),
-                messages=messages,
+                system=_cacheable_system(system_prompt, summary),
+                messages=_cacheable_messages(messages),
             ) as stream:
+                get_limiter(self.provider).observe_headers(_response_headers(stream))
                 async for text in stream.text_stream:
                     yield text
+                final = await stream.get_final_message()
+                self._record_cache_usage(session_id, final.usage)
+                # Any completed turn refreshes the system prompt's cache entry.
+                self._mark_warm(self._prompt_cache_key(system_prompt))
         except Exception as e:
             mapped = _map_anthropic_exception(e)
             logger.error("anthropic_stream_failed", extra={"error_type": type(e).__name__})
@@ -222,9 +708,9 @@ class LLMService:
         self,
         messages: List[Dict[str, str]],
         system_prompt: Optional[str] = None,
+        summary: Optional[str] = None,
     ) -> AsyncGenerator[str, None]:
-        if system_prompt:
-            messages = [{"role": "system", "content": system_prompt}] + messages
+        messages = _openai_system(messages, system_prompt, summary)
 
         try:
             stream = await self.client.chat.completions.create(
@@ -234,6 +720,7 @@ class LLMService:
                 max_tokens=self.max_tokens,
                 stream=True,
             )
+            get_limiter(self.provider).observe_headers(_response_headers(stream))
             async for chunk in stream:
                 content = chunk.choices[0].delta.content
                 if content:
@@ -243,8 +730,178 @@ class LLMService:
             logger.error("openai_stream_failed", extra={"error_type": type(e).__name__})
             raise mapped from e
 
+    # ── prompt-cache prewarming ──────────────────────────────────────────────
+
+    def _prompt_cache_key(self, system_prompt: Optional[str]) -> str:
+        text = system_prompt or DEFAULT_SYSTEM_PROMPT
+        return hashlib.sha256(f"{self.model}\0{text}".encode()).hexdigest()
+
+    def _mark_warm(self, key: str) -> None:
+        self._warm_until[key] = time.monotonic() + settings.LLM_PROMPT_CACHE_TTL_SECS
+
+    def prewarm(self, system_prompt: Optional[str]) -> Optional[asyncio.Task]:
+        """
+        Start a background 1-token request that writes the prompt cache for
+        `system_prompt`. No-op unless the prompt is long enough to be cached
+        and isn't already warm (or being warmed) — sessions of the same avatar
+        share one warm-up per TTL. The request goes through the provider's
+        limiter and is skipped when it couldn't be admitted immediately: a
+        warm-up must never queue ahead of, or spend budget needed by, live turns.
+        """
+        if not settings.LLM_PREWARM_ENABLED or self.provider != "anthropic":
+            return None
+        text = system_prompt or DEFAULT_SYSTEM_PROMPT
+        if estimate_tokens(text) < settings.LLM_PREWARM_MIN_TOKENS:
+            return None
+
+        key = self._prompt_cache_key(text)
+        if self._warm_until.get(key, 0.0) > time.monotonic():
+            return None
+        if key in self._prewarm_tasks:
+            return self._prewarm_tasks[key]
+        if not get_limiter(self.provider).can_admit_now(estimate_tokens(text)):
+            logger.info("llm_prewarm_skipped", extra={"reason": "admission_busy"})
+            return None
+
+        task = asyncio.create_task(self._prewarm(key, text), name="llm-prewarm")
+        self._prewarm_tasks[key] = task
+        task.add_done_callback(lambda _t: self._prewarm_tasks.pop(key, None))
+        return task
+
+    async def _prewarm(self, key: str, system_prompt: str) -> None:
+        limiter = get_limiter(self.provider)
+        try:
+            async with limiter.admit(estimate_tokens(system_prompt)):
+                raw = await self.client.messages.with_raw_response.create(
+                    model=self.model,
+                    max_tokens=1,
+                    system=_cacheable_system(system_prompt),
+                    messages=[{"role": "user", "content": "Hi"}],
+                )
+                limiter.observe_headers(raw.headers)
+                response = raw.parse()
+        except Exception as e:
+            mapped = e if isinstance(e, LLMError) else _map_anthropic_exception(e)
+            if isinstance(mapped, LLMRateLimited):
+                limiter.observe_headers(mapped.headers)
+                if mapped.retry_after:
+                    limiter.block_for(mapped.retry_after)
+            logger.warning("llm_prewarm_failed", extra={"error_type": type(e).__name__})
+            return
+        self._mark_warm(key)
+        usage = response.usage
+        logger.info(
+            "llm_prewarm",
+            extra={
+                "cache_create_tokens": getattr(usage, "cache_creation_input_tokens", 0),
+                "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0),
+            },
+        )
+
+    # ── context assembly ─────────────────────────────────────────────────────
+
+    def context_budget(self) -> int:
+        """Input-token budget for the current model (model > provider > default)."""
+        overrides = settings.LLM_CONTEXT_TOKEN_BUDGETS
+        return overrides.get(self.model) or overrides.get(self.provider) or settings.LLM_CONTEXT_TOKEN_BUDGET
+
+    def build_context(
+        self,
+        messages: List[dict],
+        system_prompt: Optional[str] = None,
+        summary: Optional[str] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Pack the newest messages that fit the token budget, after reserving
+        room for the system prompt and rolling summary. The latest message is
+        always kept; the result starts on a user turn and carries only
+        role/content (the cached `"tokens"` key stays on the session copy).
+        """
+        budget = self.context_budget()
+        budget -= estimate_tokens(system_prompt or DEFAULT_SYSTEM_PROMPT)
+        budget -= estimate_tokens(summary or "")
+
+        start = len(messages)
+        used = 0
+        while start > 0:
+            cost = message_tokens(messages[start - 1])
+            if used + cost > budget and start < len(messages):
+                break
+            used += cost
+            start -= 1
+        while start < len(messages) - 1 and messages[start]["role"] != "user":
+            start += 1
+
+        if start > 0:
+            logger.debug(f"Context budget {self.context_budget()}: dropped {start} oldest message(s)")
+        return [{"role": m["role"], "content": m["content"]} for m in messages[start:]]
+
+    # ── context compaction ───────────────────────────────────────────────────
+
+    async def summarize_history(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, str]],
+    ) -> str:
+        """
+        Fold `messages` into the running summary. Incremental: only the turns
+        leaving the raw window are sent, alongside the previous summary, so
+        the cost of a compaction doesn't grow with conversation length.
+        """
+        lines = [
+            f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}"
+            for m in messages
+        ]
+        prompt = (
+            f"Current summary:\n{previous_summary or '(none yet)'}\n\n"
+            "New turns to fold in:\n" + "\n".join(lines) + "\n\n"
+            "Return the updated summary."
+        )
+        summary = await self.generate_response(
+            messages=[{"role": "user", "content": prompt}],
+            system_prompt=_COMPACTION_SYSTEM_PROMPT,
+        )
+        return (summary or "").strip()
+
     # ── helpers ──────────────────────────────────────────────────────────────
 
+    def _record_cache_usage(self, session_id: Optional[str], usage) -> None:
+        """Log this turn's and the session's running prompt-cache hit ratio."""
+        if usage is None:
+            return
+        read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        uncached = getattr(usage, "input_tokens", 0) or 0
+        total = read + write + uncached
+
+        key = session_id or "-"
+        stats = self._cache_stats.setdefault(key, {"read": 0, "write": 0, "uncached": 0})
+        stats["read"] += read
+        stats["write"] += write
+        stats["uncached"] += uncached
+        session_total = stats["read"] + stats["write"] + stats["uncached"]
+
+        logger.info(
+            "llm_cache",
+            extra={
+                "session_id": session_id,
+                "cache_read_tokens": read,
+                "cache_create_tokens": write,
+                "in_tokens": uncached,
+                "out_tokens": getattr(usage, "output_tokens", 0),
+                "hit_ratio": round(read / total, 3) if total else 0.0,
+                "session_hit_ratio": round(stats["read"] / session_total, 3) if session_total else 0.0,
+            },
+        )
+
+    def cache_stats(self, session_id: str) -> Optional[Dict[str, int]]:
+        return self._cache_stats.get(session_id)
+
+    def forget_session(self, session_id: str) -> None:
+        self._cache_stats.pop(session_id, None)
+        if self.secondary:
+            self.secondary.forget_session(session_id)
+
     def _log_usage(self, usage, thinking: bool) -> None:
         if usage is None:
             return
@@ -264,4 +921,13 @@ class LLMService:
 
 
 # Global instance
-llm_service = LLMService()
+def _build_secondary() -> Optional[LLMService]:
+    if not settings.LLM_SECONDARY_MODEL:
+        return None
+    return LLMService(
+        provider=settings.LLM_SECONDARY_PROVIDER or settings.LLM_PROVIDER,
+        model=settings.LLM_SECONDARY_MODEL,
+    )
+
+
+llm_service = LLMService(secondary=_build_secondary())
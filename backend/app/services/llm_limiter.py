@@ -0,0 +1,248 @@
+"""
+Per-provider admission control for LLM calls.
+
+Without it every WebSocket turn opened its own stream immediately: a spike
+of sessions became a spike of concurrent requests, the provider answered
+with 429s, and each one surfaced to the user as "Processing failed".
+
+Each provider gets one `ProviderLimiter` (shared by every route/model on
+that provider) combining:
+
+  * a concurrency cap (`LLM_MAX_CONCURRENCY`) — a slot is held for the whole
+    stream, so it bounds open streams, not just request starts;
+  * an input-tokens-per-minute bucket — sized from `LLM_TOKENS_PER_MINUTE`,
+    or learned from the provider's rate-limit response headers when that is
+    unset, and clamped to the `remaining` count the provider reports;
+  * a `retry-after` / reset gate, so after a 429 nobody is admitted until
+    the provider says it's worth trying again.
+
+Callers queue instead of failing; only a wait longer than
+`LLM_ADMISSION_TIMEOUT_SECS` is turned into `LLMAdmissionTimeout` (an
+`LLMRateLimited` that doesn't count against the route's breaker). Queue wait,
+queue depth and in-flight calls are exported as Prometheus metrics.
+
+Usage:
+
+    async with get_limiter("anthropic").admit(estimated_input_tokens):
+        ...  # open and consume the stream
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Mapping, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+LLM_ADMISSION_WAIT = Histogram(
+    "llm_admission_wait_seconds",
+    "Time an LLM call waited for a concurrency slot and token budget",
+    ["provider"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_ADMISSION_QUEUED = Gauge("llm_admission_queued", "LLM calls waiting for admission", ["provider"])
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "LLM calls currently admitted", ["provider"])
+LLM_RATE_LIMIT_RETRIES = Counter(
+    "llm_rate_limit_retries_total", "LLM calls retried after a 429", ["provider"]
+)
+
+# Header names carrying the input-token limit / remaining / reset, per provider.
+_LIMIT_HEADERS = ("anthropic-ratelimit-input-tokens-limit", "x-ratelimit-limit-tokens")
+_REMAINING_HEADERS = ("anthropic-ratelimit-input-tokens-remaining", "x-ratelimit-remaining-tokens")
+_RESET_HEADERS = ("anthropic-ratelimit-input-tokens-reset", "x-ratelimit-reset-tokens")
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _header(headers: Mapping[str, str], names) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value:
+            return value
+    return None
+
+
+def _parse_reset(value: str) -> Optional[float]:
+    """Seconds until reset from an RFC 3339 timestamp (Anthropic) or a
+    Go-style duration like "6m0s" / "250ms" (OpenAI)."""
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return max(0.0, (ts - datetime.now(timezone.utc)).total_seconds())
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def retry_after_secs(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _TokenBucket:
+    """Continuously refilling tokens-per-minute budget."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def delay_for(self, tokens: int) -> float:
+        self._refill()
+        need = min(float(tokens), self.capacity)
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) * 60 / self.capacity
+
+    def take(self, tokens: int) -> None:
+        self.level -= min(float(tokens), self.capacity)
+
+    def clamp(self, remaining: float) -> None:
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class ProviderLimiter:
+    """Concurrency cap + token budget + retry-after gate for one provider."""
+
+    def __init__(self, provider: str, max_concurrency: int, tokens_per_minute: int = 0):
+        self.provider = provider
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._bucket: Optional[_TokenBucket] = (
+            _TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        )
+        self._configured_tpm = tokens_per_minute > 0
+        self._blocked_until = 0.0
+        self._queued = 0
+        self._in_flight = 0
+
+    @asynccontextmanager
+    async def admit(self, tokens: int = 0) -> AsyncIterator[None]:
+        """Hold a slot (and `tokens` of budget) for the duration of the block."""
+        submitted = time.perf_counter()
+        self._set_queued(+1)
+        try:
+            await asyncio.wait_for(self._acquire(tokens), settings.LLM_ADMISSION_TIMEOUT_SECS)
+        except asyncio.TimeoutError:
+            from app.services.llm import LLMAdmissionTimeout
+            raise LLMAdmissionTimeout(
+                f"{self.provider}: no capacity within {settings.LLM_ADMISSION_TIMEOUT_SECS:g}s"
+            )
+        finally:
+            self._set_queued(-1)
+
+        LLM_ADMISSION_WAIT.labels(self.provider).observe(time.perf_counter() - submitted)
+        self._in_flight += 1
+        LLM_IN_FLIGHT.labels(self.provider).set(self._in_flight)
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            LLM_IN_FLIGHT.labels(self.provider).set(self._in_flight)
+            self._slots.release()
+
+    async def _acquire(self, tokens: int) -> None:
+        await self._slots.acquire()
+        try:
+            while True:
+                delay = self._blocked_until - time.monotonic()
+                if self._bucket is not None:
+                    delay = max(delay, self._bucket.delay_for(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(min(delay, 1.0))
+            if self._bucket is not None:
+                self._bucket.take(tokens)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def can_admit_now(self, tokens: int = 0) -> bool:
+        """Whether `admit(tokens)` would go straight through: nobody queued, a
+        free slot, no retry-after gate and enough token budget."""
+        if self._queued or self._slots.locked():
+            return False
+        if self._blocked_until > time.monotonic():
+            return False
+        return self._bucket is None or self._bucket.delay_for(tokens) <= 0
+
+    def _set_queued(self, delta: int) -> None:
+        self._queued += delta
+        LLM_ADMISSION_QUEUED.labels(self.provider).set(self._queued)
+
+    def block_for(self, secs: float) -> None:
+        """Admit nobody for `secs` (e.g. from a 429's retry-after)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + secs)
+
+    def observe_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Fold a response's rate-limit headers into the budget."""
+        if not headers:
+            return
+        try:
+            limit = _header(headers, _LIMIT_HEADERS)
+            if limit and not self._configured_tpm:
+                if self._bucket is None or self._bucket.capacity != float(limit):
+                    self._bucket = _TokenBucket(int(limit))
+            remaining = _header(headers, _REMAINING_HEADERS)
+            if remaining is not None and self._bucket is not None:
+                self._bucket.clamp(float(remaining))
+                if float(remaining) <= 0:
+                    reset = _header(headers, _RESET_HEADERS)
+                    wait = _parse_reset(reset) if reset else None
+                    if wait:
+                        self.block_for(wait)
+            retry_after = retry_after_secs(headers)
+            if retry_after:
+                self.block_for(retry_after)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Ignoring unparseable rate-limit headers from {self.provider}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "tokens_per_minute": self._bucket.capacity if self._bucket else None,
+            "blocked_for_secs": max(0.0, round(self._blocked_until - time.monotonic(), 3)),
+        }
+
+
+_LIMITERS: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    limiter = _LIMITERS.get(provider)
+    if limiter is None:
+        limiter = _LIMITERS[provider] = ProviderLimiter(
+            provider,
+            settings.LLM_MAX_CONCURRENCY,
+            settings.LLM_TOKENS_PER_MINUTE,
+        )
+    return limiter
+
+
+def limiter_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in _LIMITERS.items()}
@@ -0,0 +1,342 @@
+"""
+Long-term memory: retrieval over a user's past exchanges with an avatar.
+
+Rehydrating the raw history only ever covered the current session, and
+replaying it made every prompt grow with the length of the relationship.
+Instead, each completed user/assistant exchange is embedded
+(app/services/embeddings.py) and stored in `memory_embeddings`, scoped to
+the (user, avatar) pair. At the start of a turn the user's message is
+embedded and the `MEMORY_TOP_K` most similar past exchanges — from any
+session — are injected into the prompt, so prompt size stays constant no
+matter how long the user has been talking to the avatar.
+
+The index for a pair is loaded into a NumPy matrix on first use (newest
+`MEMORY_MAX_ENTRIES` rows) and kept in a small LRU; new exchanges are
+appended in place. Anything that needs embedding first — backfilling the
+pair's existing message history when it has no rows yet, or re-embedding
+rows written by a different model — runs as a background task per pair, in
+small batches, and the index is reloaded when it finishes. Until then
+`recall()` answers from whatever is already indexed, so the first turn of
+a long-standing pair never waits on it.
+
+Retrieval over the hashed fallback embedder is lexical, not semantic, so
+memory only stands in for older turns (`active`) when a real model is
+available; otherwise the caller keeps rehydrating the full history window.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.embeddings import Embedder, embedder as default_embedder
+
+logger = logging.getLogger(__name__)
+
+# (user_id, avatar_id) indexes kept in memory at once.
+_MAX_LOADED_INDEXES = 256
+# Exchanges embedded per executor call during background indexing, so
+# interactive encodes (recall queries, semantic cache) interleave with it.
+_INDEX_BATCH = 64
+
+_MEMORY_PREAMBLE = (
+    "Relevant excerpts from earlier conversations with this user "
+    "(use them only if they help; don't mention them otherwise):\n"
+)
+
+
+def _exchange_text(user_text: str, assistant_text: str) -> str:
+    return f"{user_text}\n{assistant_text}"
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+@dataclass
+class Memory:
+    user_text: str
+    assistant_text: str
+    similarity: float = 0.0
+
+    def render(self, limit: int) -> str:
+        return f"- User: {_clip(self.user_text, limit)}\n  You: {_clip(self.assistant_text, limit)}"
+
+
+class _MemoryIndex:
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.memories: List[Memory] = []
+
+    def add(self, vectors: np.ndarray, memories: List[Memory]) -> None:
+        self.vectors = np.vstack([self.vectors, vectors.astype(np.float32)])
+        self.memories.extend(memories)
+        overflow = len(self.memories) - settings.MEMORY_MAX_ENTRIES
+        if overflow > 0:
+            self.vectors = self.vectors[overflow:]
+            del self.memories[:overflow]
+
+
+class MemoryService:
+    """Per-(user, avatar) embedding index over past exchanges, persisted in the DB."""
+
+    def __init__(self, embedder: Optional[Embedder] = None, session_factory=None, allow_hashed: bool = False):
+        self.embedder = embedder or default_embedder
+        self._session_factory = session_factory
+        # Only for exercising retrieval without a model download (tests).
+        self.allow_hashed = allow_hashed
+        self._indexes: "OrderedDict[Tuple[str, str], _MemoryIndex]" = OrderedDict()
+        self._load_locks: dict = {}
+        self._indexing: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> bool:
+        """Enabled, and backed by embeddings good enough to replace raw history."""
+        return settings.MEMORY_ENABLED and (self.allow_hashed or self.embedder.semantic)
+
+    def _db(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    # ── retrieval ─────────────────────────────────────────────────────────────
+
+    async def recall(
+        self,
+        user_id: str,
+        avatar_id: str,
+        query: str,
+        exclude: Iterable[str] = (),
+        k: Optional[int] = None,
+    ) -> List[Memory]:
+        """
+        Top-k past exchanges most similar to `query`. Exchanges whose user
+        text is in `exclude` (typically the turns already in the context
+        window) are skipped.
+        """
+        k = k if k is not None else settings.MEMORY_TOP_K
+        vector = (await self.embedder.encode([query]))[0]
+        index = await self._get_index(user_id, avatar_id, vector.shape[0])
+        if index is None or not index.memories:
+            return []
+
+        sims = index.vectors @ vector
+        skip = set(exclude)
+        found: List[Memory] = []
+        for i in np.argsort(-sims):
+            if sims[i] < settings.MEMORY_MIN_SIMILARITY or len(found) >= k:
+                break
+            memory = index.memories[i]
+            if memory.user_text in skip:
+                continue
+            found.append(Memory(memory.user_text, memory.assistant_text, float(sims[i])))
+        return found
+
+    @staticmethod
+    def format(memories: List[Memory]) -> str:
+        """Render recalled exchanges as a preamble for the user's message."""
+        limit = settings.MEMORY_SNIPPET_CHARS
+        return _MEMORY_PREAMBLE + "\n".join(m.render(limit) for m in memories) + "\n\n"
+
+    # ── indexing ──────────────────────────────────────────────────────────────
+
+    def remember_later(self, *args, **kwargs) -> None:
+        """Fire-and-forget `remember()` so indexing never delays a turn."""
+        task = asyncio.create_task(self.remember(*args, **kwargs))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def remember(
+        self, user_id: str, avatar_id: str, session_id: str, user_text: str, assistant_text: str,
+    ) -> None:
+        """Embed and persist one exchange; best-effort."""
+        try:
+            vector = await self.embedder.encode([_exchange_text(user_text, assistant_text)])
+            from app.models import MemoryEmbedding
+            async with self._db() as db:
+                db.add(MemoryEmbedding(
+                    user_id=user_id,
+                    avatar_id=avatar_id,
+                    session_id=session_id,
+                    user_text=user_text,
+                    assistant_text=assistant_text,
+                    embedding=vector[0].tobytes(),
+                    embedder=self.embedder.backend,
+                ))
+                await db.commit()
+            index = self._indexes.get((user_id, avatar_id))
+            if index is not None and index.vectors.shape[1] == vector.shape[1]:
+                index.add(vector, [Memory(user_text, assistant_text)])
+        except Exception as e:
+            logger.warning(f"Could not index memory for user {user_id} / avatar {avatar_id}: {e}")
+
+    async def _get_index(self, user_id: str, avatar_id: str, dim: int) -> Optional[_MemoryIndex]:
+        key = (user_id, avatar_id)
+        index = self._indexes.get(key)
+        if index is not None and index.vectors.shape[1] == dim:
+            self._indexes.move_to_end(key)
+            return index
+
+        lock = self._load_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(key)
+            if index is None or index.vectors.shape[1] != dim:
+                index, incomplete = await self._load(user_id, avatar_id, dim)
+                self._indexes[key] = index
+                while len(self._indexes) > _MAX_LOADED_INDEXES:
+                    evicted, _ = self._indexes.popitem(last=False)
+                    self._load_locks.pop(evicted, None)
+                if incomplete:
+                    self._start_indexing(user_id, avatar_id, dim)
+        return index
+
+    async def _newest_rows(self, db, user_id: str, avatar_id: str) -> list:
+        from app.models import MemoryEmbedding
+        from sqlalchemy import select
+
+        result = await db.execute(
+            select(MemoryEmbedding)
+            .where(MemoryEmbedding.user_id == user_id)
+            .where(MemoryEmbedding.avatar_id == avatar_id)
+            .order_by(MemoryEmbedding.created_at.desc())
+            .limit(settings.MEMORY_MAX_ENTRIES)
+        )
+        return list(result.scalars().all())[::-1]
+
+    def _is_stale(self, row, dim: int) -> bool:
+        return row.embedder != self.embedder.backend or len(row.embedding) != dim * 4
+
+    async def _load(self, user_id: str, avatar_id: str, dim: int) -> Tuple[_MemoryIndex, bool]:
+        """
+        Index the pair's up-to-date rows. Returns the index and whether
+        background work (backfill or re-embedding) is still needed.
+        """
+        async with self._db() as db:
+            rows = await self._newest_rows(db, user_id, avatar_id)
+            current = [r for r in rows if not self._is_stale(r, dim)]
+            index = _MemoryIndex(dim)
+            if current:
+                index.add(
+                    np.stack([np.frombuffer(r.embedding, dtype=np.float32) for r in current]),
+                    [Memory(r.user_text, r.assistant_text) for r in current],
+                )
+        logger.info(f"Loaded {len(current)} memory(ies) for user {user_id} / avatar {avatar_id}")
+        return index, not rows or len(current) < len(rows)
+
+    def _start_indexing(self, user_id: str, avatar_id: str, dim: int) -> None:
+        key = (user_id, avatar_id)
+        if key in self._indexing:
+            return
+        task = asyncio.create_task(self._complete_index(user_id, avatar_id, dim), name="memory-index")
+        self._indexing[key] = task
+        self._pending.add(task)
+
+        def _done(t: asyncio.Task) -> None:
+            self._pending.discard(t)
+            if self._indexing.get(key) is t:
+                self._indexing.pop(key, None)
+
+        task.add_done_callback(_done)
+
+    async def _complete_index(self, user_id: str, avatar_id: str, dim: int) -> None:
+        """Backfill or re-embed a pair in the background, then reload its index."""
+        try:
+            async with self._db() as db:
+                rows = await self._newest_rows(db, user_id, avatar_id)
+                if not rows:
+                    changed = await self._backfill(db, user_id, avatar_id)
+                else:
+                    stale = [r for r in rows if self._is_stale(r, dim)]
+                    backend = self.embedder.backend
+                    for start in range(0, len(stale), _INDEX_BATCH):
+                        batch = stale[start:start + _INDEX_BATCH]
+                        fresh = await self.embedder.encode(
+                            [_exchange_text(r.user_text, r.assistant_text) for r in batch]
+                        )
+                        for row, vec in zip(batch, fresh):
+                            row.embedding, row.embedder = vec.tobytes(), backend
+                    if stale:
+                        await db.commit()
+                        logger.info(f"Re-embedded {len(stale)} memory(ies) for user {user_id} / avatar {avatar_id}")
+                    changed = len(stale)
+        except Exception as e:
+            logger.warning(f"Could not index memories for user {user_id} / avatar {avatar_id}: {e}")
+            return
+        if changed:
+            # Reloaded on next use, including anything remembered meanwhile.
+            self._indexes.pop((user_id, avatar_id), None)
+
+    async def _backfill(self, db, user_id: str, avatar_id: str) -> int:
+        """Index the pair's most recent message history (first use only)."""
+        from app.models import MemoryEmbedding, Message, Session as SessionModel
+        from sqlalchemy import select
+
+        result = await db.execute(
+            select(Message.session_id, Message.role, Message.content, Message.created_at, Message.id)
+            .join(SessionModel, SessionModel.id == Message.session_id)
+            .where(SessionModel.user_id == user_id)
+            .where(SessionModel.avatar_id == avatar_id)
+            .where(Message.role.in_(("user", "assistant")))
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(settings.MEMORY_MAX_ENTRIES * 2)
+        )
+        # Pair each session's turns in order; sessions may interleave in time.
+        history = sorted(result.all(), key=lambda r: (r.session_id, r.created_at, r.id))
+        exchanges: List[Tuple[object, str, str, str]] = []
+        pending_user: Optional[Tuple[str, str]] = None
+        for session_id, role, content, created_at, _ in history:
+            if role == "user":
+                pending_user = (session_id, content)
+            elif pending_user and pending_user[0] == session_id:
+                exchanges.append((created_at, session_id, pending_user[1], content))
+                pending_user = None
+        exchanges.sort(key=lambda e: e[0])
+        exchanges = exchanges[-settings.MEMORY_MAX_ENTRIES:]
+
+        backend = self.embedder.backend
+        for start in range(0, len(exchanges), _INDEX_BATCH):
+            batch = exchanges[start:start + _INDEX_BATCH]
+            vectors = await self.embedder.encode([_exchange_text(u, a) for _, _, u, a in batch])
+            db.add_all(
+                MemoryEmbedding(
+                    user_id=user_id, avatar_id=avatar_id, session_id=session_id,
+                    user_text=u, assistant_text=a, created_at=created_at,
+                    embedding=vec.tobytes(), embedder=backend,
+                )
+                for (created_at, session_id, u, a), vec in zip(batch, vectors)
+            )
+            await db.commit()
+        if exchanges:
+            logger.info(f"Backfilled {len(exchanges)} memory(ies) for user {user_id} / avatar {avatar_id}")
+        return len(exchanges)
+
+    async def drain(self) -> None:
+        """Wait for background indexing and pending `remember` writes."""
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    def forget_avatar(self, avatar_id: str) -> None:
+        """Drop loaded indexes for a deleted avatar (rows cascade in the DB)."""
+        for key in [k for k in self._indexes if k[1] == avatar_id]:
+            self._indexes.pop(key, None)
+            self._load_locks.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.active,
+            "indexing": len(self._indexing),
+            "loaded_indexes": len(self._indexes),
+            "entries": sum(len(i.memories) for i in self._indexes.values()),
+        }
+
+
+memory_service = MemoryService()
@@ -0,0 +1,177 @@
+"""
+Retention for generated storage objects.
+
+Every sentence of every turn writes a `videos/{session_id}/…` chunk, and
+nothing used to delete them. Now each chunk is recorded in the
+`stored_objects` manifest with its session and an expiry
+(VIDEO_CHUNK_TTL_SECS), and objects are removed in bulk — S3
+`DeleteObjects` or batched unlinks locally — when:
+
+  * the session is ended or deleted (`release_session`), or
+  * they expire (`expire`, run periodically by the Celery beat task
+    `expire_generated_objects`).
+
+Deletion goes through the content store (app/services/content_store.py):
+an object's bytes are only removed once no other key shares them.
+
+Chunks the semantic cache replays are *pinned*: they survive the end of
+their session and expire after SEMANTIC_CACHE_CHUNK_TTL_SECS instead; the
+cache stops replaying them shortly before that (see
+`SemanticCache.can_replay`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+
+from prometheus_client import Counter
+
+from app.config import settings
+from app.services.content_store import content_store
+
+logger = logging.getLogger(__name__)
+
+STORED_OBJECTS_DELETED = Counter(
+    "stored_objects_deleted_total",
+    "Generated storage objects deleted by retention",
+    ["reason"],
+)
+
+# Manifest rows handled per query / bulk delete.
+_BATCH = 1000
+# Upper bound on batches per expiry sweep, so one run can't go on forever.
+_MAX_SWEEP_BATCHES = 50
+
+
+class RetentionService:
+    """Manifest of generated objects, with session- and TTL-based deletion."""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._pending: Set[asyncio.Task] = set()
+
+    def _db(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    def _later(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    # ── recording ─────────────────────────────────────────────────────────────
+
+    def track_later(self, session_id: str, key: str, kind: str = "video_chunk") -> None:
+        """Fire-and-forget `track()` so the manifest write never delays a chunk."""
+        self._later(self.track(session_id, [key], kind))
+
+    async def track(self, session_id: Optional[str], keys: Iterable[str], kind: str = "video_chunk") -> None:
+        from app.models import StoredObject
+
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.VIDEO_CHUNK_TTL_SECS)
+        try:
+            async with self._db() as db:
+                for key in keys:
+                    if await db.get(StoredObject, key) is None:  # may already be pinned
+                        db.add(StoredObject(key=key, session_id=session_id, kind=kind, expires_at=expires_at))
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Could not record generated object(s) for {session_id}: {e}")
+
+    def pin_later(self, keys: Iterable[str]) -> None:
+        self._later(self.pin(list(keys)))
+
+    async def pin(self, keys: List[str]) -> None:
+        """Keep objects past their session's end, until the cache TTL runs out."""
+        from app.models import StoredObject
+
+        if not keys:
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.SEMANTIC_CACHE_CHUNK_TTL_SECS)
+        try:
+            async with self._db() as db:
+                # Upsert: the chunk's own track() may not have landed yet.
+                for key in keys:
+                    await db.merge(StoredObject(key=key, session_id=None, pinned=True, expires_at=expires_at))
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Could not pin {len(keys)} cached object(s): {e}")
+
+    # ── deletion ──────────────────────────────────────────────────────────────
+
+    def release_session_later(self, session_id: str) -> None:
+        """Fire-and-forget `release_session()`; whatever it misses expires later."""
+        async def _run() -> None:
+            try:
+                await self.release_session(session_id)
+            except Exception as e:
+                logger.warning(f"Could not release generated objects of session {session_id}: {e}")
+
+        self._later(_run())
+
+    async def release_session(self, session_id: str) -> int:
+        """Delete a session's unpinned objects now. Returns how many were deleted."""
+        from app.models import StoredObject
+        from sqlalchemy import select
+
+        async with self._db() as db:
+            keys = list((await db.execute(
+                select(StoredObject.key)
+                .where(StoredObject.session_id == session_id)
+                .where(StoredObject.pinned.is_(False))
+            )).scalars())
+        deleted = 0
+        for i in range(0, len(keys), _BATCH):
+            deleted += await self._delete(keys[i:i + _BATCH], "session")
+        if deleted:
+            logger.info(f"Deleted {deleted} generated object(s) of session {session_id}")
+        return deleted
+
+    async def expire(self, now: Optional[datetime] = None) -> int:
+        """Delete objects past their expiry. Returns how many were deleted."""
+        from app.models import StoredObject
+        from sqlalchemy import select
+
+        now = now or datetime.now(timezone.utc)
+        deleted = 0
+        for _ in range(_MAX_SWEEP_BATCHES):
+            async with self._db() as db:
+                keys = list((await db.execute(
+                    select(StoredObject.key)
+                    .where(StoredObject.expires_at <= now)
+                    .order_by(StoredObject.expires_at)
+                    .limit(_BATCH)
+                )).scalars())
+            if not keys:
+                break
+            removed = await self._delete(keys, "expired")
+            deleted += removed
+            if removed < len(keys):
+                break  # some are stuck (upload in flight, delete errors); retry next sweep
+        # Content whose last reference went while its upload was in flight.
+        await content_store.collect()
+        if deleted:
+            logger.info(f"Expired {deleted} generated object(s)")
+        return deleted
+
+    async def _delete(self, keys: List[str], reason: str) -> int:
+        """Release objects (deleting content nothing else uses), then their manifest rows."""
+        from app.models import StoredObject
+        from sqlalchemy import delete
+
+        failed = set(await content_store.release(keys))
+        done = [k for k in keys if k not in failed]
+        if done:
+            async with self._db() as db:
+                await db.execute(delete(StoredObject).where(StoredObject.key.in_(done)))
+                await db.commit()
+            STORED_OBJECTS_DELETED.labels(reason).inc(len(done))
+        return len(done)
+
+
+retention_service = RetentionService()
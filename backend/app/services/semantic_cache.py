@@ -0,0 +1,272 @@
+"""
+Per-avatar semantic response cache.
+
+Avatars deployed as FAQ/kiosk bots hear the same handful of questions all
+day, and every one cost a full LLM call plus TTS and animation. With the
+cache enabled for an avatar (`avatar_metadata["semantic_cache"] = true`),
+each question is embedded (app/services/embeddings.py) and compared against
+that avatar's previous questions; at or above `SEMANTIC_CACHE_THRESHOLD`
+cosine similarity the stored answer is replayed instead. If the entry also
+carries rendered video chunks for the same avatar image, voice and language
+(its `render_key`), those are replayed too and the turn costs nothing.
+Replayed chunks are pinned in storage for SEMANTIC_CACHE_CHUNK_TTL_SECS
+(app/services/retention.py) and stop being offered a little before then.
+
+The cache only serves while a real embedding model is available
+(`Embedder.semantic`). The hashed fallback can't tell a rephrasing from a
+question with the opposite meaning, so without the model every lookup
+misses and a warning is logged once.
+
+The index is an in-memory NumPy matrix per avatar — brute-force dot
+products over at most `SEMANTIC_CACHE_MAX_ENTRIES` rows take microseconds,
+so there's no need for an ANN library. Each index is tagged with a
+fingerprint of the avatar's system prompt and dropped as soon as a lookup
+sees a different prompt, so editing the persona never serves answers
+written under the old one. The metadata endpoint also invalidates
+explicitly.
+
+Lookups are counted in `semantic_cache_lookups_total{result}`; per-avatar
+hit rates are in `stats()` (surfaced on /health/details).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.services.embeddings import Embedder, embedder as default_embedder
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "semantic_cache_lookups_total", "Semantic cache lookups by result", ["result"]
+)
+SEMANTIC_CACHE_ENTRIES = Gauge("semantic_cache_entries", "Cached question/answer pairs")
+SEMANTIC_CACHE_INVALIDATIONS = Counter(
+    "semantic_cache_invalidations_total", "Per-avatar indexes dropped", ["reason"]
+)
+
+# Very short inputs ("yes", "why?") depend on the conversation, not the
+# question, so they're never looked up or stored.
+_MIN_QUESTION_WORDS = 3
+# Stop replaying chunks this long before retention may delete them, so a
+# client that just received their URLs can still fetch them.
+_CHUNK_REPLAY_MARGIN_SECS = 3600
+
+
+def prompt_fingerprint(system_prompt: Optional[str]) -> str:
+    return hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: str
+    language: str
+    # Rendered chunks ({"text", "video_key", "object_key"}) and the
+    # avatar/voice/language they were rendered with; empty until a turn
+    # renders every sentence.
+    chunks: List[dict] = field(default_factory=list)
+    render_key: Optional[str] = None
+    chunks_expire_at: float = 0.0  # wall clock; past it the chunks may be gone
+    hits: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class Probe:
+    """Result of a lookup; pass it back to `store()` on a miss."""
+
+    avatar_id: str
+    fingerprint: str
+    question: str
+    language: str
+    vector: np.ndarray
+    entry: Optional[CacheEntry] = None
+    similarity: float = 0.0
+
+
+class _AvatarIndex:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.vectors: Optional[np.ndarray] = None  # (n, d), unit rows
+        self.entries: List[CacheEntry] = []
+        self.hits = 0
+        self.misses = 0
+
+    def nearest(self, vector: np.ndarray, language: str) -> tuple[Optional[int], float]:
+        if self.vectors is None or not self.entries:
+            return None, 0.0
+        sims = self.vectors @ vector
+        for i, entry in enumerate(self.entries):
+            if entry.language != language:
+                sims[i] = -1.0
+        best = int(np.argmax(sims))
+        return best, float(sims[best])
+
+    def add(self, vector: np.ndarray, entry: CacheEntry) -> None:
+        row = vector[np.newaxis, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+        self.entries.append(entry)
+
+    def evict_lru(self) -> None:
+        victim = min(range(len(self.entries)), key=lambda i: self.entries[i].last_used)
+        del self.entries[victim]
+        self.vectors = np.delete(self.vectors, victim, axis=0)
+
+
+class SemanticCache:
+    """Question→answer cache keyed by embedding similarity, one index per avatar."""
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        embedder: Optional[Embedder] = None,
+        allow_hashed: bool = False,
+    ):
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max(1, max_entries if max_entries is not None else settings.SEMANTIC_CACHE_MAX_ENTRIES)
+        self.embedder = embedder or default_embedder
+        # Only for exercising the index without a model download (tests).
+        self.allow_hashed = allow_hashed
+        self._warned_hashed = False
+        self._indexes: Dict[str, _AvatarIndex] = {}
+
+    def usable(self) -> bool:
+        """Whether similarity from the current embedder is meaningful enough to serve."""
+        if self.allow_hashed or self.embedder.semantic:
+            return True
+        if not self._warned_hashed:
+            self._warned_hashed = True
+            logger.warning(
+                "Semantic cache disabled: no embedding model available (install "
+                "sentence-transformers and set EMBEDDING_MODEL); hashed embeddings "
+                "can't tell rephrasings from different questions"
+            )
+        return False
+
+    @staticmethod
+    def cacheable(question: str) -> bool:
+        return len(question.split()) >= _MIN_QUESTION_WORDS
+
+    def _index(self, avatar_id: str, fingerprint: str) -> _AvatarIndex:
+        index = self._indexes.get(avatar_id)
+        if index is not None and index.fingerprint != fingerprint:
+            logger.info(f"System prompt changed for avatar {avatar_id}; dropping {len(index.entries)} cached answer(s)")
+            SEMANTIC_CACHE_INVALIDATIONS.labels("prompt_changed").inc()
+            self._drop(avatar_id)
+            index = None
+        if index is None:
+            index = self._indexes[avatar_id] = _AvatarIndex(fingerprint)
+        return index
+
+    async def lookup(
+        self, avatar_id: str, system_prompt: Optional[str], question: str, language: str,
+    ) -> Probe:
+        """Embed `question` and return the closest cached answer above the threshold, if any."""
+        fingerprint = prompt_fingerprint(system_prompt)
+        vector = (await self.embedder.encode([question.strip()]))[0]
+        probe = Probe(avatar_id, fingerprint, question, language, vector)
+        if not self.usable():
+            # The model failed to load during this encode; `vector` is hashed.
+            SEMANTIC_CACHE_LOOKUPS.labels("miss").inc()
+            return probe
+
+        index = self._index(avatar_id, fingerprint)
+        if index.vectors is not None and index.vectors.shape[1] != vector.shape[0]:
+            # Embedding backend changed underneath us; old vectors are meaningless.
+            self._drop(avatar_id)
+            index = self._index(avatar_id, fingerprint)
+
+        best, similarity = index.nearest(vector, language)
+        probe.similarity = similarity
+        if best is not None and similarity >= self.threshold:
+            entry = index.entries[best]
+            entry.hits += 1
+            entry.last_used = time.monotonic()
+            probe.entry = entry
+            index.hits += 1
+            SEMANTIC_CACHE_LOOKUPS.labels("hit").inc()
+            logger.info(f"Semantic cache hit for avatar {avatar_id} (similarity {similarity:.3f})")
+        else:
+            index.misses += 1
+            SEMANTIC_CACHE_LOOKUPS.labels("miss").inc()
+        return probe
+
+    def store(self, probe: Probe, answer: str) -> Optional[CacheEntry]:
+        """Cache `answer` for a missed probe. Returns the (new or merged) entry."""
+        index = self._indexes.get(probe.avatar_id)
+        if not self.usable():
+            return None
+        if index is None or index.fingerprint != probe.fingerprint or not answer.strip():
+            return None  # prompt changed while the answer was generated
+        if index.vectors is not None and index.vectors.shape[1] != probe.vector.shape[0]:
+            return None
+
+        best, similarity = index.nearest(probe.vector, probe.language)
+        if best is not None and similarity >= self.threshold:
+            # Another session cached an equivalent question meanwhile.
+            return index.entries[best]
+
+        while len(index.entries) >= self.max_entries:
+            index.evict_lru()
+            SEMANTIC_CACHE_ENTRIES.dec()
+        entry = CacheEntry(question=probe.question, answer=answer, language=probe.language)
+        index.add(probe.vector, entry)
+        SEMANTIC_CACHE_ENTRIES.inc()
+        return entry
+
+    @staticmethod
+    def attach_chunks(entry: CacheEntry, render_key: str, chunks: List[dict]) -> None:
+        """Record a complete rendering of `entry.answer` for replay."""
+        if chunks:
+            ttl = settings.SEMANTIC_CACHE_CHUNK_TTL_SECS
+            entry.chunks = list(chunks)
+            entry.render_key = render_key
+            entry.chunks_expire_at = time.time() + ttl - min(_CHUNK_REPLAY_MARGIN_SECS, ttl / 10)
+
+    @staticmethod
+    def can_replay(entry: CacheEntry, render_key: str) -> bool:
+        """Whether `entry`'s chunks fit this rendering and are still stored."""
+        return bool(entry.chunks) and entry.render_key == render_key and time.time() < entry.chunks_expire_at
+
+    def invalidate(self, avatar_id: str) -> None:
+        if avatar_id in self._indexes:
+            SEMANTIC_CACHE_INVALIDATIONS.labels("explicit").inc()
+            self._drop(avatar_id)
+
+    def _drop(self, avatar_id: str) -> None:
+        index = self._indexes.pop(avatar_id, None)
+        if index is not None:
+            SEMANTIC_CACHE_ENTRIES.dec(len(index.entries))
+
+    def stats(self) -> dict:
+        hits = sum(i.hits for i in self._indexes.values())
+        misses = sum(i.misses for i in self._indexes.values())
+        return {
+            "enabled": settings.SEMANTIC_CACHE_ENABLED and self.usable(),
+            "embedder": self.embedder.backend,
+            "threshold": self.threshold,
+            "entries": sum(len(i.entries) for i in self._indexes.values()),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "avatars": {
+                avatar_id: {
+                    "entries": len(i.entries),
+                    "hit_rate": round(i.hits / (i.hits + i.misses), 3) if i.hits + i.misses else None,
+                }
+                for avatar_id, i in self._indexes.items()
+            },
+        }
+
+
+semantic_cache = SemanticCache()
@@ -4,21 +4,169 @@ Storage service — local filesystem (default) or AWS S3.
 Set USE_LOCAL_STORAGE=false and provide AWS credentials to switch to S3.
 In local mode files are saved under LOCAL_STORAGE_PATH and served via
 FastAPI StaticFiles at /uploads/...
+
+Both backends also accept a file already on disk (`upload_path`) or an
+async iterator of bytes (`upload_stream`), so large artefacts such as video
+chunks are never read into memory whole: locally the file is published
+with a rename (or a hardlink when the caller keeps its copy), and S3
+uploads objects at/above S3_MULTIPART_THRESHOLD_BYTES as a parallel
+multipart upload, holding at most S3_MULTIPART_CONCURRENCY parts in memory.
+Local file I/O runs on the storage executor, never on the event loop.
+
+Objects are private; `client_url(key)` / `sign_url(url)` give the URL to
+hand a client. On S3 that is a presigned GET, signed locally (SigV4 query
+auth, plain HMAC — no botocore request pipeline) and cached per
+S3_PRESIGN_WINDOW_SECS window, so list endpoints can sign hundreds of
+URLs per response for the cost of dict lookups.
 """
 
+import asyncio
+import errno
+import hashlib
+import hmac
 import logging
+import os
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from prometheus_client import Histogram
 
 from app.config import settings
+from app.services.executors import storage_executor
 
 logger = logging.getLogger(__name__)
 
+S3_REQUEST_SECONDS = Histogram(
+    "s3_request_seconds",
+    "Latency of S3 API calls",
+    ["operation", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Keys per bulk delete (the S3 DeleteObjects maximum).
+_DELETE_BATCH = 1000
+
+# Published files are world-readable like any static asset; sources are
+# often owner-only temp files.
+_PUBLISHED_FILE_MODE = 0o644
+
 
 def _local_path(key: str) -> Path:
     return Path(settings.LOCAL_STORAGE_PATH) / key
 
 
+def _write_atomic(dest: Path, data: bytes) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        tmp.write_bytes(data)
+        os.chmod(tmp, _PUBLISHED_FILE_MODE)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _publish_file(src: Path, dest: Path, move: bool) -> str:
+    """
+    Put `src` at `dest` without reading it when possible: rename it (move)
+    or hardlink it (keep), falling back to a copy across filesystems.
+    Always lands atomically. Returns how it was published.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if move:
+        try:
+            os.chmod(src, _PUBLISHED_FILE_MODE)
+            os.replace(src, dest)
+            return "rename"
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        method = "copy"
+        if not move:
+            try:
+                os.link(src, tmp)
+                method = "link"
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+        if method == "copy":
+            shutil.copyfile(src, tmp)
+            os.chmod(tmp, _PUBLISHED_FILE_MODE)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if move:
+        src.unlink(missing_ok=True)
+    return method
+
+
+def _read_part(path: Path, offset: int, size: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+async def _iter_file(path: Path, part_size: int) -> AsyncIterator[bytes]:
+    """Read a file part by part on the storage executor."""
+    offset = 0
+    while True:
+        part = await storage_executor.run(_read_part, path, offset, part_size)
+        if not part:
+            return
+        yield part
+        offset += len(part)
+
+
+async def _rechunk(chunks: AsyncIterable[bytes], size: int) -> AsyncIterator[bytes]:
+    """Regroup arbitrary chunks into `size`-byte parts (the last may be shorter)."""
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    if buf:
+        yield bytes(buf)
+
+
+def _append_chunk(f, chunk: bytes) -> None:
+    f.write(chunk)
+
+
+def _unlink_many(paths: list) -> list:
+    """
+    Remove files (missing ones count as removed), then any directories the
+    removals left empty. Returns the paths that couldn't be removed.
+    """
+    failed = []
+    parents = set()
+    for path in paths:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not delete {path}: {e}")
+            failed.append(path)
+        parents.add(path.parent)
+    root = Path(settings.LOCAL_STORAGE_PATH).resolve()
+    for parent in parents:
+        try:
+            if parent.resolve() != root:
+                parent.rmdir()
+        except OSError:
+            pass  # not empty (or already gone)
+    return failed
+
+
 def _local_url(key: str) -> str:
     return f"{settings.BACKEND_URL}/uploads/{key}"
 
@@ -39,36 +187,197 @@ class LocalStorageService:
         content_type: str = "application/octet-stream",
         metadata: Optional[dict] = None,
     ) -> str:
-        dest = _local_path(key)
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        dest.write_bytes(file_data)
+        await storage_executor.run(_write_atomic, _local_path(key), file_data)
         url = _local_url(key)
         logger.debug(f"Saved {key} → {url}")
         return url
 
+    async def upload_path(
+        self,
+        src_path: str,
+        key: str,
+        content_type: str = "application/octet-stream",
+        metadata: Optional[dict] = None,
+        move: bool = True,
+    ) -> str:
+        """
+        Publish a file that's already on disk. With `move` the source is
+        consumed (renamed into place when on the same filesystem); otherwise
+        it's hardlinked, so neither path copies the bytes.
+        """
+        method = await storage_executor.run(_publish_file, Path(src_path), _local_path(key), move)
+        url = _local_url(key)
+        logger.debug(f"Published {key} by {method} → {url}")
+        return url
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        key: str,
+        content_type: str = "application/octet-stream",
+        metadata: Optional[dict] = None,
+    ) -> str:
+        """Write an async byte stream to `key`, landing atomically when complete."""
+        dest = _local_path(key)
+        await storage_executor.run(dest.parent.mkdir, parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+        f = await storage_executor.run(open, tmp, "wb")
+        try:
+            try:
+                async for chunk in chunks:
+                    await storage_executor.run(_append_chunk, f, chunk)
+            finally:
+                await storage_executor.run(f.close)
+            await storage_executor.run(os.chmod, tmp, _PUBLISHED_FILE_MODE)
+            await storage_executor.run(os.replace, tmp, dest)
+        except BaseException:
+            await storage_executor.run(tmp.unlink, missing_ok=True)
+            raise
+        return _local_url(key)
+
     async def download_file(self, key: str) -> bytes:
         p = _local_path(key)
-        if not p.exists():
+        try:
+            return await storage_executor.run(p.read_bytes)
+        except FileNotFoundError:
             raise FileNotFoundError(f"Local file not found: {key}")
-        return p.read_bytes()
 
     def get_local_path(self, key: str) -> str:
         return str(_local_path(key).resolve())
 
     async def delete_file(self, key: str):
-        _local_path(key).unlink(missing_ok=True)
+        await storage_executor.run(_local_path(key).unlink, missing_ok=True)
+
+    async def delete_many(self, keys: List[str]) -> List[str]:
+        """Delete keys in batches (one executor hop each); returns the keys that failed."""
+        failed: List[str] = []
+        for i in range(0, len(keys), _DELETE_BATCH):
+            batch = keys[i:i + _DELETE_BATCH]
+            paths = {_local_path(k): k for k in batch}
+            failed += [paths[p] for p in await storage_executor.run(_unlink_many, list(paths))]
+        return failed
 
     def get_url(self, key: str) -> str:
         return _local_url(key)
 
+    def client_url(self, key: str, ttl_seconds: Optional[int] = None) -> str:
+        return _local_url(key)
+
+    def sign_url(self, url: Optional[str]) -> Optional[str]:
+        return url
+
     async def cleanup(self):
         logger.info("Local storage cleanup complete")
 
 
+# ── S3 URL signing ────────────────────────────────────────────────────────────
+
+# Presigned URLs kept across windows (LRU); old windows simply age out.
+_PRESIGN_CACHE_SIZE = 10_000
+# SigV4 presigned URLs can't outlive a week.
+_PRESIGN_MAX_EXPIRES = 7 * 24 * 3600
+
+
+def _hmac_sha256(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+class _PresignedUrlCache:
+    """
+    SigV4 presigned GET URLs for one bucket, computed locally and cached by
+    (key, ttl, window). Every URL in a window is signed as of the window's
+    start and stays valid for ttl + window seconds, so whichever moment in
+    the window it's handed out, the client gets at least `ttl` seconds.
+    """
+
+    def __init__(self, bucket: str, region: str, endpoint_url: Optional[str], credentials):
+        self.bucket = bucket
+        self.region = region
+        self._credentials = credentials
+        if endpoint_url:
+            parts = urlsplit(endpoint_url)
+            self._base = f"{parts.scheme}://{parts.netloc}"
+            self._host = parts.netloc
+            self._prefix = f"/{bucket}/"
+        else:
+            self._host = f"{bucket}.s3.{region}.amazonaws.com"
+            self._base = f"https://{self._host}"
+            self._prefix = "/"
+        self._urls: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._signing_keys: dict = {}
+
+    def get(self, key: str, ttl: int) -> Optional[str]:
+        window = max(1, settings.S3_PRESIGN_WINDOW_SECS)
+        now = int(time.time())
+        start = now - now % window
+        cache_key = (key, ttl, start)
+        url = self._urls.get(cache_key)
+        if url is not None:
+            self._urls.move_to_end(cache_key)
+            return url
+        url = self._sign(key, min(ttl + window, _PRESIGN_MAX_EXPIRES), start)
+        if url is not None:
+            self._urls[cache_key] = url
+            if len(self._urls) > _PRESIGN_CACHE_SIZE:
+                self._urls.popitem(last=False)
+        return url
+
+    def _sign(self, key: str, expires: int, signed_at: int) -> Optional[str]:
+        creds = self._credentials.get_frozen_credentials() if self._credentials else None
+        if creds is None or not creds.access_key:
+            return None
+        amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(signed_at))
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        path = self._prefix + quote(key, safe="/~")
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{creds.access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires),
+            "X-Amz-SignedHeaders": "host",
+        }
+        if creds.token:
+            params["X-Amz-Security-Token"] = creds.token
+        query = "&".join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items())
+        )
+        canonical_request = "\n".join(
+            ["GET", path, query, f"host:{self._host}\n", "host", "UNSIGNED-PAYLOAD"]
+        )
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signature = hmac.new(
+            self._signing_key(creds.secret_key, datestamp), string_to_sign.encode(), hashlib.sha256,
+        ).hexdigest()
+        return f"{self._base}{path}?{query}&X-Amz-Signature={signature}"
+
+    def _signing_key(self, secret: str, datestamp: str) -> bytes:
+        cache_key = (secret, datestamp)
+        signing_key = self._signing_keys.get(cache_key)
+        if signing_key is None:
+            k = _hmac_sha256(f"AWS4{secret}".encode(), datestamp)
+            k = _hmac_sha256(k, self.region)
+            k = _hmac_sha256(k, "s3")
+            signing_key = _hmac_sha256(k, "aws4_request")
+            self._signing_keys = {cache_key: signing_key}  # one day's key at a time
+        return signing_key
+
+
 # ── S3 storage ────────────────────────────────────────────────────────────────
 
 class S3StorageService:
-    """AWS S3 storage (used when USE_LOCAL_STORAGE=false)."""
+    """
+    AWS S3 storage (used when USE_LOCAL_STORAGE=false).
+
+    One aiobotocore client is opened in `initialize()` (or on first use, e.g.
+    in a Celery worker) and shared by every call: credentials are resolved
+    once and its aiohttp pool keeps TLS connections alive between requests,
+    instead of paying client construction plus a fresh handshake per object.
+    Call latency is exported as `s3_request_seconds{operation,outcome}`.
+    """
 
     def __init__(self):
         import aioboto3
@@ -77,32 +386,75 @@ class S3StorageService:
         self.bucket_name = settings.S3_BUCKET_NAME
         self.region = settings.AWS_REGION
         self.cloudfront_domain = settings.CLOUDFRONT_DOMAIN
+        self.endpoint_url = settings.S3_ENDPOINT_URL or None
 
-        self.s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=self.region,
-        )
         self.session = aioboto3.Session(
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
             region_name=self.region,
         )
+        self._client = None
+        self._client_cm = None
+        self._client_lock: Optional[asyncio.Lock] = None
+        self._signer = _PresignedUrlCache(
+            self.bucket_name, self.region, self.endpoint_url,
+            boto3.Session(
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+                region_name=self.region,
+            ).get_credentials(),
+        )
+
+    def _client_config(self):
+        from aiobotocore.config import AioConfig
+        return AioConfig(
+            connector_args={"keepalive_timeout": settings.S3_KEEPALIVE_SECS},
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            connect_timeout=settings.S3_CONNECT_TIMEOUT_SECS,
+            read_timeout=settings.S3_READ_TIMEOUT_SECS,
+            retries={"max_attempts": 3, "mode": "standard"},
+            # S3-compatible stand-ins (MinIO, LocalStack) want path-style URLs.
+            s3={"addressing_style": "path"} if self.endpoint_url else None,
+        )
+
+    async def _get_client(self):
+        if self._client is None:
+            if self._client_lock is None:
+                self._client_lock = asyncio.Lock()
+            async with self._client_lock:
+                if self._client is None:
+                    cm = self.session.client(
+                        "s3", endpoint_url=self.endpoint_url, config=self._client_config(),
+                    )
+                    self._client = await cm.__aenter__()
+                    self._client_cm = cm
+        return self._client
+
+    @asynccontextmanager
+    async def _timed(self, operation: str):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            S3_REQUEST_SECONDS.labels(operation, outcome).observe(time.perf_counter() - started)
 
     async def initialize(self):
         from botocore.exceptions import ClientError
         try:
-            async with self.session.client("s3") as s3:
-                try:
+            s3 = await self._get_client()
+            try:
+                async with self._timed("head_bucket"):
                     await s3.head_bucket(Bucket=self.bucket_name)
-                    logger.info(f"S3 bucket {self.bucket_name} exists")
-                except ClientError:
-                    logger.info(f"Creating S3 bucket {self.bucket_name}")
-                    await s3.create_bucket(
-                        Bucket=self.bucket_name,
-                        CreateBucketConfiguration={"LocationConstraint": self.region},
-                    )
+                logger.info(f"S3 bucket {self.bucket_name} exists")
+            except ClientError:
+                logger.info(f"Creating S3 bucket {self.bucket_name}")
+                kwargs: dict = {}
+                if self.region != "us-east-1":  # us-east-1 rejects an explicit constraint
+                    kwargs["CreateBucketConfiguration"] = {"LocationConstraint": self.region}
+                async with self._timed("create_bucket"):
+                    await s3.create_bucket(Bucket=self.bucket_name, **kwargs)
         except Exception as e:
             logger.error(f"Failed to initialise S3: {e}")
             raise
@@ -110,33 +462,150 @@ class S3StorageService:
     async def upload_file(self, file_data: bytes, key: str,
                           content_type: str = "application/octet-stream",
                           metadata: Optional[dict] = None) -> str:
-        async with self.session.client("s3") as s3:
-            # Private by default — keeps avatar images, voice references, and
-            # generated session videos from being world-readable via guessable
-            # URLs. Callers that need a public-facing link should call
-            # `presigned_url(key, ttl_seconds=...)` and pass the result to
-            # the client. CloudFront with origin-access can serve these too.
-            extra: dict = {"ContentType": content_type, "ACL": "private"}
-            if metadata:
-                extra["Metadata"] = metadata
+        s3 = await self._get_client()
+        # Private by default — keeps avatar images, voice references, and
+        # generated session videos from being world-readable via guessable
+        # URLs. Anything handed to a client goes through `client_url()` /
+        # `sign_url()`, which presign it. CloudFront with origin-access can
+        # serve these too.
+        extra: dict = {"ContentType": content_type, "ACL": "private"}
+        if metadata:
+            extra["Metadata"] = metadata
+        async with self._timed("put_object"):
             await s3.put_object(Bucket=self.bucket_name, Key=key, Body=file_data, **extra)
         return self.get_url(key)
 
+    async def upload_path(self, src_path: str, key: str,
+                          content_type: str = "application/octet-stream",
+                          metadata: Optional[dict] = None,
+                          move: bool = True) -> str:
+        """
+        Upload a file from disk. Small files go up in one PUT; larger ones
+        are read a part at a time and sent as a parallel multipart upload.
+        """
+        path = Path(src_path)
+        size = (await storage_executor.run(path.stat)).st_size
+        if size < settings.S3_MULTIPART_THRESHOLD_BYTES:
+            await self.upload_file(
+                await storage_executor.run(path.read_bytes), key, content_type, metadata,
+            )
+        else:
+            await self._multipart_upload(
+                _iter_file(path, settings.S3_MULTIPART_PART_BYTES), key, content_type, metadata,
+            )
+        if move:
+            await storage_executor.run(path.unlink, missing_ok=True)
+        return self.get_url(key)
+
+    async def upload_stream(self, chunks: AsyncIterable[bytes], key: str,
+                            content_type: str = "application/octet-stream",
+                            metadata: Optional[dict] = None) -> str:
+        """
+        Upload from an async byte iterator. Buffers up to the multipart
+        threshold; a stream that ends before it goes up in one PUT.
+        """
+        threshold = settings.S3_MULTIPART_THRESHOLD_BYTES
+        head = bytearray()
+        it = chunks.__aiter__()
+        async for chunk in it:
+            head += chunk
+            if len(head) >= threshold:
+                break
+        else:
+            return await self.upload_file(bytes(head), key, content_type, metadata)
+
+        async def rest() -> AsyncIterator[bytes]:
+            yield bytes(head)
+            async for chunk in it:
+                yield chunk
+
+        parts = _rechunk(rest(), settings.S3_MULTIPART_PART_BYTES)
+        await self._multipart_upload(parts, key, content_type, metadata)
+        return self.get_url(key)
+
+    async def _multipart_upload(self, parts: AsyncIterable[bytes], key: str,
+                                content_type: str, metadata: Optional[dict]) -> None:
+        """
+        Send `parts` as one multipart upload with at most
+        S3_MULTIPART_CONCURRENCY parts in flight (and in memory). The
+        upload is aborted on any failure so S3 doesn't keep orphaned parts.
+        """
+        s3 = await self._get_client()
+        extra: dict = {"ContentType": content_type, "ACL": "private"}
+        if metadata:
+            extra["Metadata"] = metadata
+        async with self._timed("create_multipart_upload"):
+            created = await s3.create_multipart_upload(Bucket=self.bucket_name, Key=key, **extra)
+        upload_id = created["UploadId"]
+        slots = asyncio.Semaphore(max(1, settings.S3_MULTIPART_CONCURRENCY))
+        tasks: list = []
+
+        async def send(number: int, body: bytes) -> dict:
+            try:
+                async with self._timed("upload_part"):
+                    resp = await s3.upload_part(
+                        Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+                        PartNumber=number, Body=body,
+                    )
+                return {"PartNumber": number, "ETag": resp["ETag"]}
+            finally:
+                slots.release()
+
+        try:
+            number = 0
+            async for body in parts:
+                await slots.acquire()
+                failed = next((t for t in tasks if t.done() and t.exception()), None)
+                if failed is not None:
+                    slots.release()
+                    break
+                number += 1
+                tasks.append(asyncio.create_task(send(number, body)))
+            uploaded = await asyncio.gather(*tasks)
+            async with self._timed("complete_multipart_upload"):
+                await s3.complete_multipart_upload(
+                    Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+                    MultipartUpload={"Parts": uploaded},
+                )
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                async with self._timed("abort_multipart_upload"):
+                    await s3.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            except Exception as e:
+                logger.warning(f"Could not abort multipart upload of {key}: {e}")
+            raise
+        logger.debug(f"Multipart upload of {key} complete ({number} parts)")
+
     async def presigned_url(self, key: str, ttl_seconds: int = 3600) -> str:
+        """Time-limited signed GET URL for an object (see `client_url`)."""
+        return self._signer.get(key, ttl_seconds) or self.get_url(key)
+
+    def client_url(self, key: str, ttl_seconds: Optional[int] = None) -> str:
         """
-        Generate a time-limited signed URL for an S3 object. Used by the
-        WebSocket pipeline when handing video chunk URLs to the client —
-        clients get a short-lived token instead of a permanent reference.
+        URL to hand a client for a private object: presigned (cached per
+        window) unless served through CloudFront or presigning is off.
         """
-        # boto3's generate_presigned_url is sync but cheap (no network call).
-        return self.s3_client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": self.bucket_name, "Key": key},
-            ExpiresIn=ttl_seconds,
-        )
+        if self.cloudfront_domain or not settings.S3_PRESIGN_URLS:
+            return self.get_url(key)
+        url = self._signer.get(key, ttl_seconds or settings.S3_PRESIGN_TTL_SECS)
+        if url is None:
+            logger.warning("No AWS credentials available to presign URLs; handing out unsigned URLs")
+            return self.get_url(key)
+        return url
+
+    def sign_url(self, url: Optional[str]) -> Optional[str]:
+        """`client_url` for a stored `get_url()` value; other URLs pass through."""
+        prefix = self.get_url("")
+        if url and url.startswith(prefix) and len(url) > len(prefix):
+            return self.client_url(url[len(prefix):])
+        return url
 
     async def download_file(self, key: str) -> bytes:
-        async with self.session.client("s3") as s3:
+        s3 = await self._get_client()
+        async with self._timed("get_object"):
             resp = await s3.get_object(Bucket=self.bucket_name, Key=key)
             async with resp["Body"] as stream:
                 return await stream.read()
@@ -145,15 +614,37 @@ class S3StorageService:
         raise NotImplementedError("S3 has no local path; use download_file()")
 
     async def delete_file(self, key: str):
-        async with self.session.client("s3") as s3:
+        s3 = await self._get_client()
+        async with self._timed("delete_object"):
             await s3.delete_object(Bucket=self.bucket_name, Key=key)
 
+    async def delete_many(self, keys: List[str]) -> List[str]:
+        """Delete keys with DeleteObjects, 1000 per request; returns the keys that failed."""
+        s3 = await self._get_client()
+        failed: List[str] = []
+        for i in range(0, len(keys), _DELETE_BATCH):
+            batch = keys[i:i + _DELETE_BATCH]
+            async with self._timed("delete_objects"):
+                resp = await s3.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+                )
+            for err in resp.get("Errors", []):
+                failed.append(err.get("Key"))
+                logger.warning(f"S3 could not delete {err.get('Key')}: {err.get('Code')} {err.get('Message')}")
+        return failed
+
     def get_url(self, key: str) -> str:
         if self.cloudfront_domain:
             return f"https://{self.cloudfront_domain}/{key}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket_name}/{key}"
         return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{key}"
 
     async def cleanup(self):
+        cm, self._client_cm, self._client = self._client_cm, None, None
+        if cm is not None:
+            await cm.__aexit__(None, None, None)
         logger.info("S3 storage cleanup complete")
 
 
@@ -4,30 +4,242 @@ Speech-to-text service backed by faster-whisper.
 The Whisper model is several hundred MB and takes 30–60 s to load on a cold
 start. We defer loading until the first transcription so FastAPI's lifespan
 hook stays fast and the /health endpoint becomes available promptly.
+
+Batched mode (`STT_BATCH_ENABLED=true`) trades a few tens of milliseconds of
+latency for throughput under concurrency: clips arriving within
+`STT_BATCH_WINDOW_MS` of each other are decoded together through
+faster-whisper's `BatchedInferencePipeline` instead of each session's thread
+contending for the model separately.
+
+Decoding strategy is picked by load (`STT_DECODE_POLICY`): beam search while
+quiet, greedy once `STT_GREEDY_LOAD_THRESHOLD` clips are in flight/batched.
+On top of that sits a per-call profile (`STT_PROFILE`, overridable per
+session): "accuracy" keeps the above, "latency" decodes greedily with a
+shorter VAD silence window and routes short clips to `WHISPER_FAST_MODEL`,
+"auto" switches to latency under load. In batched mode the profile only
+controls greedy vs. beam — the batch pipeline is bound to the main model.
+
+Pass `language=None` to auto-detect; `transcribe_detailed` reports the
+detected language and its probability so callers can pin it.
+
+Audio never touches disk: browser WebM/Opus is decoded in memory by PyAV
+(falling back to an ffmpeg stdin→stdout pipe) straight to 16 kHz mono
+float32. Plain PCM containers (WAV/FLAC/AIFF) go through soundfile and a
+polyphase resampler whose FIR taps are cached per rate pair.
 """
 
 from __future__ import annotations
 
 import asyncio
+import bisect
+import functools
 import io
 import logging
-from typing import Optional, Union
+import math
+import subprocess
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Union
 
 import numpy as np
 import soundfile as sf
+from scipy.signal import firwin, resample_poly
+
+try:  # PyAV ships with faster-whisper; the ffmpeg pipe covers its absence.
+    import av
+except ImportError:  # pragma: no cover
+    av = None
 
 from app.config import settings
+from app.services.executors import stt_executor
 
 logger = logging.getLogger(__name__)
 
+_SAMPLE_RATE = 16000
+# Whisper's encoder window — speech regions longer than this are split.
+_MAX_REGION_SECS = 30
+_BEAM_SIZE = 5
+_GREEDY_BEAM_SIZE = 1
+_VAD_SILENCE_MS = 500
+_PROFILES = ("accuracy", "latency", "auto")
+
+# Containers libsndfile decodes natively. Anything else (WebM/Opus from the
+# browser's MediaRecorder, MP3, AAC…) goes through PyAV / ffmpeg.
+_PCM_MAGIC = (b"RIFF", b"RIFX", b"fLaC", b"FORM")
+_PCM_SUFFIXES = (".wav", ".flac", ".aiff", ".aif")
+
+
+@functools.lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int) -> np.ndarray:
+    """Low-pass FIR for an up/down ratio — same design resample_poly uses,
+    built once per ratio instead of on every clip."""
+    max_rate = max(up, down)
+    return firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+
+
+def _resample(audio: np.ndarray, orig_sr: int) -> np.ndarray:
+    if orig_sr == _SAMPLE_RATE:
+        return audio
+    g = math.gcd(orig_sr, _SAMPLE_RATE)
+    up, down = _SAMPLE_RATE // g, orig_sr // g
+    return resample_poly(audio, up, down, window=_polyphase_filter(up, down))
+
+
+def _is_pcm(audio_data: Union[bytes, str]) -> bool:
+    if isinstance(audio_data, bytes):
+        return audio_data[:4] in _PCM_MAGIC
+    return audio_data.lower().endswith(_PCM_SUFFIXES)
+
+
+def _decode_av(audio_data: Union[bytes, str]) -> np.ndarray:
+    """Decode any container/codec PyAV understands to 16 kHz mono float32."""
+    source = io.BytesIO(audio_data) if isinstance(audio_data, bytes) else audio_data
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=_SAMPLE_RATE)
+    chunks: List[np.ndarray] = []
+    with av.open(source, mode="r", metadata_errors="ignore") as container:
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+        for out in resampler.resample(None):  # flush
+            chunks.append(out.to_ndarray().reshape(-1))
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32, copy=False)
+
+
+def _decode_ffmpeg(audio_data: Union[bytes, str]) -> np.ndarray:
+    """Same as `_decode_av` via an ffmpeg subprocess — stdin in, raw f32le out."""
+    src = "pipe:0" if isinstance(audio_data, bytes) else audio_data
+    proc = subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-i", src,
+            "-f", "f32le", "-ac", "1", "-ar", str(_SAMPLE_RATE), "pipe:1",
+        ],
+        input=audio_data if isinstance(audio_data, bytes) else None,
+        capture_output=True,
+        check=True,
+        timeout=30,
+    )
+    return np.frombuffer(proc.stdout, dtype=np.float32).copy()
+
+
+@dataclass(frozen=True)
+class DecodeProfile:
+    name: str
+    beam_size: int
+    vad_silence_ms: int
+    use_fast_model: bool = False
+
+
+@dataclass
+class Transcription:
+    text: str
+    language: Optional[str]
+    # 1.0 when the caller fixed the language rather than letting Whisper detect it.
+    language_probability: float = 1.0
+
+
+@dataclass
+class _PendingClip:
+    audio: np.ndarray
+    language: Optional[str]
+    greedy: bool
+    future: "asyncio.Future[str]"
+
+
+class BatchCollector:
+    """
+    Groups clips submitted within a short window and hands them to a
+    synchronous batch runner on the STT pool.
+
+    `runner(clips, language, beam_size)` must return one transcript per clip,
+    in order. Clips are grouped by language because a Whisper batch shares a
+    single decoder prompt, and by `greedy` so latency-profile clips aren't
+    held to beam search by their neighbours.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[List[np.ndarray], Optional[str], int], List[str]],
+        beam_size_for: Callable[[int], int],
+        window_ms: int,
+        max_batch: int,
+    ):
+        self._runner = runner
+        self._beam_size_for = beam_size_for
+        self._window = max(0, window_ms) / 1000
+        self._max_batch = max(1, max_batch)
+        self._pending: List[_PendingClip] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, audio: np.ndarray, language: Optional[str], greedy: bool = False) -> str:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[str] = loop.create_future()
+        self._pending.append(_PendingClip(audio, language, greedy, future))
+
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch = [p for p in self._pending if not p.future.cancelled()]
+        self._pending = []
+
+        groups: dict[tuple, List[_PendingClip]] = {}
+        for clip in batch:
+            groups.setdefault((clip.language, clip.greedy), []).append(clip)
+
+        for (language, greedy), clips in groups.items():
+            for start in range(0, len(clips), self._max_batch):
+                task = asyncio.create_task(
+                    self._run(clips[start:start + self._max_batch], language, greedy),
+                    name=f"stt-batch-{language}",
+                )
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, clips: List[_PendingClip], language: Optional[str], greedy: bool = False) -> None:
+        beam_size = _GREEDY_BEAM_SIZE if greedy else self._beam_size_for(len(clips))
+        try:
+            texts = await stt_executor.run(
+                self._runner, [c.audio for c in clips], language, beam_size
+            )
+        except Exception as e:
+            for c in clips:
+                if not c.future.done():
+                    c.future.set_exception(e)
+            return
+        logger.info(f"Batched STT decoded {len(clips)} clip(s) (lang={language}, beam={beam_size})")
+        for c, text in zip(clips, texts):
+            if not c.future.done():
+                c.future.set_result(text)
+
 
 class STTService:
     def __init__(self):
         self.provider = settings.STT_PROVIDER
         self.model_name = settings.WHISPER_MODEL
         self.model = None
-        # Lock ensures the model is loaded exactly once even under burst load.
+        self.batched = None
+        # Smaller tier for the latency profile — loaded on first use.
+        self.fast_model = None
+        self._fast_model_failed = False
+        # Lock ensures each model is loaded exactly once even under burst load.
         self._load_lock: Optional[asyncio.Lock] = None
+        self._in_flight = 0
+        self._collector: Optional[BatchCollector] = None
+        if settings.STT_BATCH_ENABLED:
+            self._collector = BatchCollector(
+                self._transcribe_batch_sync,
+                self._beam_size_for,
+                window_ms=settings.STT_BATCH_WINDOW_MS,
+                max_batch=settings.STT_BATCH_MAX_SIZE,
+            )
 
     def _check_cuda(self) -> bool:
         try:
@@ -36,66 +248,220 @@ class STTService:
         except Exception:
             return False
 
-    def _build_model(self):
+    def _build_model(self, model_name: Optional[str] = None):
         """Synchronous model load — run inside a thread to avoid blocking the loop."""
         from faster_whisper import WhisperModel
+        model_name = model_name or self.model_name
         device = "cuda" if self._check_cuda() else "cpu"
         compute_type = "float16" if device == "cuda" else "int8"
-        logger.info(f"Loading Whisper model {self.model_name!r} on {device} ({compute_type})…")
-        model = WhisperModel(self.model_name, device=device, compute_type=compute_type)
-        logger.info("Whisper model loaded")
+        logger.info(f"Loading Whisper model {model_name!r} on {device} ({compute_type})…")
+        model = WhisperModel(model_name, device=device, compute_type=compute_type)
+        logger.info(f"Whisper model {model_name!r} loaded")
         return model
 
+    def _get_load_lock(self) -> asyncio.Lock:
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        return self._load_lock
+
     async def initialize(self) -> None:
         """Eager warm-up. Optional — `transcribe` will load on first call too."""
         if self.model is not None or self.provider != "whisper":
             return
-        if self._load_lock is None:
-            self._load_lock = asyncio.Lock()
-        async with self._load_lock:
+        async with self._get_load_lock():
             if self.model is None:
-                self.model = await asyncio.to_thread(self._build_model)
+                model = await stt_executor.run(self._build_model)
+                if self._collector is not None:
+                    from faster_whisper import BatchedInferencePipeline
+                    self.batched = BatchedInferencePipeline(model=model)
+                self.model = model
+
+    async def _get_fast_model(self):
+        """The WHISPER_FAST_MODEL tier, falling back to the main model if it won't load."""
+        if self.fast_model is None and not self._fast_model_failed:
+            async with self._get_load_lock():
+                if self.fast_model is None and not self._fast_model_failed:
+                    try:
+                        self.fast_model = await stt_executor.run(
+                            self._build_model, settings.WHISPER_FAST_MODEL
+                        )
+                    except Exception as e:
+                        logger.warning(f"Fast Whisper model unavailable, using main model: {e}")
+                        self._fast_model_failed = True
+        return self.fast_model or self.model
 
-    async def transcribe(self, audio_data: Union[bytes, str], language: str = "en") -> str:
+    def _beam_size_for(self, load: int) -> int:
+        """Beam search while quiet, greedy under load (per STT_DECODE_POLICY)."""
+        policy = settings.STT_DECODE_POLICY
+        if policy == "greedy":
+            return _GREEDY_BEAM_SIZE
+        if policy == "auto" and load >= settings.STT_GREEDY_LOAD_THRESHOLD:
+            return _GREEDY_BEAM_SIZE
+        return _BEAM_SIZE
+
+    def _resolve_profile(self, requested: Optional[str], duration: float, load: int) -> DecodeProfile:
+        """Turn a profile name (session override or STT_PROFILE) into decode settings."""
+        name = requested if requested in _PROFILES else settings.STT_PROFILE
+        if name == "auto":
+            name = "latency" if load >= settings.STT_GREEDY_LOAD_THRESHOLD else "accuracy"
+        if name == "latency":
+            fast = settings.WHISPER_FAST_MODEL
+            return DecodeProfile(
+                "latency",
+                _GREEDY_BEAM_SIZE,
+                settings.STT_LATENCY_VAD_SILENCE_MS,
+                use_fast_model=bool(fast) and fast != self.model_name
+                and duration <= settings.STT_SHORT_CLIP_SECS,
+            )
+        return DecodeProfile("accuracy", self._beam_size_for(load), _VAD_SILENCE_MS)
+
+    async def transcribe(self, audio_data: Union[bytes, str], language: Optional[str] = "en") -> str:
+        return (await self.transcribe_detailed(audio_data, language)).text
+
+    async def transcribe_detailed(
+        self,
+        audio_data: Union[bytes, str],
+        language: Optional[str] = None,
+        profile: Optional[str] = None,
+    ) -> Transcription:
+        """
+        Transcribe a clip. `language=None` auto-detects; `profile` overrides
+        STT_PROFILE for this call (accuracy | latency | auto).
+        """
         if self.provider != "whisper":
             raise ValueError(f"Unsupported STT provider: {self.provider}")
         if self.model is None:
             await self.initialize()
-        return await asyncio.to_thread(self._transcribe_sync, audio_data, language)
 
-    def _transcribe_sync(self, audio_data: Union[bytes, str], language: str) -> str:
+        self._in_flight += 1
         try:
-            if isinstance(audio_data, bytes):
-                audio, sample_rate = sf.read(io.BytesIO(audio_data))
-            else:
-                audio, sample_rate = sf.read(audio_data)
+            audio = await stt_executor.run(self._load_audio, audio_data)
+            decode = self._resolve_profile(profile, len(audio) / _SAMPLE_RATE, self._in_flight)
+
+            if self._collector is not None:
+                probability = 1.0
+                if language is None:
+                    language, probability = await stt_executor.run(self._detect_language_sync, audio)
+                text = await self._collector.submit(audio, language, greedy=decode.name == "latency")
+                return Transcription(text, language, probability)
 
-            # Mono mixdown
-            if len(audio.shape) > 1:
-                audio = audio.mean(axis=1)
+            model = await self._get_fast_model() if decode.use_fast_model else self.model
+            return await stt_executor.run(self._transcribe_sync, model, audio, language, decode)
+        finally:
+            self._in_flight -= 1
 
-            # Resample to 16 kHz (Whisper's expected rate)
-            if sample_rate != 16000:
-                import librosa
-                audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=16000)
+    def _load_audio(self, audio_data: Union[bytes, str]) -> np.ndarray:
+        """Decode to 16 kHz mono float32 — the format Whisper expects."""
+        if not _is_pcm(audio_data):
+            if av is not None:
+                return _decode_av(audio_data)
+            return _decode_ffmpeg(audio_data)
 
-            audio = audio.astype(np.float32)
+        source = io.BytesIO(audio_data) if isinstance(audio_data, bytes) else audio_data
+        audio, sample_rate = sf.read(source, dtype="float32", always_2d=True)
 
-            assert self.model is not None  # for type checker
-            segments, info = self.model.transcribe(
+        # Mono mixdown
+        audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+
+        # Resample to 16 kHz (Whisper's expected rate)
+        return _resample(audio, sample_rate).astype(np.float32, copy=False)
+
+    def _detect_language_sync(self, audio: np.ndarray) -> tuple[Optional[str], float]:
+        """Language ID on the speech portion of a clip; (None, 0.0) if there is none."""
+        assert self.model is not None  # for type checker
+        try:
+            language, probability, _ = self.model.detect_language(
+                audio,
+                vad_filter=True,
+                vad_parameters=dict(min_silence_duration_ms=_VAD_SILENCE_MS),
+            )
+        except ValueError:
+            # No speech regions survived VAD — nothing to detect from.
+            return None, 0.0
+        return language, probability
+
+    def _transcribe_sync(
+        self,
+        model,
+        audio: np.ndarray,
+        language: Optional[str],
+        decode: DecodeProfile,
+    ) -> Transcription:
+        try:
+            segments, info = model.transcribe(
                 audio,
                 language=language,
-                beam_size=5,
+                beam_size=decode.beam_size,
                 vad_filter=True,
-                vad_parameters=dict(min_silence_duration_ms=500),
+                vad_parameters=dict(min_silence_duration_ms=decode.vad_silence_ms),
             )
             transcription = " ".join(seg.text for seg in segments).strip()
-            logger.info(f"Transcribed {len(transcription)} chars (lang={info.language})")
-            return transcription
+            logger.info(
+                f"Transcribed {len(transcription)} chars (lang={info.language}, "
+                f"profile={decode.name}, beam={decode.beam_size})"
+            )
+            return Transcription(
+                transcription,
+                info.language,
+                1.0 if language else info.language_probability,
+            )
 
         except Exception as e:
             logger.error(f"Whisper transcription error: {e}")
             raise
 
+    def _transcribe_batch_sync(
+        self,
+        clips: List[np.ndarray],
+        language: Optional[str],
+        beam_size: int,
+    ) -> List[str]:
+        """
+        Decode several clips in one BatchedInferencePipeline call.
+
+        Clips are laid end to end and each clip's VAD speech regions are passed
+        as `clip_timestamps`, so every region is decoded as its own batch item
+        and never bleeds into a neighbouring clip. Segments are mapped back to
+        their clip by start offset.
+        """
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        vad = VadOptions(min_silence_duration_ms=_VAD_SILENCE_MS, max_speech_duration_s=_MAX_REGION_SECS)
+        region_starts: List[float] = []
+        regions: List[dict] = []
+        owners: List[int] = []
+        offset = 0
+        for idx, clip in enumerate(clips):
+            for ts in get_speech_timestamps(clip, vad):
+                start, end = offset + ts["start"], offset + ts["end"]
+                region_starts.append(start / _SAMPLE_RATE)
+                regions.append({"start": start / _SAMPLE_RATE, "end": end / _SAMPLE_RATE})
+                owners.append(idx)
+            offset += len(clip)
+
+        texts: List[List[str]] = [[] for _ in clips]
+        if not regions:
+            return ["" for _ in clips]
+
+        try:
+            assert self.batched is not None  # for type checker
+            segments, _ = self.batched.transcribe(
+                np.concatenate(clips),
+                language=language,
+                multilingual=language is None,
+                beam_size=beam_size,
+                clip_timestamps=regions,
+                batch_size=min(len(regions), settings.STT_BATCH_MAX_SIZE),
+            )
+            for seg in segments:
+                # Small epsilon: segment starts are rounded to the millisecond.
+                region = max(0, bisect.bisect_right(region_starts, seg.start + 1e-3) - 1)
+                texts[owners[region]].append(seg.text)
+        except Exception as e:
+            logger.error(f"Batched Whisper transcription error: {e}")
+            raise
+
+        return [" ".join(t).strip() for t in texts]
+
 
 stt_service = STTService()
@@ -0,0 +1,233 @@
+"""
+Background conversation summaries (`POST /conversations/{id}/summarize`).
+
+The endpoint used to load every message of the session, render the
+transcript in Python and wait on the LLM inside the request — so a few
+impatient clicks meant a few full-price LLM calls. Now:
+
+  * **Celery job** — the endpoint enqueues `summarize_conversation` on the
+    worker and returns immediately with the job id/status; clients poll
+    `GET /conversations/{id}/summarize/{job_id}`.
+  * **Coalescing** — a Redis `SET NX` key per conversation holds the
+    in-flight job id, so concurrent requests (other tabs, other API
+    replicas) attach to the same job instead of starting another. The
+    worker clears the key when the job finishes; its TTL is a backstop.
+  * **Tail-only fetch** — the transcript is streamed newest-first from SQL
+    and reading stops once `SUMMARY_MAX_INPUT_CHARS` is filled, instead of
+    loading the full history and truncating afterwards.
+
+Without Redis or a reachable broker (local dev), jobs run in-process as
+asyncio tasks with the same coalescing per API process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.cache import cache_service
+
+logger = logging.getLogger(__name__)
+
+_JOB_KEY = "summary_job:{}"
+
+# Rows per round trip while streaming the transcript tail.
+_FETCH_BATCH = 100
+
+_SUMMARY_SYSTEM_PROMPT = "You write concise neutral summaries."
+
+_SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below in 2–3 short sentences. "
+    "Focus on what was discussed and any conclusions or decisions. "
+    "Write in third person. Do not start with 'This conversation' "
+    "or 'The user'. No preamble.\n\n"
+)
+
+# Celery states → what the API reports.
+_CELERY_STATUS = {
+    "PENDING": "queued",
+    "RECEIVED": "queued",
+    "RETRY": "queued",
+    "STARTED": "running",
+    "SUCCESS": "done",
+    "FAILURE": "failed",
+    "REVOKED": "failed",
+}
+
+# In-process fallback jobs: job id → task, conversation id → job id.
+# Finished tasks are kept (for status polls) up to this many jobs.
+_MAX_LOCAL_JOBS = 256
+_local_tasks: Dict[str, asyncio.Task] = {}
+_local_inflight: Dict[str, str] = {}
+
+
+@dataclass
+class SummaryJob:
+    job_id: str
+    status: str
+    coalesced: bool = False
+
+
+async def fetch_transcript_tail(db, session_id: str, max_chars: int) -> Tuple[List[str], bool]:
+    """
+    Newest transcript lines that fit in `max_chars`, in chronological order,
+    and whether older lines were left out. Rows are streamed newest-first so
+    only the tail is ever read.
+    """
+    from app.models import Message
+    from sqlalchemy import select
+
+    stmt = (
+        select(Message.role, Message.content)
+        .where(Message.session_id == session_id)
+        .where(Message.role.in_(("user", "assistant")))
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .execution_options(yield_per=_FETCH_BATCH)
+    )
+    lines: List[str] = []
+    used = 0
+    truncated = False
+    result = await db.stream(stmt)
+    try:
+        async for role, content in result:
+            line = f"{'User' if role == 'user' else 'Assistant'}: {content}"
+            if used + len(line) + 1 > max_chars:
+                if not lines:  # a single huge turn: keep its end
+                    lines.append(line[-max_chars:])
+                truncated = True
+                break
+            lines.append(line)
+            used += len(line) + 1
+    finally:
+        await result.close()
+    lines.reverse()
+    return lines, truncated
+
+
+async def summarize_conversation(conversation_id: str, session_factory=None) -> Optional[str]:
+    """Summarize a conversation's transcript tail and persist it. Returns the summary."""
+    from app.api.caching import invalidate_routes
+    from app.models import Conversation, Session
+    from app.services.llm import llm_service
+    from sqlalchemy import select
+
+    if session_factory is None:
+        from app.database import AsyncSessionLocal as session_factory
+
+    async with session_factory() as db:
+        conversation = (
+            await db.execute(select(Conversation).where(Conversation.id == conversation_id))
+        ).scalar_one_or_none()
+        if conversation is None:
+            logger.info(f"Conversation {conversation_id} vanished before it could be summarized")
+            return None
+
+        lines, truncated = await fetch_transcript_tail(
+            db, conversation.session_id, settings.SUMMARY_MAX_INPUT_CHARS,
+        )
+        if not lines:
+            return None
+        transcript = "\n".join(lines)
+        if truncated:
+            transcript = "[…earlier turns truncated…]\n" + transcript
+
+        summary = await llm_service.generate_response(
+            messages=[{"role": "user", "content": _SUMMARY_INSTRUCTIONS + transcript}],
+            system_prompt=_SUMMARY_SYSTEM_PROMPT,
+        )
+        conversation.summary = (summary or "").strip()
+        await db.commit()
+        user_id = (
+            await db.execute(select(Session.user_id).where(Session.id == conversation.session_id))
+        ).scalar_one_or_none()
+        await invalidate_routes(user_id, "conversations")
+        logger.info(f"Conversation {conversation_id} summarized ({len(lines)} turns)")
+        return conversation.summary
+
+
+# ── job dispatch ──────────────────────────────────────────────────────────────
+
+async def enqueue_summary(conversation_id: str) -> SummaryJob:
+    """Start a summary job for the conversation, or join the one in flight."""
+    key = _JOB_KEY.format(conversation_id)
+    redis = cache_service.redis
+    if redis is not None:
+        job_id = uuid.uuid4().hex
+        try:
+            claimed = await redis.set(key, job_id, nx=True, ex=settings.SUMMARY_JOB_TTL_SECS)
+            if not claimed:
+                existing = await redis.get(key)
+                if existing:
+                    return SummaryJob(existing, job_status(existing), coalesced=True)
+                claimed = await redis.set(key, job_id, nx=True, ex=settings.SUMMARY_JOB_TTL_SECS)
+            if claimed:
+                try:
+                    from app.celery_app import celery_app
+                    celery_app.send_task(
+                        "summarize_conversation", args=[conversation_id], task_id=job_id, retry=False,
+                    )
+                    return SummaryJob(job_id, "queued")
+                except Exception as e:
+                    await redis.delete(key)
+                    logger.warning(f"Celery unavailable, summarizing {conversation_id} in-process: {e}")
+        except Exception as e:
+            logger.warning(f"Summary job coalescing unavailable for {conversation_id}: {e}")
+    return _enqueue_local(conversation_id)
+
+
+def _enqueue_local(conversation_id: str) -> SummaryJob:
+    job_id = _local_inflight.get(conversation_id)
+    if job_id is not None:
+        return SummaryJob(job_id, job_status(job_id), coalesced=True)
+
+    if len(_local_tasks) >= _MAX_LOCAL_JOBS:
+        for done_id in [j for j, t in _local_tasks.items() if t.done()]:
+            _local_tasks.pop(done_id, None)
+
+    job_id = f"local-{uuid.uuid4().hex}"
+    task = asyncio.create_task(summarize_conversation(conversation_id), name=f"summary-{conversation_id}")
+    _local_tasks[job_id] = task
+    _local_inflight[conversation_id] = job_id
+
+    def _done(t: asyncio.Task) -> None:
+        if _local_inflight.get(conversation_id) == job_id:
+            _local_inflight.pop(conversation_id, None)
+        if not t.cancelled() and t.exception() is not None:
+            logger.error(f"Summary job {job_id} failed: {t.exception()}")
+
+    task.add_done_callback(_done)
+    return SummaryJob(job_id, "queued")
+
+
+def job_status(job_id: str) -> str:
+    """queued | running | done | failed | unknown"""
+    task = _local_tasks.get(job_id)
+    if task is not None:
+        if not task.done():
+            return "running"
+        return "failed" if task.cancelled() or task.exception() else "done"
+    if job_id.startswith("local-"):
+        return "unknown"
+    try:
+        from app.celery_app import celery_app
+        return _CELERY_STATUS.get(celery_app.AsyncResult(job_id).state, "queued")
+    except Exception as e:
+        logger.warning(f"Could not read status of summary job {job_id}: {e}")
+        return "unknown"
+
+
+def release_job(conversation_id: str, job_id: str) -> None:
+    """Worker side: clear the coalescing key if it still points at `job_id`."""
+    import redis
+
+    key = _JOB_KEY.format(conversation_id)
+    try:
+        client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        if client.get(key) == job_id:
+            client.delete(key)
+    except Exception as e:
+        logger.warning(f"Could not release summary job key for {conversation_id}: {e}")
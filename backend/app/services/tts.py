@@ -4,26 +4,50 @@ Text-to-Speech service backed by Chatterbox Multilingual (Resemble AI).
 Replaces the deprecated Coqui XTTS v2. Voice profile WAVs in `voice_profiles/`
 remain compatible — Chatterbox accepts any WAV reference for zero-shot cloning.
 
-Falls back to Google TTS (gTTS) if model loading or synthesis fails so the
-chat pipeline degrades gracefully rather than 500ing the whole turn.
-
+Synthesis goes through a small engine abstraction (`TTSEngine`) so the
+service can race a slow primary against a fast secondary:
+
+  * The primary (Chatterbox) starts immediately.
+  * If it hasn't finished within `TTS_HEDGE_DEADLINE_SECS`, the secondary
+    (gTTS) is started in parallel and the first good result wins; the loser
+    is cancelled.
+  * If the primary fails outright, the secondary runs as a plain fallback
+    so the chat pipeline degrades gracefully rather than 500ing the turn.
+  * While the primary's model is still loading, the secondary is used
+    directly. The load runs once, in the background, and is never part of
+    a race — otherwise the deadline would cancel it on every turn.
+
+Each engine keeps its own latency stats (EWMA, failures, cancellations).
 Synthesis result reports which engine produced the audio so the caller can
 notify the user when voice cloning was silently dropped during fallback.
 """
 
 import asyncio
 import logging
+import os
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterable, Optional, Tuple, TypeVar
 
 import torch
 import torchaudio
 
 from app.config import settings
+from app.services.executors import InstrumentedExecutor, gtts_executor, tts_executor
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Weight of the newest sample in the per-engine latency EWMA.
+_EWMA_ALPHA = 0.2
+
+
+def _unlink(paths: Iterable[str]) -> None:
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
 
 @dataclass
 class SynthResult:
@@ -31,14 +55,122 @@ class SynthResult:
     engine: str  # "chatterbox" or "gtts"
     fallback: bool  # True if the caller's preferred path was not taken
     voice_cloned: bool  # True if a speaker WAV was actually applied
+    hedged: bool = False  # True if the secondary engine was raced against the primary
 
 
-class TTSService:
-    """Text-to-Speech service. Lazy-loads the model on first synthesis."""
+@dataclass
+class EngineStats:
+    """Rolling latency stats for a single engine."""
+
+    calls: int = 0
+    failures: int = 0
+    cancelled: int = 0
+    last_secs: Optional[float] = None
+    ewma_secs: Optional[float] = None
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        self.calls += 1
+        if not ok:
+            self.failures += 1
+            return
+        self.last_secs = elapsed
+        if self.ewma_secs is None:
+            self.ewma_secs = elapsed
+        else:
+            self.ewma_secs = _EWMA_ALPHA * elapsed + (1 - _EWMA_ALPHA) * self.ewma_secs
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "last_secs": self.last_secs,
+            "ewma_secs": self.ewma_secs,
+        }
+
+
+class TTSEngine:
+    """
+    One synthesis backend. Subclasses implement `_synthesize`, which writes a
+    WAV to `output_path` and returns True if `speaker_wav` was applied.
+    """
+
+    name: str = "base"
 
     def __init__(self):
-        self.provider = settings.TTS_PROVIDER
+        self.stats = EngineStats()
+
+    async def initialize(self) -> None:
+        return None
+
+    @property
+    def ready(self) -> bool:
+        """False while the engine still has a model to load."""
+        return True
+
+    def start_loading(self) -> None:
+        """Begin loading in the background; engines without a model do nothing."""
+        return None
+
+    async def synthesize(
+        self,
+        text: str,
+        output_path: str,
+        speaker_wav: Optional[str],
+        language: str,
+    ) -> bool:
+        started = time.perf_counter()
+        try:
+            cloned = await self._synthesize(text, output_path, speaker_wav, language)
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            raise
+        except Exception:
+            self.stats.record(time.perf_counter() - started, ok=False)
+            raise
+        self.stats.record(time.perf_counter() - started, ok=True)
+        return cloned
+
+    async def _synthesize(
+        self,
+        text: str,
+        output_path: str,
+        speaker_wav: Optional[str],
+        language: str,
+    ) -> bool:
+        raise NotImplementedError
+
+    @staticmethod
+    async def _offload(
+        executor: InstrumentedExecutor,
+        writes: Tuple[str, ...],
+        fn: Callable[..., T],
+        /,
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Run blocking work on `executor`. If the synthesis is cancelled (it lost
+        the race), the thread still runs to completion and may write `writes`
+        after the caller has cleaned up — so remove them once it's done.
+        """
+        future = executor.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda _: _unlink(writes))
+            raise
+
+
+class ChatterboxEngine(TTSEngine):
+    """Local Chatterbox model. Lazy-loads on first synthesis."""
+
+    name = "chatterbox"
+
+    def __init__(self):
+        super().__init__()
         self.model = None
+        self._load_task: Optional[asyncio.Task] = None
 
     def _check_cuda(self) -> bool:
         try:
@@ -46,20 +178,35 @@ class TTSService:
         except Exception:
             return False
 
-    async def initialize(self):
-        """Load the Chatterbox model (downloaded from HuggingFace on first run)."""
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def start_loading(self) -> None:
+        """Start the one model load, unless it's loaded or already loading."""
         if self.model is not None:
             return
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.create_task(self._load(), name="tts-chatterbox-load")
+            # A failed background load is logged in `_load`; a later call retries.
+            self._load_task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
-        if self.provider != "chatterbox":
-            raise ValueError(f"Unsupported TTS provider: {self.provider}")
+    async def initialize(self) -> None:
+        """Load the Chatterbox model (downloaded from HuggingFace on first run)."""
+        if self.model is not None:
+            return
+        self.start_loading()
+        # Shielded: a caller that gives up (a cancelled turn) must not abort
+        # a multi-GB load that the next turn would then have to restart.
+        await asyncio.shield(self._load_task)
 
+    async def _load(self) -> None:
         try:
             from chatterbox.mtl_tts import ChatterboxMultilingualTTS
 
             device = "cuda" if self._check_cuda() else "cpu"
             logger.info(f"Loading Chatterbox multilingual TTS on {device}...")
-            self.model = await asyncio.to_thread(
+            self.model = await tts_executor.run(
                 ChatterboxMultilingualTTS.from_pretrained, device=device
             )
             logger.info(f"Chatterbox loaded (sr={self.model.sr}, device={device})")
@@ -68,6 +215,135 @@ class TTSService:
             logger.error(f"Failed to load Chatterbox: {e}")
             raise
 
+    async def _synthesize(
+        self,
+        text: str,
+        output_path: str,
+        speaker_wav: Optional[str],
+        language: str,
+    ) -> bool:
+        if self.model is None:
+            await self.initialize()
+
+        logger.info(f"Synthesizing (chatterbox, lang={language}): {text[:80]}...")
+
+        if speaker_wav and not Path(speaker_wav).exists():
+            logger.warning(
+                f"Speaker WAV not found: {speaker_wav!r} — using default voice"
+            )
+            speaker_wav = None
+
+        kwargs = {"language_id": language}
+        if speaker_wav:
+            kwargs["audio_prompt_path"] = speaker_wav
+
+        wav = await self._offload(tts_executor, (output_path,), self.model.generate, text, **kwargs)
+        await self._offload(tts_executor, (output_path,), torchaudio.save, output_path, wav, self.model.sr)
+        return bool(speaker_wav)
+
+
+class GTTSEngine(TTSEngine):
+    """Network-only engine using Google TTS — no GPU/local model required."""
+
+    name = "gtts"
+
+    async def _synthesize(
+        self,
+        text: str,
+        output_path: str,
+        speaker_wav: Optional[str],
+        language: str,
+    ) -> bool:
+        from gtts import gTTS
+        from pydub import AudioSegment
+
+        logger.info(f"Synthesizing (gTTS): {text[:80]}...")
+        mp3_path = output_path.replace(".wav", "_gtts.mp3")
+        try:
+            await self._offload(
+                gtts_executor, (mp3_path,),
+                lambda: gTTS(text=text, lang=language, slow=False).save(mp3_path),
+            )
+            await self._offload(
+                gtts_executor, (mp3_path, output_path),
+                lambda: AudioSegment.from_mp3(mp3_path).export(output_path, format="wav"),
+            )
+        finally:
+            Path(mp3_path).unlink(missing_ok=True)
+        return False
+
+
+class _UnsupportedEngine(TTSEngine):
+    """Placeholder for a misconfigured provider — fails every call so the
+    secondary takes over instead of the import blowing up."""
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+    async def initialize(self) -> None:
+        raise ValueError(f"Unsupported TTS provider: {self.name}")
+
+    async def _synthesize(
+        self,
+        text: str,
+        output_path: str,
+        speaker_wav: Optional[str],
+        language: str,
+    ) -> bool:
+        await self.initialize()
+        return False
+
+
+_ENGINES = {
+    ChatterboxEngine.name: ChatterboxEngine,
+    GTTSEngine.name: GTTSEngine,
+}
+
+
+def _build_engine(name: Optional[str]) -> Optional[TTSEngine]:
+    if not name:
+        return None
+    cls = _ENGINES.get(name)
+    if cls is None:
+        logger.error(f"Unsupported TTS provider: {name!r}")
+        return _UnsupportedEngine(name)
+    return cls()
+
+
+class TTSService:
+    """Text-to-Speech service. Races a primary engine against a fast secondary."""
+
+    def __init__(
+        self,
+        primary: Optional[TTSEngine] = None,
+        secondary: Optional[TTSEngine] = None,
+        hedge_deadline: Optional[float] = None,
+    ):
+        self.provider = settings.TTS_PROVIDER
+        self.primary = primary or _build_engine(self.provider)
+        self.secondary = secondary or _build_engine(settings.TTS_SECONDARY_PROVIDER)
+        # <= 0 disables racing: the secondary only runs after the primary fails.
+        self.hedge_deadline = (
+            settings.TTS_HEDGE_DEADLINE_SECS if hedge_deadline is None else hedge_deadline
+        )
+
+    @property
+    def model(self):
+        """The primary engine's loaded model, or None while still lazy."""
+        return getattr(self.primary, "model", None)
+
+    async def initialize(self):
+        await self.primary.initialize()
+
+    def start_loading(self) -> None:
+        """Warm the primary engine in the background (called at startup)."""
+        self.primary.start_loading()
+
+    def engine_stats(self) -> dict:
+        engines = [self.primary] + ([self.secondary] if self.secondary else [])
+        return {e.name: e.stats.as_dict() for e in engines}
+
     async def synthesize(
         self,
         text: str,
@@ -86,79 +362,113 @@ class TTSService:
 
         Returns:
             SynthResult describing the WAV path and which engine was used.
-            `fallback=True` indicates the preferred Chatterbox path failed
-            and gTTS was used instead — voice cloning is lost in that case.
+            `fallback=True` indicates the secondary engine produced the audio
+            (primary failed or lost the race) — voice cloning is lost in that case.
         """
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        wanted_clone = bool(speaker_wav)
-
-        try:
-            if self.model is None:
-                await self.initialize()
-
-            logger.info(f"Synthesizing (chatterbox, lang={language}): {text[:80]}...")
-
-            if speaker_wav and not Path(speaker_wav).exists():
-                logger.warning(
-                    f"Speaker WAV not found: {speaker_wav!r} — using default voice"
-                )
-                speaker_wav = None
 
-            kwargs = {"language_id": language}
-            if speaker_wav:
-                kwargs["audio_prompt_path"] = speaker_wav
-
-            wav = await asyncio.to_thread(self.model.generate, text, **kwargs)
-            await asyncio.to_thread(torchaudio.save, output_path, wav, self.model.sr)
-
-            logger.info(
-                f"Synthesis complete{' (cloned voice)' if speaker_wav else ''}: {output_path}"
-            )
-            return SynthResult(
-                output_path=output_path,
-                engine="chatterbox",
-                fallback=False,
-                voice_cloned=bool(speaker_wav),
-            )
-
-        except Exception as e:
-            if speaker_wav:
-                logger.warning(
-                    f"Chatterbox voice-clone failed — cloned voice NOT applied, "
-                    f"falling back to gTTS default. Error: {e}"
-                )
-            else:
-                logger.warning(f"Chatterbox failed ({e}), falling back to gTTS")
-            await self._gtts_fallback(text, output_path, language)
-            return SynthResult(
-                output_path=output_path,
-                engine="gtts",
-                fallback=True,
-                voice_cloned=False,
+        # Each engine renders to its own scratch file so a cancelled loser can
+        # never clobber the winner's output; the winner is moved into place.
+        candidates = {
+            engine: str(Path(output_path).with_suffix(f".{engine.name}.wav"))
+            for engine in [self.primary] + ([self.secondary] if self.secondary else [])
+        }
+        tasks: dict[asyncio.Task, TTSEngine] = {}
+
+        def _start(engine: TTSEngine) -> None:
+            task = asyncio.create_task(
+                engine.synthesize(text, candidates[engine], speaker_wav, language),
+                name=f"tts-{engine.name}",
             )
+            tasks[task] = engine
 
-    async def _gtts_fallback(self, text: str, output_path: str, language: str = "en") -> str:
-        """Network-only fallback using Google TTS — no GPU/local model required."""
+        hedged = False
+        errors: list[str] = []
         try:
-            from gtts import gTTS
-            from pydub import AudioSegment
-
-            logger.info(f"Synthesizing (gTTS): {text[:80]}...")
-            mp3_path = output_path.replace(".wav", "_gtts.mp3")
+            if self.primary.ready or not self.secondary:
+                _start(self.primary)
+            else:
+                self.primary.start_loading()
+                logger.info(f"{self.primary.name} still loading — using {self.secondary.name}")
+                _start(self.secondary)
+            pending = set(tasks)
+            timeout = self.hedge_deadline if self.hedge_deadline > 0 else None
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                timeout = None
+
+                for task in done:
+                    engine = tasks[task]
+                    exc = task.exception()
+                    if exc is None:
+                        os.replace(candidates[engine], output_path)
+                        return self._result(
+                            output_path, engine, task.result(), speaker_wav, hedged
+                        )
+                    errors.append(f"{engine.name}: {exc}")
+                    self._log_engine_failure(engine, exc, speaker_wav)
+
+                # Deadline expired or the primary failed — bring in the secondary
+                # if it isn't already running.
+                if self.secondary and self.secondary not in tasks.values():
+                    if not done:
+                        hedged = True
+                        logger.info(
+                            f"{self.primary.name} missed {self.hedge_deadline:g}s deadline — "
+                            f"racing {self.secondary.name}"
+                        )
+                    _start(self.secondary)
+                    pending = {t for t in tasks if not t.done()}
+
+            raise RuntimeError(f"All TTS engines failed ({'; '.join(errors)})")
 
-            await asyncio.to_thread(
-                lambda: gTTS(text=text, lang=language, slow=False).save(mp3_path)
+        finally:
+            losers = [t for t in tasks if not t.done()]
+            for task in losers:
+                task.cancel()
+            # Let the losers observe the cancellation. A loser whose thread is
+            # still mid-job removes its own scratch file when the job finishes
+            # (see `TTSEngine._offload`); this covers everything else.
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+            _unlink(candidates.values())
+
+    def _result(
+        self,
+        output_path: str,
+        engine: TTSEngine,
+        cloned: bool,
+        speaker_wav: Optional[str],
+        hedged: bool,
+    ) -> SynthResult:
+        fallback = engine is not self.primary
+        if fallback and speaker_wav:
+            logger.warning(
+                f"{engine.name} won over {self.primary.name} — cloned voice NOT applied"
             )
-            await asyncio.to_thread(
-                lambda: AudioSegment.from_mp3(mp3_path).export(output_path, format="wav")
+        logger.info(
+            f"Synthesis complete ({engine.name}{', cloned voice' if cloned else ''}): {output_path}"
+        )
+        return SynthResult(
+            output_path=output_path,
+            engine=engine.name,
+            fallback=fallback,
+            voice_cloned=cloned,
+            hedged=hedged,
+        )
+
+    def _log_engine_failure(
+        self, engine: TTSEngine, exc: BaseException, speaker_wav: Optional[str]
+    ) -> None:
+        if engine is self.primary and speaker_wav:
+            logger.warning(
+                f"{engine.name} voice-clone failed — cloned voice NOT applied. Error: {exc}"
             )
-            Path(mp3_path).unlink(missing_ok=True)
-
-            logger.info(f"gTTS synthesis complete: {output_path}")
-            return output_path
-        except Exception as e:
-            logger.error(f"gTTS also failed: {e}")
-            raise
+        else:
+            logger.warning(f"{engine.name} synthesis failed: {exc}")
 
     async def synthesize_bytes(
         self,
@@ -180,7 +490,15 @@ class TTSService:
 
 
 # Suppress unused-name warning — re-exported for type hints elsewhere
-__all__ = ["TTSService", "SynthResult", "tts_service"]
+__all__ = [
+    "TTSService",
+    "TTSEngine",
+    "ChatterboxEngine",
+    "GTTSEngine",
+    "EngineStats",
+    "SynthResult",
+    "tts_service",
+]
 
 
 # Global instance
@@ -0,0 +1,189 @@
+"""
+Write-behind publishing of freshly rendered video chunks.
+
+With S3 storage the animation pipeline used to wait for each chunk's upload
+before it could send `video_chunk`, so every sentence paid the S3 round
+trip. With STORAGE_WRITE_BEHIND on, a chunk is instead renamed into this
+node's local `/uploads` tree and its local URL is sent straight away,
+while a background task copies it to S3 (retrying with backoff). Once the
+upload lands, callers registered with `after_durable()` receive the
+durable URLs (the WebSocket pipeline rewrites the assistant message's
+recorded chunk URLs), and the local copy is removed after
+WRITE_BEHIND_LOCAL_RETENTION_SECS so clients still playing it aren't cut
+off.
+
+Local URLs are only reachable on the node that rendered the chunk, which is
+the node holding the client's WebSocket. With local storage (or the flag
+off) this is a thin pass-through to `storage_service.upload_path`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.services.storage import LocalStorageService, storage_service
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_PENDING = Gauge(
+    "write_behind_pending_uploads",
+    "Chunks served locally whose S3 upload hasn't finished",
+)
+WRITE_BEHIND_UPLOADS = Counter(
+    "write_behind_uploads_total",
+    "Background S3 uploads of write-behind chunks",
+    ["outcome"],
+)
+
+# Keys whose upload gave up, remembered so their local URL keeps being used.
+_MAX_FAILED_KEYS = 1024
+
+
+class WriteBehindUploader:
+    """Serves chunks from local disk while their S3 upload runs in the background."""
+
+    def __init__(self):
+        self._staging = LocalStorageService()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._failed: "OrderedDict[str, None]" = OrderedDict()
+        self._background: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.STORAGE_WRITE_BEHIND and not settings.USE_LOCAL_STORAGE
+
+    async def upload_path(self, src_path: str, key: str, content_type: str = "application/octet-stream") -> str:
+        """
+        Publish a rendered file and return a URL the client can use now:
+        a local one while the S3 upload runs behind, else the storage URL.
+        """
+        if not self.enabled:
+            await storage_service.upload_path(src_path, key, content_type=content_type)
+            return storage_service.client_url(key)
+        url = await self._staging.upload_path(src_path, key, content_type=content_type)
+        self._failed.pop(key, None)
+        task = asyncio.create_task(self._persist(key, content_type), name=f"write-behind-{key}")
+        self._inflight[key] = task
+        WRITE_BEHIND_PENDING.inc()
+
+        def _done(t: asyncio.Task) -> None:
+            if self._inflight.get(key) is t:
+                self._inflight.pop(key, None)
+            WRITE_BEHIND_PENDING.dec()
+
+        task.add_done_callback(_done)
+        return url
+
+    def _is_local(self, key: str) -> bool:
+        return key in self._inflight or key in self._failed
+
+    def is_pending(self, key: str) -> bool:
+        """True while `key`'s S3 upload hasn't finished (or given up)."""
+        return key in self._inflight
+
+    async def discard_local(self, keys: Iterable[str]) -> list:
+        """Delete the keys' local copies now; returns the keys that failed."""
+        keys = list(keys)
+        for key in keys:
+            self._failed.pop(key, None)
+        return await self._staging.delete_many(keys)
+
+    def url_for(self, key: str) -> str:
+        """URL to hand a client for `key`: local until its upload has landed."""
+        if self._is_local(key):
+            return self._staging.get_url(key)
+        return storage_service.client_url(key)
+
+    def stored_url(self, key: str) -> str:
+        """URL to record for `key` (unsigned; signed again when served)."""
+        if self._is_local(key):
+            return self._staging.get_url(key)
+        return storage_service.get_url(key)
+
+    async def wait_durable(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Wait for the keys' pending uploads; returns key → stored URL."""
+        keys = list(keys)
+        pending = [self._inflight[k] for k in keys if k in self._inflight]
+        if pending:
+            await asyncio.gather(*(asyncio.shield(t) for t in pending), return_exceptions=True)
+        return {k: self.stored_url(k) for k in keys}
+
+    def after_durable(self, keys: Iterable[str], callback: Callable[[Dict[str, str]], Awaitable[None]]) -> None:
+        """Run `callback(urls)` in the background once the keys are uploaded."""
+        keys = list(keys)
+
+        async def _run() -> None:
+            try:
+                await callback(await self.wait_durable(keys))
+            except Exception as e:
+                logger.warning(f"Write-behind follow-up failed for {len(keys)} key(s): {e}")
+
+        self._spawn(_run())
+
+    async def _persist(self, key: str, content_type: str) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(1, settings.WRITE_BEHIND_CONCURRENCY))
+        local = self._staging.get_local_path(key)
+        delay = settings.WRITE_BEHIND_RETRY_BASE_SECS
+        async with self._slots:
+            for attempt in range(1, settings.WRITE_BEHIND_MAX_ATTEMPTS + 1):
+                try:
+                    await storage_service.upload_path(local, key, content_type=content_type, move=False)
+                    break
+                except Exception as e:
+                    if attempt == settings.WRITE_BEHIND_MAX_ATTEMPTS:
+                        logger.error(f"Write-behind upload of {key} failed after {attempt} attempts, "
+                                     f"keeping local copy: {e}")
+                        WRITE_BEHIND_UPLOADS.labels("failed").inc()
+                        self._failed[key] = None
+                        while len(self._failed) > _MAX_FAILED_KEYS:
+                            self._failed.popitem(last=False)
+                        return
+                    logger.warning(f"Write-behind upload of {key} failed (attempt {attempt}), retrying: {e}")
+                    WRITE_BEHIND_UPLOADS.labels("retried").inc()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+        WRITE_BEHIND_UPLOADS.labels("ok").inc()
+        self._spawn(self._drop_local(key))
+
+    async def _drop_local(self, key: str) -> None:
+        await asyncio.sleep(settings.WRITE_BEHIND_LOCAL_RETENTION_SECS)
+        if self._is_local(key):
+            return  # re-staged since
+        try:
+            await self._staging.delete_file(key)
+        except Exception as e:
+            logger.warning(f"Could not remove write-behind local copy {key}: {e}")
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def drain(self, timeout: float) -> None:
+        """On shutdown: give in-flight uploads up to `timeout` seconds to land."""
+        if not self._inflight:
+            return
+        pending = list(self._inflight.values())
+        logger.info(f"Waiting for {len(pending)} write-behind upload(s)")
+        _, not_done = await asyncio.wait(pending, timeout=timeout)
+        if not_done:
+            logger.warning(f"{len(not_done)} write-behind upload(s) unfinished at shutdown; "
+                           f"local copies remain under {settings.LOCAL_STORAGE_PATH}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._inflight),
+            "failed": len(self._failed),
+        }
+
+
+write_behind = WriteBehindUploader()
@@ -13,11 +13,20 @@ from typing import Dict, List, Optional
 
 from fastapi import WebSocket
 
+from app.api.caching import invalidate_routes
+from app.config import settings
 from app.services.animator import avatar_animator
-from app.services.llm import llm_service
+from app.services.cache import cache_service
+from app.services.content_store import content_store
+from app.services.executors import storage_executor
+from app.services.llm import LLMRateLimited, llm_service, message_tokens
+from app.services.memory import memory_service
+from app.services.retention import retention_service
+from app.services.semantic_cache import CacheEntry, Probe, semantic_cache
 from app.services.storage import storage_service
-from app.services.stt import stt_service
+from app.services.stt import Transcription, stt_service
 from app.services.tts import tts_service
+from app.services.write_behind import write_behind
 
 logger = logging.getLogger(__name__)
 TMPDIR = Path(tempfile.gettempdir())
@@ -44,20 +53,11 @@ def _private_session_dir(session_id: str) -> Path:
     return d
 
 
-def _write_private_bytes(path: Path, data: bytes) -> None:
-    """Atomically write bytes to `path` with file mode 0o600 (owner-only)."""
-    # os.open lets us set the mode at create time so there's no readable window
-    # between create and chmod. O_CREAT|O_TRUNC|O_WRONLY is the standard "open
-    # for writing, truncate, create if missing" combination.
-    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, _OWNER_ONLY_FILE)
-    try:
-        os.write(fd, data)
-    finally:
-        os.close(fd)
-    try:
-        os.chmod(str(path), _OWNER_ONLY_FILE)
-    except OSError:
-        pass
+def _object_key(chunk: dict) -> str:
+    """Storage key a rendered chunk is served from (its content-addressed
+    blob; chunks recorded before that only have their logical key)."""
+    return chunk.get("object_key") or chunk["video_key"]
+
 
 # Minimum sentence length (chars) to bother animating
 _MIN_SENTENCE_LEN = 8
@@ -66,9 +66,22 @@ _MIN_SENTENCE_LEN = 8
 MAX_TEXT_INPUT_LEN = 4000
 
 # Conversation memory cap — keep the most recent N user/assistant pairs.
-# System prompt is stored separately so it survives trimming.
+# System prompt is stored separately so it survives trimming. With context
+# compaction on, older turns are folded into a rolling summary well before
+# this; the cap is only a backstop if summarization keeps failing.
 MAX_CONTEXT_MESSAGES = 60
 
+# Languages the TTS engine can speak — matches the voices.py allowed list.
+TTS_LANGUAGES = frozenset({
+    "ar", "da", "de", "el", "en", "es", "fi", "fr", "he", "hi", "it",
+    "ja", "ko", "ms", "nl", "no", "pl", "pt", "ru", "sv", "sw", "tr", "zh",
+})
+
+STT_PROFILES = ("accuracy", "latency", "auto")
+
+# Voice-index entries looked up at session start and on voice switches.
+_VOICE_CACHE_TTL_SECS = 600
+
 # Soft TTL for an idle (disconnected/abandoned) session in seconds.
 STALE_SESSION_TTL_SECS = 60 * 60 * 2  # 2 hours
 
@@ -87,6 +100,8 @@ class ConnectionManager:
         # barge-in: when a fresh user input arrives we cancel the in-flight
         # task instead of queueing.
         self._active_turns: Dict[str, asyncio.Task] = {}
+        # At most one background context compaction per session.
+        self._compactions: Dict[str, asyncio.Task] = {}
 
     # ── connection lifecycle ──────────────────────────────────────────────────
 
@@ -100,18 +115,29 @@ class ConnectionManager:
             "avatar_image_local": None,
             "voice_wav": None,
             "language": "en",
+            # STT language: None until set explicitly or pinned from the first
+            # confidently detected utterance.
+            "stt_language": None,
+            "stt_profile": None,
             "system_prompt": None,
+            # Per-avatar opt-in to the semantic response cache.
+            "semantic_cache": False,
+            # Rolling summary of turns compacted out of `messages`.
+            "summary": None,
             "user_id": user_id,
             "connected_at": datetime.now(timezone.utc),
             "last_activity": datetime.now(timezone.utc),
         }
         await self._load_session_data(session_id)
+        # Warm the prompt cache for this avatar's system prompt while the user
+        # is still getting ready to speak (deduplicated across sessions).
+        llm_service.prewarm(self.session_data[session_id].get("system_prompt"))
         logger.info(f"WebSocket connected: {session_id} (user={user_id})")
 
     async def _load_session_data(self, session_id: str):
         try:
             from app.database import AsyncSessionLocal
-            from app.models import Session as SessionModel, Message
+            from app.models import Session as SessionModel, Message, Conversation
             from sqlalchemy import select
             from sqlalchemy.orm import joinedload
 
@@ -126,31 +152,59 @@ class ConnectionManager:
                     return
 
                 self.session_data[session_id]["avatar_id"] = session.avatar_id
+                prefs = session.settings or {}
+                if isinstance(prefs, dict):
+                    lang = prefs.get("language")
+                    if lang in TTS_LANGUAGES:
+                        self.session_data[session_id]["language"] = lang
+                        self.session_data[session_id]["stt_language"] = lang
+                    if prefs.get("stt_profile") in STT_PROFILES:
+                        self.session_data[session_id]["stt_profile"] = prefs["stt_profile"]
                 # Trust DB owner over caller-supplied claim
                 if session.user_id:
                     self.session_data[session_id]["user_id"] = session.user_id
 
+                # A rolling summary stands in for everything older than the
+                # recent window, so only that window needs rehydrating.
+                summary_result = await db.execute(
+                    select(Conversation.context_summary)
+                    .where(Conversation.session_id == session_id)
+                    .limit(1)
+                )
+                summary = summary_result.scalar_one_or_none()
+                history_limit = MAX_CONTEXT_MESSAGES
+                if summary and settings.LLM_CONTEXT_COMPACTION_ENABLED:
+                    self.session_data[session_id]["summary"] = summary
+                    history_limit = settings.LLM_CONTEXT_RECENT_MESSAGES
+                elif memory_service.active:
+                    # Older turns come back through memory retrieval instead.
+                    history_limit = settings.LLM_CONTEXT_RECENT_MESSAGES
+
                 # Rehydrate the LLM context window from persisted messages so
                 # a reconnect (refresh, network blip, etc.) resumes the same
                 # conversation instead of starting fresh. We pull the most
-                # recent MAX_CONTEXT_MESSAGES rows to bound memory. Order by
+                # recent `history_limit` rows to bound memory. Order by
                 # (created_at, id) so ties (when several rows share a
                 # sub-millisecond timestamp on bulk insert) are still stable
                 # — message IDs are monotonic UUIDs assigned in insertion order
                 # per session, so they make a reliable secondary key.
                 hist_result = await db.execute(
-                    select(Message.role, Message.content)
+                    select(Message.role, Message.content, Message.tokens)
                     .where(Message.session_id == session_id)
                     .where(Message.role.in_(("user", "assistant")))
                     .order_by(Message.created_at.desc(), Message.id.desc())
-                    .limit(MAX_CONTEXT_MESSAGES)
+                    .limit(history_limit)
                 )
                 # Reverse to chronological order for the LLM
                 hist_rows = list(hist_result.all())[::-1]
                 if hist_rows:
-                    self.session_data[session_id]["messages"] = [
-                        {"role": row.role, "content": row.content} for row in hist_rows
-                    ]
+                    history = []
+                    for row in hist_rows:
+                        msg = {"role": row.role, "content": row.content}
+                        if row.tokens is not None:
+                            msg["tokens"] = row.tokens
+                        history.append(msg)
+                    self.session_data[session_id]["messages"] = history
                     logger.info(f"Rehydrated {len(hist_rows)} message(s) for session {session_id}")
 
                 avatar = session.avatar
@@ -170,6 +224,7 @@ class ConnectionManager:
                     if sp:
                         self.session_data[session_id]["system_prompt"] = sp
                         logger.info(f"Loaded system prompt for avatar {avatar.id}")
+                    self.session_data[session_id]["semantic_cache"] = bool(meta.get("semantic_cache"))
 
                     if avatar.voice_id:
                         wav = await self._get_voice_wav_path(avatar.voice_id)
@@ -183,27 +238,24 @@ class ConnectionManager:
 
     async def _get_voice_wav_path(self, voice_id: str) -> Optional[str]:
         """Return the WAV filesystem path for a voice profile, or None if not found."""
-        voice_index = Path("voice_profiles") / "index.json"
-        if not voice_index.exists():
-            return None
-        try:
-            raw = await asyncio.to_thread(voice_index.read_text)
-            for entry in json.loads(raw):
-                if entry["id"] == voice_id:
-                    return entry.get("wav_path")
-        except Exception as e:
-            logger.warning(f"Could not read voice index: {e}")
-        return None
+        entry = await self._get_voice_entry(voice_id)
+        return entry.get("wav_path") if entry else None
 
     async def _get_voice_entry(self, voice_id: str) -> Optional[dict]:
         """Return the full voice-index entry (including `user_id`) for ownership checks."""
+        cache_key = f"voices:{voice_id}"
+        cached = await cache_service.get(cache_key)
+        if cached is not None:
+            return cached
         voice_index = Path("voice_profiles") / "index.json"
         if not voice_index.exists():
             return None
         try:
-            raw = await asyncio.to_thread(voice_index.read_text)
+            raw = await storage_executor.run(voice_index.read_text)
             for entry in json.loads(raw):
                 if entry["id"] == voice_id:
+                    # Invalidated by voices._save_index on clone/delete.
+                    await cache_service.set(cache_key, entry, ttl=_VOICE_CACHE_TTL_SECS)
                     return entry
         except Exception as e:
             logger.warning(f"Could not read voice index: {e}")
@@ -238,13 +290,14 @@ class ConnectionManager:
 
         self.active_connections.pop(session_id, None)
         self.session_data.pop(session_id, None)
+        llm_service.forget_session(session_id)
         # Best-effort wipe of the per-session temp dir. We use shutil.rmtree
-        # via to_thread because rmtree on a large dir can briefly block.
+        # on the storage pool because rmtree on a large dir can briefly block.
         session_dir = TMPDIR / f"avatar-session-{session_id}"
         if session_dir.exists():
             try:
                 import shutil
-                await asyncio.to_thread(shutil.rmtree, str(session_dir), True)
+                await storage_executor.run(shutil.rmtree, str(session_dir), True)
             except Exception as e:
                 logger.warning(f"Could not clean session tmp dir for {session_id}: {e}")
         logger.info(f"WebSocket disconnected: {session_id}")
@@ -285,22 +338,48 @@ class ConnectionManager:
         role: str,
         content: str,
         latency: Optional[float] = None,
-    ) -> None:
-        """Best-effort persist a message; failure must not break the chat pipeline."""
+        tokens: Optional[int] = None,
+        metadata: Optional[dict] = None,
+    ) -> Optional[str]:
+        """
+        Best-effort persist a message; failure must not break the chat
+        pipeline. Returns the new message id, or None if it wasn't saved.
+        """
         try:
             from app.database import AsyncSessionLocal
             from app.models import Message
             async with AsyncSessionLocal() as db:
-                db.add(Message(
+                message = Message(
                     session_id=session_id,
                     role=role,
                     content=content,
                     content_type="text",
                     latency=latency,
-                ))
+                    tokens=tokens,
+                    message_metadata=metadata,
+                )
+                db.add(message)
                 await db.commit()
+                return message.id
         except Exception as e:
             logger.warning(f"Could not persist {role} message for {session_id}: {e}")
+            return None
+
+    async def _record_durable_video_urls(self, message_id: str, urls: Dict[str, str]) -> None:
+        """Point a message's recorded video chunks at their uploaded (durable) URLs."""
+        from app.database import AsyncSessionLocal
+        from app.models import Message
+        async with AsyncSessionLocal() as db:
+            message = await db.get(Message, message_id)
+            if message is None or not message.message_metadata:
+                return
+            meta = dict(message.message_metadata)
+            meta["video_chunks"] = [
+                {**chunk, "video_url": urls.get(_object_key(chunk), chunk.get("video_url"))}
+                for chunk in meta.get("video_chunks", [])
+            ]
+            message.message_metadata = meta
+            await db.commit()
 
     async def _ensure_conversation_title(self, session_id: str, first_user_text: str) -> None:
         """
@@ -339,6 +418,9 @@ class ConnectionManager:
                     message_count=msg_count,
                 ))
                 await db.commit()
+            user_id = self.session_data.get(session_id, {}).get("user_id")
+            if user_id:
+                await invalidate_routes(str(user_id), "conversations")
         except Exception as e:
             logger.warning(f"Could not auto-title conversation for {session_id}: {e}")
 
@@ -350,7 +432,6 @@ class ConnectionManager:
         # convention — users expect the assistant to stop talking the moment
         # they start.
         await self.interrupt_active_turn(session_id)
-        tmp_audio = _private_session_dir(session_id) / "input.webm"
         try:
             await self.send_message(session_id, {
                 "type": "status", "message": "Transcribing audio…", "stage": "transcription"
@@ -367,8 +448,16 @@ class ConnectionManager:
                 await self.send_message(session_id, {"type": "error", "message": "Audio payload too large"})
                 return
 
-            await asyncio.to_thread(_write_private_bytes, tmp_audio, raw)
-            text = await stt_service.transcribe(str(tmp_audio))
+            # Decoded in memory — raw user audio never lands on disk.
+            data = self.session_data.get(session_id, {})
+            result = await stt_service.transcribe_detailed(
+                raw,
+                language=data.get("stt_language"),
+                profile=data.get("stt_profile"),
+            )
+            text = result.text
+            if text and data.get("stt_language") is None:
+                self._pin_detected_language(session_id, result)
 
             if not text:
                 await self.send_message(session_id, {"type": "error", "message": "Could not transcribe audio"})
@@ -380,8 +469,6 @@ class ConnectionManager:
         except Exception as e:
             logger.error(f"Audio error [{session_id}]: {e}")
             await self.send_message(session_id, {"type": "error", "message": "Audio processing failed"})
-        finally:
-            tmp_audio.unlink(missing_ok=True)
 
     async def handle_text_input(self, session_id: str, text: str):
         """
@@ -430,49 +517,269 @@ class ConnectionManager:
         try:
             data = self.session_data.get(session_id, {})
             data["last_activity"] = started_at
-            messages: list[dict] = data.get("messages", [])
-            messages.append({"role": "user", "content": text})
+            # Mutated in place (never rebound) so a background compaction and
+            # this turn always see the same list.
+            messages: list[dict] = data.setdefault("messages", [])
+            user_msg = {"role": "user", "content": text}
+            messages.append(user_msg)
 
             # Cap the conversation window. The system prompt is passed
             # separately to the LLM so we don't need to keep it in `messages`.
-            if len(messages) > MAX_CONTEXT_MESSAGES:
-                messages = messages[-MAX_CONTEXT_MESSAGES:]
+            # Without compaction, long-term memory stands in for older turns.
+            cap = MAX_CONTEXT_MESSAGES
+            if memory_service.active and not settings.LLM_CONTEXT_COMPACTION_ENABLED:
+                cap = settings.LLM_CONTEXT_RECENT_MESSAGES
+            if len(messages) > cap:
+                del messages[:-cap]
 
             system_prompt = data.get("system_prompt")
 
             # Persist the user turn before kicking off generation so it's
             # durable even if the model fails partway through.
-            await self._persist_message(session_id, "user", text)
+            await self._persist_message(session_id, "user", text, tokens=message_tokens(user_msg))
             # Auto-title the conversation from the first user turn (idempotent)
             await self._ensure_conversation_title(session_id, text)
 
-            await self.send_message(session_id, {"type": "status", "message": "Thinking…", "stage": "llm"})
-
-            # Bounded queue prevents the LLM producer from racing too far ahead
-            sentence_queue: asyncio.Queue[Optional[str]] = asyncio.Queue(maxsize=4)
-
-            results = await asyncio.gather(
-                self._llm_producer(session_id, messages, system_prompt, sentence_queue),
-                self._animate_from_queue(session_id, sentence_queue),
-                return_exceptions=True,
-            )
+            probe = await self._semantic_lookup(session_id, data, text)
+            cached = probe.entry if probe else None
+            render_key = self._render_key(data)
+
+            chunks: List[dict] = []
+            if cached and semantic_cache.can_replay(cached, render_key):
+                # Answer and its video are both cached: nothing to generate.
+                response_text = await self._replay_cached_turn(session_id, cached)
+                chunks = cached.chunks
+            else:
+                await self.send_message(session_id, {"type": "status", "message": "Thinking…", "stage": "llm"})
+
+                # Bounded queue prevents the LLM producer from racing too far ahead
+                sentence_queue: asyncio.Queue[Optional[str]] = asyncio.Queue(maxsize=4)
+
+                if cached:
+                    producer = self._cached_producer(session_id, cached.answer, sentence_queue)
+                else:
+                    context = llm_service.build_context(messages, system_prompt, data.get("summary"))
+                    memories = await self._recall_memories(session_id, data, text, context)
+                    if memories:
+                        # Only the outgoing copy carries them; history stays clean.
+                        context[-1] = {"role": "user", "content": memory_service.format(memories) + text}
+                    producer = self._llm_producer(
+                        session_id,
+                        context,
+                        system_prompt,
+                        sentence_queue,
+                        summary=data.get("summary"),
+                    )
+                results = await asyncio.gather(
+                    producer,
+                    self._animate_from_queue(session_id, sentence_queue),
+                    return_exceptions=True,
+                )
 
-            # Check for errors
-            for r in results:
-                if isinstance(r, Exception):
-                    raise r
+                # Check for errors
+                for r in results:
+                    if isinstance(r, Exception):
+                        raise r
+
+                response_text = results[0] if isinstance(results[0], str) else ""
+                chunks = results[1] or []
+                # Only cache complete turns — a disconnect truncates both.
+                if probe is not None and response_text and session_id in self.active_connections:
+                    entry = cached or semantic_cache.store(probe, response_text)
+                    if entry is not None and chunks:
+                        semantic_cache.attach_chunks(entry, render_key, chunks)
+                        # Outlive the session so the cache can keep replaying them.
+                        retention_service.pin_later(c["video_key"] for c in chunks)
 
-            response_text = results[0] if isinstance(results[0], str) else ""
             if response_text:
-                messages.append({"role": "assistant", "content": response_text})
-                data["messages"] = messages
+                assistant_msg = {"role": "assistant", "content": response_text}
+                messages.append(assistant_msg)
                 latency = (datetime.now(timezone.utc) - started_at).total_seconds()
-                await self._persist_message(session_id, "assistant", response_text, latency=latency)
-
+                message_id = await self._persist_message(
+                    session_id, "assistant", response_text,
+                    latency=latency, tokens=message_tokens(assistant_msg),
+                    metadata={"video_chunks": chunks} if chunks else None,
+                )
+                if message_id and chunks and write_behind.enabled:
+                    write_behind.after_durable(
+                        [_object_key(c) for c in chunks],
+                        lambda urls: self._record_durable_video_urls(message_id, urls),
+                    )
+                self._schedule_compaction(session_id)
+                if settings.MEMORY_ENABLED and data.get("user_id") and data.get("avatar_id"):
+                    memory_service.remember_later(
+                        str(data["user_id"]), str(data["avatar_id"]), session_id, text, response_text,
+                    )
+
+        except LLMRateLimited as e:
+            # Admission already queued and retried; the provider is saturated.
+            logger.warning(f"LLM rate-limited [{session_id}]: {e}")
+            await self.send_message(session_id, {
+                "type": "error", "message": "The assistant is busy right now — please try again in a moment",
+            })
         except Exception as e:
             logger.error(f"Text error [{session_id}]: {e}")
             await self.send_message(session_id, {"type": "error", "message": "Processing failed"})
 
+    # ── long-term memory ──────────────────────────────────────────────────────
+
+    async def _recall_memories(self, session_id: str, data: dict, text: str, context: List[dict]) -> list:
+        """Past exchanges relevant to `text` that aren't already in `context`."""
+        user_id, avatar_id = data.get("user_id"), data.get("avatar_id")
+        if not (memory_service.active and user_id and avatar_id):
+            return []
+        try:
+            return await memory_service.recall(
+                str(user_id), str(avatar_id), text,
+                exclude={m["content"] for m in context if m["role"] == "user"},
+            )
+        except Exception as e:
+            logger.warning(f"Memory recall failed [{session_id}]: {e}")
+            return []
+
+    # ── semantic response cache ───────────────────────────────────────────────
+
+    async def _semantic_lookup(self, session_id: str, data: dict, text: str) -> Optional[Probe]:
+        """Probe the avatar's semantic cache, or None when it doesn't apply."""
+        avatar_id = data.get("avatar_id")
+        if not (settings.SEMANTIC_CACHE_ENABLED and data.get("semantic_cache") and avatar_id):
+            return None
+        if not (semantic_cache.cacheable(text) and semantic_cache.usable()):
+            return None
+        try:
+            return await semantic_cache.lookup(
+                str(avatar_id), data.get("system_prompt"), text, data.get("language", "en"),
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed [{session_id}]: {e}")
+            return None
+
+    @staticmethod
+    def _render_key(data: dict) -> str:
+        """Identifies what a video chunk depends on besides its text."""
+        return f"{data.get('avatar_image_key')}|{data.get('voice_wav')}|{data.get('language', 'en')}"
+
+    async def _replay_cached_turn(self, session_id: str, entry: CacheEntry) -> str:
+        """Send a cached answer and its pre-rendered video chunks."""
+        await self.send_message(session_id, {
+            "type": "message", "role": "assistant", "content": entry.answer, "cached": True,
+        })
+        total = len(entry.chunks)
+        await self.send_message(session_id, {"type": "video_chunk_start", "total_chunks": total})
+        for i, chunk in enumerate(entry.chunks):
+            await self.send_message(session_id, {
+                "type": "video_chunk",
+                "chunk_index": i,
+                "total_chunks": total,
+                "video_url": write_behind.url_for(_object_key(chunk)),
+                "text": chunk["text"],
+            })
+        await self.send_message(session_id, {"type": "video_chunk_end", "sent_chunks": total})
+        return entry.answer
+
+    async def _cached_producer(
+        self,
+        session_id: str,
+        answer: str,
+        queue: "asyncio.Queue[Optional[str]]",
+    ) -> str:
+        """Feed a cached answer (without rendered chunks) to the animation pipeline."""
+        try:
+            await self.send_message(session_id, {
+                "type": "message", "role": "assistant", "content": answer, "cached": True,
+            })
+            for sentence in self._SENTENCE_RE.split(answer):
+                sentence = sentence.strip()
+                if len(sentence) >= _MIN_SENTENCE_LEN:
+                    await queue.put(sentence)
+        finally:
+            await queue.put(None)
+        return answer
+
+    # ── context compaction ────────────────────────────────────────────────────
+
+    def _schedule_compaction(self, session_id: str) -> None:
+        """Kick off a background compaction if the raw window has overflowed."""
+        if not settings.LLM_CONTEXT_COMPACTION_ENABLED:
+            return
+        data = self.session_data.get(session_id)
+        if not data:
+            return
+        messages = data.get("messages", [])
+        # Overflow by count, or by tokens — a few long turns can exceed the
+        # budget well before the count does, and would otherwise just be dropped.
+        if (
+            len(messages) <= settings.LLM_CONTEXT_COMPACT_AFTER
+            and sum(message_tokens(m) for m in messages) <= llm_service.context_budget()
+        ):
+            return
+        if session_id in self._compactions:
+            return
+
+        task = asyncio.create_task(self._compact_context(session_id, data), name=f"compact-{session_id}")
+        self._compactions[session_id] = task
+
+        def _done(t: asyncio.Task) -> None:
+            if self._compactions.get(session_id) is t:
+                self._compactions.pop(session_id, None)
+
+        task.add_done_callback(_done)
+
+    async def _compact_context(self, session_id: str, data: dict) -> None:
+        """
+        Fold everything but the newest LLM_CONTEXT_RECENT_MESSAGES into the
+        session's rolling summary and persist it to Conversation.context_summary.
+
+        Runs concurrently with later turns: the covered messages are
+        snapshotted up front and removed by identity afterwards, so turns
+        appended (or backstop-trimmed) meanwhile are left alone.
+        """
+        messages: list[dict] = data["messages"]
+        cut = len(messages) - settings.LLM_CONTEXT_RECENT_MESSAGES
+        # Keep the raw window starting on a user turn (Anthropic requires it).
+        while 0 < cut < len(messages) and messages[cut]["role"] != "user":
+            cut += 1
+        if cut <= 0:
+            return
+        covered = messages[:cut]
+
+        try:
+            summary = await llm_service.summarize_history(data.get("summary"), covered)
+        except Exception as e:
+            logger.warning(f"Context compaction failed [{session_id}]: {e}")
+            return
+        if not summary:
+            return
+
+        covered_ids = {id(m) for m in covered}
+        messages[:] = [m for m in messages if id(m) not in covered_ids]
+        data["summary"] = summary
+        logger.info(
+            f"Compacted {len(covered)} message(s) into summary [{session_id}] "
+            f"({len(messages)} raw message(s) kept)"
+        )
+        await self._persist_summary(session_id, summary)
+
+    async def _persist_summary(self, session_id: str, summary: str) -> None:
+        """Best-effort write of the rolling summary to the session's Conversation row."""
+        try:
+            from app.database import AsyncSessionLocal
+            from app.models import Conversation
+            from sqlalchemy import update
+
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(Conversation)
+                    .where(Conversation.session_id == session_id)
+                    .values(context_summary=summary)
+                )
+                await db.commit()
+            user_id = self.session_data.get(session_id, {}).get("user_id")
+            if user_id:
+                await invalidate_routes(str(user_id), "conversations")
+        except Exception as e:
+            logger.warning(f"Could not persist summary for {session_id}: {e}")
+
     # ── streaming pipeline ────────────────────────────────────────────────────
 
     _SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
@@ -483,6 +790,7 @@ class ConnectionManager:
         messages: List[dict],
         system_prompt: Optional[str],
         queue: "asyncio.Queue[Optional[str]]",
+        summary: Optional[str] = None,
     ) -> str:
         """
         Stream LLM tokens, emit `token` events to frontend,
@@ -493,7 +801,9 @@ class ConnectionManager:
         full_text = ""
 
         try:
-            async for token in llm_service.stream_response(messages, system_prompt):
+            async for token in llm_service.stream_response(
+                messages, system_prompt, summary=summary, session_id=session_id,
+            ):
                 if session_id not in self.active_connections:
                     break  # client disconnected
 
@@ -534,10 +844,12 @@ class ConnectionManager:
         self,
         session_id: str,
         queue: "asyncio.Queue[Optional[str]]",
-    ) -> None:
+    ) -> List[dict]:
         """
         Consume sentences from the queue and run TTS + animation for each,
         streaming video_chunk events to the frontend as they complete.
+        Returns the rendered chunks ({"text", "video_key", "object_key"}) if
+        every sentence rendered, else an empty list.
         """
         data = self.session_data.get(session_id, {})
         avatar_image = data.get("avatar_image_local")
@@ -551,10 +863,12 @@ class ConnectionManager:
                 item = await queue.get()
                 if item is None:
                     break
-            return
+            return []
 
         chunk_index: int = 0
         sent_any = False
+        rendered: List[dict] = []
+        complete = True
         # Only warn about TTS fallback once per turn — repeated warnings on
         # every sentence would be noisy. We reset this in the enclosing turn.
         fallback_announced = False
@@ -570,6 +884,7 @@ class ConnectionManager:
                 break
 
             if session_id not in self.active_connections:
+                complete = False
                 break  # client disconnected mid-stream
 
             job_id = uuid.uuid4().hex[:12]
@@ -599,6 +914,7 @@ class ConnectionManager:
                         "type": "tts_fallback",
                         "engine": synth.engine,
                         "voice_cloned": synth.voice_cloned,
+                        "hedged": synth.hedged,
                         "message": (
                             "Cloned voice unavailable — using default voice for this reply."
                             if speaker_wav else
@@ -614,9 +930,14 @@ class ConnectionManager:
 
                 ts = int(datetime.now(timezone.utc).timestamp() * 1000)
                 video_key = f"videos/{session_id}/{ts}_c{chunk_index}.mp4"
-                video_url = await storage_service.upload_file(
-                    tmp_video.read_bytes(), video_key, content_type="video/mp4"
+                # Moved into place (or streamed to S3) — no in-memory copy —
+                # unless identical bytes are already stored. With
+                # write-behind the S3 upload happens after the send.
+                object_key = await content_store.put_path(
+                    str(tmp_video), video_key, content_type="video/mp4", publish=write_behind.upload_path,
                 )
+                video_url = write_behind.url_for(object_key)
+                retention_service.track_later(session_id, video_key)
 
                 await self.send_message(session_id, {
                     "type": "video_chunk",
@@ -627,9 +948,14 @@ class ConnectionManager:
                 })
                 chunk_index = chunk_index + 1
                 sent_any = True
+                rendered.append({
+                    "text": sentence, "video_key": video_key, "object_key": object_key,
+                    "video_url": write_behind.stored_url(object_key),
+                })
                 logger.info(f"Chunk {chunk_index} ready [{session_id}]")
 
             except Exception as e:
+                complete = False
                 logger.error(f"Chunk {chunk_index} failed [{session_id}]: {e}")
 
             finally:
@@ -645,6 +971,7 @@ class ConnectionManager:
             await self.send_message(session_id, {
                 "type": "error", "message": "Avatar animation failed for all sentences."
             })
+        return rendered if complete else []
 
     # ── helpers ───────────────────────────────────────────────────────────────
 
@@ -683,19 +1010,40 @@ class ConnectionManager:
         return True
 
     async def set_language(self, session_id: str, language: str):
-        """Set TTS language for the session. Falls back to 'en' on unknown codes."""
-        # Match voices.py allowed list
-        allowed = {
-            "ar", "da", "de", "el", "en", "es", "fi", "fr", "he", "hi", "it",
-            "ja", "ko", "ms", "nl", "no", "pl", "pt", "ru", "sv", "sw", "tr", "zh",
-        }
+        """Set TTS + STT language for the session. Falls back to 'en' on unknown codes."""
         lang = (language or "en").lower()
-        if lang not in allowed:
+        if lang not in TTS_LANGUAGES:
             lang = "en"
         if session_id in self.session_data:
             self.session_data[session_id]["language"] = lang
+            self.session_data[session_id]["stt_language"] = lang
             logger.info(f"Language set [{session_id}]: {lang}")
 
+    async def set_stt_profile(self, session_id: str, profile: Optional[str]) -> bool:
+        """Pick the STT decoding profile for the session (None = server default)."""
+        if profile is not None and profile not in STT_PROFILES:
+            return False
+        if session_id in self.session_data:
+            self.session_data[session_id]["stt_profile"] = profile
+            logger.info(f"STT profile set [{session_id}]: {profile or 'default'}")
+        return True
+
+    def _pin_detected_language(self, session_id: str, result: Transcription) -> None:
+        """Pin a confidently detected language so later utterances skip detection."""
+        data = self.session_data.get(session_id)
+        if data is None or not result.language:
+            return
+        if result.language_probability < settings.STT_LANGUAGE_PIN_MIN_PROB:
+            return
+        data["stt_language"] = result.language
+        # Answer in the same language when the TTS engine can speak it.
+        if result.language in TTS_LANGUAGES:
+            data["language"] = result.language
+        logger.info(
+            f"Pinned detected language [{session_id}]: {result.language} "
+            f"(p={result.language_probability:.2f})"
+        )
+
     # ── stale session cleanup ─────────────────────────────────────────────────
 
     async def cleanup_stale(self) -> int:
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Query, status
+from fastapi import Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, Query, status
 from sqlalchemy import text, select
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
@@ -17,9 +17,13 @@ from app.database import engine, Base, AsyncSessionLocal
 from app.models import User, Session as SessionModel
 from app.api.v1 import avatars, conversations, messages, sessions, users
 from app.api.v1 import voices
+from app.api.v1.users import require_current_user
+from app.api import uploads
 from app.websocket import websocket_manager
 from app.services.storage import storage_service
+from app.services.write_behind import write_behind
 from app.services.cache import cache_service
+from app.services.executors import executor_stats, shutdown_executors
 from app.middleware.rate_limiter import RateLimitMiddleware
 from app.middleware.security import SecurityHeadersMiddleware, RequestLoggingMiddleware
 from app.logging_config import configure_logging
@@ -64,6 +68,13 @@ async def lifespan(app: FastAPI):
         await cache_service.initialize()
     except Exception as e:
         logger.warning(f"Cache service init failed: {e}")
+    # Load the TTS model in the background; turns use the fallback engine
+    # until it's ready.
+    try:
+        from app.services.tts import tts_service
+        tts_service.start_loading()
+    except Exception as e:
+        logger.warning(f"TTS preload failed to start: {e}")
 
     # Seed demo user ONLY in DEBUG/development mode. An empty-password user
     # in production would be a critical auth bypass.
@@ -85,11 +96,16 @@ async def lifespan(app: FastAPI):
             logger.warning(f"Could not seed demo user: {e}")
 
     # Mount local uploads directory so the browser can fetch images/videos
-    if getattr(settings, "USE_LOCAL_STORAGE", True):
+    # (with write-behind, fresh video chunks are served from here too).
+    # Behind nginx the uploads router hands the transfers to nginx instead.
+    if getattr(settings, "USE_LOCAL_STORAGE", True) or settings.STORAGE_WRITE_BEHIND:
         uploads_dir = Path(settings.LOCAL_STORAGE_PATH)
         uploads_dir.mkdir(parents=True, exist_ok=True)
-        app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
-        logger.info(f"Serving local uploads from {uploads_dir}")
+        if settings.UPLOADS_ACCEL_REDIRECT:
+            logger.info(f"Local uploads in {uploads_dir} are served by nginx (X-Accel-Redirect)")
+        else:
+            app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
+            logger.info(f"Serving local uploads from {uploads_dir}")
 
     websocket_manager.start_cleanup_task()
     logger.info("AI Avatar System started successfully")
@@ -99,8 +115,10 @@ async def lifespan(app: FastAPI):
     # Cleanup
     logger.info("Shutting down AI Avatar System...")
     await websocket_manager.stop_cleanup_task()
+    await write_behind.drain(settings.WRITE_BEHIND_DRAIN_SECS)
     await storage_service.cleanup()
     await cache_service.cleanup()
+    shutdown_executors()
     logger.info("Shutdown complete")
 
 
@@ -137,6 +155,8 @@ app.include_router(sessions.router,      prefix="/api/v1/sessions",      tags=["
 app.include_router(conversations.router, prefix="/api/v1/conversations",  tags=["conversations"])
 app.include_router(messages.router,      prefix="/api/v1/messages",      tags=["messages"])
 app.include_router(voices.router,        prefix="/api/v1/voices",        tags=["voices"])
+if settings.UPLOADS_ACCEL_REDIRECT:
+    app.include_router(uploads.router, tags=["uploads"])
 
 
 @app.exception_handler(Exception)
@@ -224,7 +244,7 @@ async def health_check():
         from app.services.stt import stt_service
         from app.services.tts import tts_service
         services["stt"] = "loaded" if stt_service.model is not None else "lazy (not yet loaded)"
-        services["tts"] = "loaded" if tts_service.model is not None else "lazy (not yet loaded)"
+        services["tts"] = "loaded" if tts_service.model is not None else "loading (fallback in use)"
     except Exception as e:
         services["stt"] = services["tts"] = f"error: {e}"
 
@@ -234,6 +254,42 @@ async def health_check():
     return health
 
 
+@app.get("/health/details")
+async def health_details(current_user: User = Depends(require_current_user)):
+    """Pipeline internals (worker pools, LLM routes, caches, memory) — superuser only."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    details: dict[str, object] = {}
+
+    # Per-stage worker pools — queue depth + utilization at a glance
+    details["executors"] = executor_stats()
+
+    # LLM routes — TTFT EWMA, hedge wins, circuit breakers, admission queues
+    try:
+        from app.services.llm import llm_service
+        from app.services.llm_limiter import limiter_stats
+        details["llm_routes"] = llm_service.provider_stats()
+        details["llm_admission"] = limiter_stats()
+    except Exception as e:
+        details["llm_routes"] = f"error: {e}"
+
+    # Semantic response cache — entries and hit rate per avatar
+    from app.services.semantic_cache import semantic_cache
+    details["semantic_cache"] = semantic_cache.stats()
+
+    # Long-term memory — loaded (user, avatar) indexes
+    from app.services.memory import memory_service
+    details["memory"] = memory_service.stats()
+
+    # Write-behind chunk uploads still in flight
+    details["write_behind"] = write_behind.stats()
+
+    # Two-tier cache: in-process tier size and invalidation subscriber
+    details["cache"] = cache_service.stats()
+
+    return details
+
+
 async def _verify_ws_session(session_id: str, token: str | None) -> str | None:
     """
     Validate the WebSocket handshake. Returns the user_id that owns the session
@@ -322,6 +378,11 @@ async def websocket_endpoint(
                 lang = data.get("language", "en")
                 await websocket_manager.set_language(session_id, lang)
 
+            elif msg_type == "set_stt_profile":
+                ok = await websocket_manager.set_stt_profile(session_id, data.get("profile"))
+                if not ok:
+                    await websocket.send_json({"type": "error", "message": "Unknown STT profile"})
+
             elif msg_type == "ping":
                 await websocket.send_json({"type": "pong"})
 
@@ -0,0 +1,148 @@
+"""Two-tier cache against an in-memory stand-in for Redis (get/set/delete/pub-sub)."""
+
+import asyncio
+import fnmatch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.config import settings
+from app.services.cache import CacheService, _LocalTier
+
+
+class _FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        self.redis.subscribers.remove(self.queue)
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.gets = 0
+        self.subscribers = []
+
+    async def get(self, key):
+        self.gets += 1
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in [k for k in self.store if fnmatch.fnmatchcase(k, match)]:
+            yield key
+
+    async def publish(self, channel, message):
+        for queue in self.subscribers:
+            queue.put_nowait({"type": "message", "data": message})
+        return len(self.subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return _FakePubSub(self)
+
+    async def close(self):
+        pass
+
+
+def _lookups(namespace, result):
+    return REGISTRY.get_sample_value(
+        "cache_lookups_total", {"namespace": namespace, "result": result},
+    ) or 0.0
+
+
+async def _replica(redis):
+    cache = CacheService()
+    cache.redis = redis
+    cache._start_listener()
+    await asyncio.sleep(0)  # let it subscribe
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_l1_and_writes_invalidate_other_replicas():
+    redis = _FakeRedis()
+    a, b = await _replica(redis), await _replica(redis)
+    try:
+        await a.set("voices:v1", {"wav_path": "one.wav"})
+        before = _lookups("voices", "l1_hit")
+
+        assert await b.get("voices:v1") == {"wav_path": "one.wav"}  # L2, then cached
+        assert await b.get("voices:v1") == {"wav_path": "one.wav"}
+        assert redis.gets == 1 and _lookups("voices", "l1_hit") == before + 1
+
+        await a.set("voices:v1", {"wav_path": "two.wav"})
+        await asyncio.sleep(0)
+        assert await b.get("voices:v1") == {"wav_path": "two.wav"}
+
+        await a.delete_pattern("voices:*")
+        await asyncio.sleep(0)
+        assert await b.get("voices:v1") is None
+    finally:
+        await a.cleanup()
+        await b.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_a_read_racing_a_write_does_not_cache_the_old_value():
+    redis = _FakeRedis()
+    cache = CacheService()
+    cache.redis = redis
+    await redis.set("voices:v1", '{"wav_path": "one.wav"}')
+    release = asyncio.Event()
+    read = redis.get
+
+    async def slow_get(key):
+        value = await read(key)
+        await release.wait()
+        return value
+
+    redis.get = slow_get
+    reading = asyncio.create_task(cache.get("voices:v1"))
+    await asyncio.sleep(0)
+    await cache.set("voices:v1", {"wav_path": "two.wav"})
+    release.set()
+    assert await reading == {"wav_path": "one.wav"}
+    assert cache.local.get("voices:v1") == (True, {"wav_path": "two.wav"})
+
+
+def test_local_tier_is_bounded_by_entries_bytes_and_ttl(monkeypatch):
+    tier = _LocalTier(max_entries=2, max_bytes=100)
+    tier.put("a", 1, 10, ttl=30)
+    tier.put("b", 2, 10, ttl=30)
+    tier.get("a")
+    tier.put("c", 3, 10, ttl=30)  # evicts b, the least recently used
+    assert [tier.get(k)[0] for k in "abc"] == [True, False, True]
+
+    tier.put("big", 4, 95, ttl=30)  # over the byte budget: older entries go
+    assert len(tier) == 1 and tier.get("big") == (True, 4)
+    tier.put("huge", 5, 101, ttl=30)
+    assert tier.get("huge") == (False, None)
+
+    tier.put("short", 6, 1, ttl=0.01)
+    monkeypatch.setattr("app.services.cache.time.monotonic", lambda: float("inf"))
+    assert tier.get("short") == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_without_redis_l1_still_serves_this_process(monkeypatch):
+    cache = CacheService()
+    assert await cache.set("avatars:x", [1, 2]) is False
+    assert await cache.get("avatars:x") == [1, 2]
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", False)
+    await cache.set("avatars:y", 1)
+    assert await cache.get("avatars:y") is None
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models import ContentBlob
+from app.services.content_store import ContentStore
+
+
+@pytest.fixture
+def store(test_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_STORAGE_PATH", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "CONTENT_ADDRESSED_STORAGE", True)
+    return ContentStore(async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False))
+
+
+def _src(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_identical_content_is_stored_once_and_deleted_with_its_last_reference(store, tmp_path):
+    uploads = tmp_path / "uploads"
+    first = await store.put_path(_src(tmp_path, "a.mp4", b"same video"), "videos/cs-s1/c0.mp4")
+    second_src = _src(tmp_path, "b.mp4", b"same video")
+    second = await store.put_path(second_src, "videos/cs-s2/c0.mp4")
+
+    assert first == second and first.startswith("cas/") and first.endswith(".mp4")
+    assert not (tmp_path / "b.mp4").exists()  # write skipped, source consumed
+    assert [p.name for p in uploads.rglob("*") if p.is_file()] == [first.rsplit("/", 1)[1]]
+
+    assert await store.release(["videos/cs-s1/c0.mp4"]) == []
+    assert (uploads / first).exists()  # still referenced by the other session
+    await store.release(["videos/cs-s2/c0.mp4"])
+    assert not (uploads / first).exists()
+
+    # Keys stored before content addressing are deleted as they are.
+    legacy = uploads / "avatars" / "old" / "image.jpg"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(b"jpeg")
+    assert await store.release(["avatars/old/image.jpg"]) == []
+    assert not legacy.exists()
+
+
+@pytest.mark.asyncio
+async def test_put_waits_out_a_concurrent_deletion_of_the_same_content(store, tmp_path):
+    key = await store.put_path(_src(tmp_path, "a.jpg", b"avatar"), "avatars/cs-a1/image.jpg", move=False)
+    digest = key.rsplit("/", 1)[1].split(".")[0]
+    # A collector has claimed the blob and is about to delete it.
+    async with store._db() as db:
+        await db.execute(update(ContentBlob).where(ContentBlob.hash == digest).values(refcount=-1))
+        await db.commit()
+
+    async def finish_deletion():
+        await asyncio.sleep(0.15)
+        (tmp_path / "uploads" / key).unlink()
+        async with store._db() as db:
+            await db.execute(delete(ContentBlob).where(ContentBlob.hash == digest))
+            await db.commit()
+
+    deleting = asyncio.create_task(finish_deletion())
+    again = await store.put_path(_src(tmp_path, "b.jpg", b"avatar"), "avatars/cs-a2/image.jpg", move=False)
+    await deleting
+    assert again == key and (tmp_path / "uploads" / key).read_bytes() == b"avatar"
+    async with store._db() as db:
+        assert (await db.get(ContentBlob, digest)).refcount == 1
+
+
+@pytest.mark.asyncio
+async def test_rewriting_a_key_with_the_same_bytes_keeps_one_reference(store, tmp_path):
+    key = await store.put_path(_src(tmp_path, "a.jpg", b"rewritten avatar"), "avatars/cs-r1/image.jpg")
+    assert await store.put_path(_src(tmp_path, "b.jpg", b"rewritten avatar"), "avatars/cs-r1/image.jpg") == key
+    digest = key.rsplit("/", 1)[1].split(".")[0]
+    async with store._db() as db:
+        assert (await db.get(ContentBlob, digest)).refcount == 1
+
+    assert await store.release(["avatars/cs-r1/image.jpg"]) == []
+    assert not (tmp_path / "uploads" / key).exists()
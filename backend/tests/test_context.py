@@ -0,0 +1,79 @@
+import pytest
+
+from app.config import settings
+from app.websocket import ConnectionManager
+
+
+def _turns(n: int) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"}
+        for i in range(n)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compaction_folds_old_turns_into_summary(monkeypatch):
+    """Everything but the recent window is summarized; the window starts on a user turn."""
+    from app.services.llm import llm_service
+
+    seen = {}
+
+    async def fake_summarize(previous, messages):
+        seen["previous"], seen["messages"] = previous, [m["content"] for m in messages]
+        return "rolled up"
+
+    persisted = []
+
+    async def fake_persist(session_id, summary):
+        persisted.append((session_id, summary))
+
+    monkeypatch.setattr(settings, "LLM_CONTEXT_RECENT_MESSAGES", 5)
+    monkeypatch.setattr(llm_service, "summarize_history", fake_summarize)
+    manager = ConnectionManager()
+    monkeypatch.setattr(manager, "_persist_summary", fake_persist)
+
+    data = {"messages": _turns(22), "summary": "earlier"}
+    await manager._compact_context("s1", data)
+
+    # 22 - 5 = 17 lands on an assistant turn, so the cut moves up to 18.
+    assert seen["previous"] == "earlier"
+    assert seen["messages"] == [f"m{i}" for i in range(18)]
+    assert [m["content"] for m in data["messages"]] == ["m18", "m19", "m20", "m21"]
+    assert data["summary"] == "rolled up"
+    assert persisted == [("s1", "rolled up")]
+
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_turns_added_while_summarizing(monkeypatch):
+    """Turns appended during the summary call survive the in-place rewrite."""
+    from app.services.llm import llm_service
+
+    data = {"messages": _turns(24), "summary": None}
+
+    async def slow_summarize(previous, messages):
+        data["messages"].append({"role": "user", "content": "late"})
+        return "sum"
+
+    async def noop_persist(session_id, summary):
+        pass
+
+    monkeypatch.setattr(settings, "LLM_CONTEXT_RECENT_MESSAGES", 4)
+    monkeypatch.setattr(llm_service, "summarize_history", slow_summarize)
+    manager = ConnectionManager()
+    monkeypatch.setattr(manager, "_persist_summary", noop_persist)
+
+    await manager._compact_context("s1", data)
+    assert [m["content"] for m in data["messages"]] == ["m20", "m21", "m22", "m23", "late"]
+
+
+@pytest.mark.asyncio
+async def test_failed_compaction_leaves_history_untouched(monkeypatch):
+    from app.services.llm import LLMUnavailable, llm_service
+
+    async def failing(previous, messages):
+        raise LLMUnavailable("down")
+
+    monkeypatch.setattr(llm_service, "summarize_history", failing)
+    data = {"messages": _turns(30), "summary": None}
+    await ConnectionManager()._compact_context("s1", data)
+    assert len(data["messages"]) == 30 and data["summary"] is None
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.executors import InstrumentedExecutor
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result_on_named_worker():
+    pool = InstrumentedExecutor("test-basic", max_workers=2)
+    try:
+        name = await pool.run(lambda: threading.current_thread().name)
+        assert name.startswith("test-basic-worker")
+        stats = pool.stats()
+        assert stats["busy"] == 0
+        assert stats["queued"] == 0
+        assert stats["queue_wait_ewma_secs"] is not None
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_is_bounded_and_reports_queue():
+    """With one worker, a second job queues behind the first instead of spawning a thread."""
+    pool = InstrumentedExecutor("test-bounded", max_workers=1)
+    gate = threading.Event()
+    try:
+        first = asyncio.create_task(pool.run(gate.wait, 5))
+        second = asyncio.create_task(pool.run(lambda: "done"))
+        await asyncio.sleep(0.05)
+
+        stats = pool.stats()
+        assert stats["busy"] == 1
+        assert stats["queued"] == 1
+        assert stats["utilization"] == 1.0
+
+        gate.set()
+        assert await first is True
+        assert await second == "done"
+        assert pool.stats()["queued"] == 0
+    finally:
+        gate.set()
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_leaves_queue():
+    pool = InstrumentedExecutor("test-cancel", max_workers=1)
+    gate = threading.Event()
+    try:
+        blocker = asyncio.create_task(pool.run(gate.wait, 5))
+        waiting = asyncio.create_task(pool.run(lambda: "never"))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert pool.stats()["queued"] == 0
+        gate.set()
+        await blocker
+    finally:
+        gate.set()
+        pool.shutdown()
@@ -0,0 +1,42 @@
+import json
+import time
+
+import pytest
+
+from app.services.fake_llm import FakeLLM, _load_script
+from app.services.llm import LLMService, LLMUnavailable
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_streams_deterministic_echo():
+    svc = LLMService(provider="fake", model="fake-1")
+    svc.client = FakeLLM(ttft=0, tokens_per_sec=0, response_words=12)
+    messages = [{"role": "user", "content": "hello avatar"}]
+
+    chunks = [c async for c in svc.stream_response(messages)]
+    assert "".join(chunks).startswith("You said: hello avatar.")
+    assert len(chunks) == 12
+    assert await svc.generate_response(messages) == "".join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_honours_ttft_and_token_rate():
+    fake = FakeLLM(ttft=0.05, tokens_per_sec=200, response_words=11)
+    started = time.perf_counter()
+    stamps = []
+    async for _ in fake.stream([{"role": "user", "content": "hi"}]):
+        stamps.append(time.perf_counter() - started)
+    assert stamps[0] >= 0.05
+    assert stamps[-1] - stamps[0] >= 10 / 200 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_serves_script_in_order_and_injects_errors(tmp_path):
+    script = tmp_path / "replies.json"
+    script.write_text(json.dumps(["First reply.", "Second reply."]))
+    fake = FakeLLM(ttft=0, tokens_per_sec=0, script=_load_script(str(script)))
+    assert [await fake.generate([]) for _ in range(3)] == ["First reply.", "Second reply.", "First reply."]
+
+    broken = FakeLLM(ttft=0, error_rate=1.0)
+    with pytest.raises(LLMUnavailable):
+        await broken.generate([])
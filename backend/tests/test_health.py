@@ -30,3 +30,10 @@ async def test_docs_available_in_debug(client: AsyncClient):
     response = await client.get("/docs")
     # In debug mode, docs should be available (redirect or 200)
     assert response.status_code in [200, 307]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_internals_need_a_superuser(client: AsyncClient):
+    """Public /health stays coarse; pool, cache and LLM stats need authentication."""
+    assert "executors" not in (await client.get("/health")).json()
+    assert (await client.get("/health/details")).status_code == 401
@@ -0,0 +1,245 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.llm import LLMService, estimate_tokens, llm_service, message_tokens
+
+
+def _msg(role: str, words: int) -> dict:
+    return {"role": role, "content": " ".join(["word"] * words)}
+
+
+def test_message_tokens_is_cached_on_the_message():
+    msg = _msg("user", 10)
+    first = message_tokens(msg)
+    assert msg["tokens"] == first > estimate_tokens(msg["content"])
+    msg["content"] = "changed"  # the cached estimate is reused, not recomputed
+    assert message_tokens(msg) == first
+
+
+def test_build_context_packs_newest_turns_into_budget(monkeypatch):
+    """Oldest turns are dropped first; the window starts on a user turn; tokens are stripped."""
+    history = [_msg("user" if i % 2 == 0 else "assistant", 100) for i in range(10)]
+    per_msg = message_tokens(history[0])
+    system = "sys"
+    monkeypatch.setattr(settings, "LLM_CONTEXT_TOKEN_BUDGETS", {})
+    monkeypatch.setattr(
+        settings, "LLM_CONTEXT_TOKEN_BUDGET", estimate_tokens(system) + per_msg * 3 + 1
+    )
+
+    context = llm_service.build_context(history, system)
+
+    # Three newest fit, but the first of those is an assistant turn → two remain.
+    assert len(context) == 2
+    assert context[0]["role"] == "user"
+    assert all(set(m) == {"role", "content"} for m in context)
+
+
+def test_build_context_always_keeps_latest_message(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CONTEXT_TOKEN_BUDGETS", {})
+    monkeypatch.setattr(settings, "LLM_CONTEXT_TOKEN_BUDGET", 1)
+    context = llm_service.build_context([_msg("user", 5), _msg("assistant", 5), _msg("user", 500)])
+    assert len(context) == 1 and context[0]["content"].count("word") == 500
+
+
+def test_context_budget_prefers_model_then_provider_override(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CONTEXT_TOKEN_BUDGET", 8000)
+    monkeypatch.setattr(settings, "LLM_CONTEXT_TOKEN_BUDGETS", {llm_service.provider: 5000})
+    assert llm_service.context_budget() == 5000
+    monkeypatch.setattr(
+        settings, "LLM_CONTEXT_TOKEN_BUDGETS",
+        {llm_service.provider: 5000, llm_service.model: 3000},
+    )
+    assert llm_service.context_budget() == 3000
+
+
+def _service(messages_api) -> LLMService:
+    """An Anthropic-flavoured LLMService wired to a fake `client.messages`."""
+    svc = LLMService()
+    svc.provider, svc.model = "anthropic", "m"
+    svc.client = SimpleNamespace(messages=messages_api)
+    return svc
+
+
+class _FakeStream:
+    def __init__(self, usage):
+        self._usage = usage
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        yield "Hi"
+
+    async def get_final_message(self):
+        return SimpleNamespace(usage=self._usage)
+
+
+@pytest.mark.asyncio
+async def test_stream_marks_history_breakpoint_and_tracks_hit_ratio():
+    """The two newest messages carry cache_control; cache reads accumulate per session."""
+    calls = []
+    usages = iter([
+        SimpleNamespace(input_tokens=20, cache_creation_input_tokens=980, cache_read_input_tokens=0, output_tokens=5),
+        SimpleNamespace(input_tokens=20, cache_creation_input_tokens=40, cache_read_input_tokens=940, output_tokens=5),
+    ])
+
+    def stream(**kwargs):
+        calls.append(kwargs)
+        return _FakeStream(next(usages))
+
+    svc = _service(SimpleNamespace(stream=stream))
+
+    history = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}, {"role": "user", "content": "c"}]
+    for _ in range(2):
+        assert [t async for t in svc._stream_anthropic(history, "sys", session_id="s1")] == ["Hi"]
+
+    sent = calls[0]["messages"]
+    assert sent[0] == history[0]
+    assert sent[1]["content"] == [{"type": "text", "text": "b", "cache_control": {"type": "ephemeral"}}]
+    assert sent[-1]["content"] == [{"type": "text", "text": "c", "cache_control": {"type": "ephemeral"}}]
+    assert history[-1]["content"] == "c"  # caller's list is untouched
+    assert svc.cache_stats("s1") == {"read": 940, "write": 1020, "uncached": 40}
+
+
+@pytest.mark.asyncio
+async def test_prewarm_is_deduplicated_per_prompt_within_ttl(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        usage = SimpleNamespace(cache_creation_input_tokens=1500, cache_read_input_tokens=0)
+        return SimpleNamespace(headers={}, parse=lambda: SimpleNamespace(usage=usage))
+
+    monkeypatch.setattr(settings, "LLM_PREWARM_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_PREWARM_MIN_TOKENS", 10)
+    svc = _service(SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    prompt = "You are a museum guide. " * 20
+
+    first = svc.prewarm(prompt)
+    assert svc.prewarm(prompt) is first  # in flight → same task
+    await first
+    assert svc.prewarm(prompt) is None  # warm → skipped
+    assert svc.prewarm("too short") is None
+    assert len(calls) == 1
+    assert calls[0]["max_tokens"] == 1
+    assert calls[0]["system"][0]["cache_control"] == {"type": "ephemeral"}
+
+    svc._warm_until.clear()  # TTL lapsed
+    await svc.prewarm(prompt)
+    assert len(calls) == 2
+
+
+
+@pytest.mark.asyncio
+async def test_prewarm_goes_through_the_limiter_and_never_queues(monkeypatch):
+    """A busy provider skips the warm-up; an admitted one feeds its rate-limit headers back."""
+    from app.services import llm_limiter
+
+    limiter = llm_limiter.ProviderLimiter("anthropic", max_concurrency=1)
+    monkeypatch.setitem(llm_limiter._LIMITERS, "anthropic", limiter)
+    monkeypatch.setattr(settings, "LLM_PREWARM_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_PREWARM_MIN_TOKENS", 10)
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        usage = SimpleNamespace(cache_creation_input_tokens=1500, cache_read_input_tokens=0)
+        return SimpleNamespace(
+            headers={"anthropic-ratelimit-input-tokens-limit": "40000"},
+            parse=lambda: SimpleNamespace(usage=usage),
+        )
+
+    svc = _service(SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    prompt = "You are a museum guide. " * 20
+
+    async with limiter.admit():  # a live turn holds the only slot
+        assert svc.prewarm(prompt) is None
+    assert calls == []
+
+    await svc.prewarm(prompt)
+    assert len(calls) == 1
+    assert limiter.stats()["tokens_per_minute"] == 40000
+
+
+def _route(name: str, chunks, ttft: float = 0.0, fail: Exception = None) -> LLMService:
+    """An LLM route whose stream yields `chunks` after `ttft` seconds (or raises `fail`)."""
+    svc = LLMService()
+    svc.name = name
+    svc.started = 0
+
+    async def stream(*args):
+        svc.started += 1
+        await asyncio.sleep(ttft)
+        if fail is not None:
+            raise fail
+        for chunk in chunks:
+            yield chunk
+
+    svc._stream_single = stream
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_hedge_starts_secondary_after_ttft_budget_and_cancels_loser():
+    primary = _route("slow", ["late"], ttft=5)
+    primary.secondary = _route("fast", ["Hello", " there"])
+    primary.hedge_ttft = 0.02
+
+    chunks = [c async for c in primary.stream_response([{"role": "user", "content": "hi"}])]
+
+    assert chunks == ["Hello", " there"]
+    assert primary.stats.cancelled == 1
+    assert primary.secondary.stats.hedges_won == 1
+    assert primary.secondary.stats.ttft_ewma_secs is not None
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_never_starts_secondary():
+    primary = _route("primary", ["ok"])
+    primary.secondary = _route("secondary", ["unused"])
+    primary.hedge_ttft = 1.0
+
+    assert [c async for c in primary.stream_response([])] == ["ok"]
+    assert primary.secondary.started == 0
+
+
+@pytest.mark.asyncio
+async def test_failures_fail_over_and_open_the_breaker(monkeypatch):
+    """Outages fail over immediately; enough of them skip the primary entirely."""
+    from app.services.llm import LLMUnavailable
+
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN_SECS", 60)
+    primary = _route("down", [], fail=LLMUnavailable("503"))
+    primary.secondary = _route("backup", ["fine"])
+    primary.hedge_ttft = 10  # failover must not wait for the budget
+
+    for _ in range(2):
+        assert [c async for c in primary.stream_response([])] == ["fine"]
+    assert primary.started == 2 and not primary.stats.available()
+
+    assert [c async for c in primary.stream_response([])] == ["fine"]
+    assert primary.started == 2  # breaker open → primary skipped
+    assert primary.provider_stats()["down"]["circuit_open"] is True
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_onto_a_route_that_would_queue(monkeypatch):
+    """With the shared limiter full, the slow primary is waited out rather than doubled up."""
+    from app.services import llm_limiter
+
+    monkeypatch.setitem(llm_limiter._LIMITERS, "hedge-test", llm_limiter.ProviderLimiter("hedge-test", 1))
+    primary = _route("slow", ["late"], ttft=0.1)
+    primary.secondary = _route("other-model", ["unused"])
+    primary.provider = primary.secondary.provider = "hedge-test"
+    primary.hedge_ttft = 0.02
+
+    assert [c async for c in primary.stream_response([])] == ["late"]
+    assert primary.secondary.started == 0
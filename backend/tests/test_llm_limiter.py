@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.llm import LLMRateLimited, LLMService
+from app.services.llm_limiter import ProviderLimiter, _TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_limiter_caps_concurrency_and_queues_the_rest():
+    limiter = ProviderLimiter("test", max_concurrency=2)
+    running, peak = 0, 0
+
+    async def call():
+        nonlocal running, peak
+        async with limiter.admit():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call() for _ in range(6)))
+    assert peak == 2
+    assert limiter.stats()["in_flight"] == 0 and limiter.stats()["queued"] == 0
+
+
+def test_token_bucket_and_rate_limit_headers():
+    bucket = _TokenBucket(6000)  # 100 tokens/s
+    assert bucket.delay_for(6000) == 0
+    bucket.take(6000)
+    assert bucket.delay_for(100) == pytest.approx(1.0, abs=0.05)
+
+    limiter = ProviderLimiter("test", max_concurrency=4)
+    limiter.observe_headers({
+        "anthropic-ratelimit-input-tokens-limit": "40000",
+        "anthropic-ratelimit-input-tokens-remaining": "0",
+        "anthropic-ratelimit-input-tokens-reset": "2099-01-01T00:00:00Z",
+    })
+    stats = limiter.stats()
+    assert stats["tokens_per_minute"] == 40000
+    assert stats["blocked_for_secs"] > 0
+
+
+def _route(script):
+    """LLM route whose successive stream attempts follow `script` (exception or chunk list)."""
+    svc = LLMService()
+    svc.provider = f"fake-{id(script)}"  # private limiter per test
+    attempts = iter(script)
+
+    async def stream(*args):
+        step = next(attempts)
+        for item in step:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    svc._stream_single = stream
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_before_first_token_is_retried(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_RETRIES", 2)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY_SECS", 0.001)
+    svc = _route([[LLMRateLimited("429", retry_after=0.0)], ["ok"]])
+    assert [c async for c in svc.stream_response([])] == ["ok"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_after_first_token_is_not_retried(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY_SECS", 0.001)
+    svc = _route([["partial", LLMRateLimited("429")], ["never"]])
+    got = []
+    with pytest.raises(LLMRateLimited):
+        async for chunk in svc.stream_response([]):
+            got.append(chunk)
+    assert got == ["partial"]
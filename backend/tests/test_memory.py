@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import MemoryEmbedding, Message, Session
+from app.services.embeddings import Embedder
+from app.services.memory import MemoryService
+
+
+def _service(test_engine) -> MemoryService:
+    factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=True)
+    return MemoryService(embedder=Embedder(model_name=""), session_factory=factory, allow_hashed=True)
+
+
+@pytest.mark.asyncio
+async def test_recall_backfills_history_and_returns_relevant_exchanges(test_engine, db_session):
+    """First use indexes past sessions; recall returns the closest exchange, not the whole history."""
+    db_session.add_all([
+        Session(id="mem-s1", user_id="mem-u1", avatar_id="mem-a1"),
+        Session(id="mem-s2", user_id="mem-u1", avatar_id="mem-a1"),
+    ])
+    turns = [
+        ("mem-s1", "user", "My dog is called Biscuit and she loves the beach"),
+        ("mem-s1", "assistant", "Biscuit sounds like a lovely beach dog!"),
+        ("mem-s2", "user", "I am learning to play the violin this year"),
+        ("mem-s2", "assistant", "Good luck with the violin lessons."),
+    ]
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    db_session.add_all(
+        Message(session_id=s, role=r, content=c, created_at=start + timedelta(seconds=i))
+        for i, (s, r, c) in enumerate(turns)
+    )
+    await db_session.commit()
+
+    memory = _service(test_engine)
+    # Backfill runs in the background; the first turn doesn't wait for it.
+    assert await memory.recall("mem-u1", "mem-a1", "what was my dog called again?", k=1) == []
+    await memory.drain()
+    found = await memory.recall("mem-u1", "mem-a1", "what was my dog called again?", k=1)
+    assert [m.user_text for m in found] == ["My dog is called Biscuit and she loves the beach"]
+    assert "Biscuit" in memory.format(found)
+
+    rows = await db_session.execute(
+        select(func.count()).select_from(MemoryEmbedding).where(MemoryEmbedding.user_id == "mem-u1")
+    )
+    assert rows.scalar_one() == 2
+    excluded = await memory.recall(
+        "mem-u1", "mem-a1", "what was my dog called again?",
+        exclude={"My dog is called Biscuit and she loves the beach"},
+    )
+    assert all("Biscuit" not in m.user_text for m in excluded)
+
+
+@pytest.mark.asyncio
+async def test_remembered_exchange_is_searchable_and_persisted(test_engine):
+    memory = _service(test_engine)
+    assert await memory.recall("mem-u2", "mem-a2", "which museum do I work at now") == []
+
+    await memory.remember("mem-u2", "mem-a2", "mem-s3", "I work at the harbour museum now", "Congrats on the museum job!")
+    assert (await memory.recall("mem-u2", "mem-a2", "which museum do I work at now"))[0].user_text.startswith("I work")
+
+    # A fresh process loads it back from the table.
+    reloaded = _service(test_engine)
+    found = await reloaded.recall("mem-u2", "mem-a2", "which museum do I work at now")
+    assert [m.assistant_text for m in found] == ["Congrats on the museum job!"]
+
+
+@pytest.mark.asyncio
+async def test_turn_injects_memories_into_outgoing_message_only(monkeypatch):
+    """Recalled memories prefix the user message sent to the LLM, not the session history."""
+    import app.websocket as ws
+    from app.services.memory import Memory
+    from app.websocket import ConnectionManager
+
+    async def fake_recall(user_id, avatar_id, query, exclude=(), k=None):
+        return [Memory("I live in Lisbon", "Lisbon is beautiful.")]
+
+    monkeypatch.setattr(ws.memory_service, "recall", fake_recall)
+    monkeypatch.setattr(ws.memory_service, "allow_hashed", True)
+    monkeypatch.setattr(ws.memory_service, "remember_later", lambda *a, **k: None)
+
+    manager = ConnectionManager()
+    seen = {}
+
+    async def fake_producer(session_id, messages, system_prompt, queue, summary=None):
+        seen["messages"] = messages
+        await queue.put(None)
+        return "Sunny, as usual."
+
+    async def drain(session_id, queue):
+        while await queue.get() is not None:
+            pass
+        return []
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(manager, "_llm_producer", fake_producer)
+    monkeypatch.setattr(manager, "_animate_from_queue", drain)
+    monkeypatch.setattr(manager, "send_message", noop)
+    monkeypatch.setattr(manager, "_persist_message", noop)
+    monkeypatch.setattr(manager, "_ensure_conversation_title", noop)
+    manager.active_connections["s1"] = object()
+    data = manager.session_data["s1"] = {"messages": [], "user_id": "u1", "avatar_id": "a1"}
+
+    await manager._handle_text_input_inner("s1", "How is the weather at home?")
+
+    outgoing = seen["messages"][-1]["content"]
+    assert "I live in Lisbon" in outgoing and outgoing.endswith("How is the weather at home?")
+    assert [m["content"] for m in data["messages"]] == ["How is the weather at home?", "Sunny, as usual."]
+
+
+@pytest.mark.asyncio
+async def test_stale_rows_are_reembedded_in_the_background(test_engine, db_session):
+    """Rows from another embedding model aren't served until re-embedded off the turn's path."""
+    memory = _service(test_engine)
+    db_session.add(MemoryEmbedding(
+        user_id="mem-u3", avatar_id="mem-a3", session_id="mem-s4",
+        user_text="My sister lives in Porto", assistant_text="Porto is lovely.",
+        embedding=b"\0" * 16, embedder="some-old-model",
+    ))
+    await db_session.commit()
+
+    assert await memory.recall("mem-u3", "mem-a3", "where does my sister live") == []
+    await memory.drain()
+    found = await memory.recall("mem-u3", "mem-a3", "where does my sister live")
+    assert [m.user_text for m in found] == ["My sister lives in Porto"]
+
+    # Lexical embeddings alone don't replace the raw history.
+    assert MemoryService(embedder=Embedder(model_name="")).active is False
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models import StoredObject
+from app.services import content_store as content_store_module
+from app.services.retention import RetentionService
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_STORAGE_PATH", str(tmp_path / "uploads"))
+    return tmp_path / "uploads"
+
+
+@pytest.fixture
+def factory(test_engine, monkeypatch):
+    factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(content_store_module.content_store, "_session_factory", factory)
+    return factory
+
+
+def _write(uploads, key):
+    path = uploads / key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"video")
+    return path
+
+
+async def _keys(factory):
+    async with factory() as db:
+        return set((await db.execute(select(StoredObject.key))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_session_release_deletes_unpinned_chunks_and_their_directory(factory, uploads):
+    service = RetentionService(session_factory=factory)
+    keys = [f"videos/ret-s1/{i}_c{i}.mp4" for i in range(3)]
+    for key in keys:
+        _write(uploads, key)
+    await service.track("ret-s1", keys)
+    await service.pin([keys[2]])
+
+    assert await service.release_session("ret-s1") == 2
+    assert not (uploads / keys[0]).exists() and not (uploads / keys[1]).exists()
+    assert (uploads / keys[2]).exists()  # the semantic cache still replays it
+    assert keys[2] in await _keys(factory) and keys[0] not in await _keys(factory)
+
+    # Pinned chunks go once the cache TTL runs out, and the emptied directory with them.
+    await service.expire(now=datetime.now(timezone.utc) + timedelta(seconds=settings.SEMANTIC_CACHE_CHUNK_TTL_SECS + 1))
+    assert not (uploads / "videos" / "ret-s1").exists()
+
+
+@pytest.mark.asyncio
+async def test_expire_sweeps_only_past_due_objects_and_skips_pending_uploads(factory, uploads, monkeypatch):
+    service = RetentionService(session_factory=factory)
+    old, fresh, uploading = "videos/ret-s2/old.mp4", "videos/ret-s2/fresh.mp4", "videos/ret-s2/up.mp4"
+    for key in (old, fresh, uploading):
+        _write(uploads, key)
+    await service.track("ret-s2", [old, uploading])
+    monkeypatch.setattr(settings, "VIDEO_CHUNK_TTL_SECS", 10 * 86400)
+    await service.track("ret-s2", [fresh])
+    monkeypatch.setattr(content_store_module.write_behind, "is_pending", lambda key: key == uploading)
+
+    assert await service.expire(now=datetime.now(timezone.utc) + timedelta(days=2)) == 1
+    assert not (uploads / old).exists()
+    # Fresh chunks aren't due; one still uploading is retried next sweep.
+    assert (uploads / uploading).exists() and (uploads / fresh).exists()
+    assert {uploading, fresh} <= await _keys(factory)
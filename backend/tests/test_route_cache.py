@@ -0,0 +1,80 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.api.caching import invalidate_routes
+from app.models import Avatar, Conversation, Message, Session
+from app.services import summaries
+from app.services.cache import cache_service
+from app.services.llm import llm_service
+
+
+def _avatar(name: str) -> Avatar:
+    avatar_id = str(uuid.uuid4())
+    return Avatar(
+        id=avatar_id, user_id="demo-user", name=name, status="ready",
+        image_url=f"http://test/uploads/avatars/{avatar_id}/image.jpg", s3_key=f"avatars/{avatar_id}/image.jpg",
+    )
+
+
+@pytest.mark.asyncio
+async def test_avatar_list_is_cached_until_a_mutation_invalidates_it(client: AsyncClient, db_session):
+    """Reads are served from the cache; renaming an avatar drops the user's cached results."""
+    await invalidate_routes("demo-user", "avatars")
+    first, second = _avatar("First"), _avatar("Second")
+    db_session.add(first)
+    await db_session.commit()
+    try:
+        listed = (await client.get("/api/v1/avatars/")).json()
+        assert [a["name"] for a in listed] == ["First"]
+        assert (await client.get(f"/api/v1/avatars/{first.id}")).json()["name"] == "First"
+
+        # Written behind the API's back: still the cached answer.
+        db_session.add(second)
+        await db_session.commit()
+        assert [a["name"] for a in (await client.get("/api/v1/avatars/")).json()] == ["First"]
+        # Different query parameters are a different entry.
+        assert len((await client.get("/api/v1/avatars/?limit=5")).json()) == 2
+
+        resp = await client.patch(f"/api/v1/avatars/{first.id}/name", json={"name": "Renamed"})
+        assert resp.status_code == 200
+        names = {a["name"] for a in (await client.get("/api/v1/avatars/")).json()}
+        assert names == {"Renamed", "Second"}
+        assert (await client.get(f"/api/v1/avatars/{first.id}")).json()["name"] == "Renamed"
+    finally:
+        await db_session.delete(first)
+        await db_session.delete(second)
+        await db_session.commit()
+        cache_service.local.clear()
+
+
+@pytest.mark.asyncio
+async def test_background_summary_drops_the_cached_conversation_list(client: AsyncClient, db_session, test_engine, monkeypatch):
+    """A summary written by the job shows up in the list without waiting out the TTL."""
+    await invalidate_routes("demo-user", "conversations")
+    session = Session(id=str(uuid.uuid4()), user_id="demo-user", avatar_id="rc-avatar")
+    conversation = Conversation(session_id=session.id, title="Chat", message_count=1)
+    message = Message(session_id=session.id, role="user", content="hello")
+    db_session.add_all([session, conversation, message])
+    await db_session.commit()
+
+    async def fake_generate(messages, system_prompt=None):
+        return "They said hello."
+
+    monkeypatch.setattr(llm_service, "generate_response", fake_generate)
+    try:
+        listed = (await client.get("/api/v1/conversations/")).json()
+        assert [c["summary"] for c in listed if c["id"] == conversation.id] == [None]
+
+        factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+        assert await summaries.summarize_conversation(conversation.id, session_factory=factory) == "They said hello."
+        db_session.expire_all()
+        listed = (await client.get("/api/v1/conversations/")).json()
+        assert [c["summary"] for c in listed if c["id"] == conversation.id] == ["They said hello."]
+    finally:
+        for row in (message, conversation, session):
+            await db_session.delete(row)
+        await db_session.commit()
+        cache_service.local.clear()
@@ -0,0 +1,283 @@
+"""S3StorageService against a minimal in-process S3-compatible server."""
+
+import re
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+from app.config import settings
+from app.services import storage as storage_module
+from app.services.storage import S3StorageService
+
+
+def _decode_aws_chunked(body: bytes) -> bytes:
+    out, rest = b"", body
+    while rest:
+        header, rest = rest.split(b"\r\n", 1)
+        size = int(header.split(b";")[0], 16)
+        if size == 0:
+            break
+        out, rest = out + rest[:size], rest[size + 2:]
+    return out
+
+
+class _FakeS3:
+    """Path-style bucket/object PUT, GET, HEAD, DELETE and multipart — enough for the service."""
+
+    def __init__(self):
+        self.buckets = set()
+        self.objects = {}
+        self.peers = set()
+        self.uploads = {}
+        self.part_sizes = []
+        self.aborted = 0
+        self.undeletable = set()
+        self.bulk_deletes = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.peers.add(request.transport.get_extra_info("peername"))
+        bucket, _, key = request.path.lstrip("/").partition("/")
+        body = await request.read()
+        if not key:
+            if request.method == "POST" and "delete" in request.query:
+                return self._delete_objects(bucket, body)
+            if request.method == "PUT":
+                self.buckets.add(bucket)
+                return web.Response()
+            return web.Response(status=200 if bucket in self.buckets else 404)
+        if "aws-chunked" in request.headers.get("Content-Encoding", ""):
+            body = _decode_aws_chunked(body)
+        query = request.query
+        if request.method == "POST" and "uploads" in query:
+            upload_id = f"up{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+            return web.Response(content_type="application/xml", text=(
+                f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            ))
+        if request.method == "PUT" and "partNumber" in query:
+            self.uploads[query["uploadId"]][int(query["partNumber"])] = body
+            self.part_sizes.append(len(body))
+            return web.Response(headers={"ETag": f'"part{query["partNumber"]}"'})
+        if request.method == "POST" and "uploadId" in query:
+            parts = self.uploads.pop(query["uploadId"])
+            self.objects[(bucket, key)] = b"".join(parts[n] for n in sorted(parts))
+            return web.Response(content_type="application/xml", text=(
+                f"<CompleteMultipartUploadResult><Key>{key}</Key><ETag>\"done\"</ETag>"
+                "</CompleteMultipartUploadResult>"
+            ))
+        if request.method == "DELETE" and "uploadId" in query:
+            self.uploads.pop(query["uploadId"], None)
+            self.aborted += 1
+            return web.Response(status=204)
+        if request.method == "PUT":
+            self.objects[(bucket, key)] = body
+            return web.Response(headers={"ETag": '"etag"'})
+        if (bucket, key) not in self.objects:
+            return web.Response(
+                status=404, content_type="application/xml",
+                text="<Error><Code>NoSuchKey</Code><Message>missing</Message></Error>",
+            )
+        if request.method == "DELETE":
+            del self.objects[(bucket, key)]
+            return web.Response(status=204)
+        return web.Response(body=self.objects[(bucket, key)], content_type="application/octet-stream")
+
+    def _delete_objects(self, bucket: str, body: bytes) -> web.Response:
+        self.bulk_deletes += 1
+        errors = ""
+        for key in re.findall(r"<Key>(.*?)</Key>", body.decode()):
+            if key in self.undeletable:
+                errors += f"<Error><Key>{key}</Key><Code>AccessDenied</Code><Message>no</Message></Error>"
+            else:
+                self.objects.pop((bucket, key), None)
+        return web.Response(content_type="application/xml", text=f"<DeleteResult>{errors}</DeleteResult>")
+
+
+@pytest.fixture
+def s3_settings(monkeypatch):
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", "avatars-test")
+    monkeypatch.setattr(settings, "CLOUDFRONT_DOMAIN", None)
+    monkeypatch.setattr(settings, "AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setattr(settings, "AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(settings, "AWS_REGION", "us-east-1")
+    return monkeypatch
+
+
+@asynccontextmanager
+async def _s3_stand_in(monkeypatch):
+    # Started inside the test (not an async fixture) so the server and the
+    # client share the test's event loop.
+    fake = _FakeS3()
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(settings, "S3_ENDPOINT_URL", f"http://127.0.0.1:{port}")
+    service = S3StorageService()
+    try:
+        yield service, fake
+    finally:
+        await service.cleanup()
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_roundtrip_reuses_one_pooled_client(s3_settings, tmp_path):
+    async with _s3_stand_in(s3_settings) as (service, fake):
+        await _roundtrip(service, fake, tmp_path)
+
+
+async def _roundtrip(service, fake, tmp_path):
+    await service.initialize()
+    client = service._client
+    assert "avatars-test" in fake.buckets
+    fake.peers.clear()
+
+    url = await service.upload_file(b"jpeg", "avatars/a1/image.jpg", content_type="image/jpeg")
+    assert url.endswith("/avatars-test/avatars/a1/image.jpg")
+    src = tmp_path / "c0.mp4"
+    src.write_bytes(b"video")
+    await service.upload_path(str(src), "videos/s1/c0.mp4", content_type="video/mp4")
+    assert not src.exists()
+
+    assert await service.download_file("avatars/a1/image.jpg") == b"jpeg"
+    assert await service.download_file("videos/s1/c0.mp4") == b"video"
+    await service.delete_file("avatars/a1/image.jpg")
+    assert ("avatars-test", "avatars/a1/image.jpg") not in fake.objects
+
+    assert service._client is client
+    assert len(fake.peers) == 1  # every call rode the same keep-alive connection
+
+
+@pytest.mark.asyncio
+async def test_call_latency_is_recorded_by_operation_and_outcome(s3_settings):
+    async with _s3_stand_in(s3_settings) as (service, _):
+        await _failed_call_is_timed_and_client_reopens(service)
+
+
+async def _failed_call_is_timed_and_client_reopens(service):
+    before = _count("get_object", "error")
+    with pytest.raises(Exception):
+        await service.download_file("missing.bin")
+    assert _count("get_object", "error") == before + 1
+
+    await service.cleanup()
+    assert service._client is None
+    # A cleaned-up service reopens its client on next use.
+    await service.upload_file(b"x", "k")
+    assert service._client is not None
+
+
+@pytest.mark.asyncio
+async def test_large_files_and_streams_go_up_as_multipart(s3_settings, tmp_path):
+    s3_settings.setattr(settings, "S3_MULTIPART_THRESHOLD_BYTES", 1000)
+    s3_settings.setattr(settings, "S3_MULTIPART_PART_BYTES", 400)
+    s3_settings.setattr(settings, "S3_MULTIPART_CONCURRENCY", 2)
+    payload = bytes(range(256)) * 10  # 2560 bytes
+
+    async with _s3_stand_in(s3_settings) as (service, fake):
+        src = tmp_path / "big.mp4"
+        src.write_bytes(payload)
+        await service.upload_path(str(src), "videos/big.mp4", content_type="video/mp4")
+        assert fake.objects[("avatars-test", "videos/big.mp4")] == payload
+        assert fake.part_sizes == [400] * 6 + [160]
+        assert not src.exists()
+
+        async def chunks(data, size):
+            for i in range(0, len(data), size):
+                yield data[i:i + size]
+
+        fake.part_sizes.clear()
+        await service.upload_stream(chunks(payload, 333), "videos/streamed.mp4")
+        assert fake.objects[("avatars-test", "videos/streamed.mp4")] == payload
+        assert fake.part_sizes == [400] * 6 + [160]
+
+        # Below the threshold a stream is a single PUT.
+        fake.part_sizes.clear()
+        await service.upload_stream(chunks(b"small", 2), "small.bin")
+        assert fake.objects[("avatars-test", "small.bin")] == b"small" and fake.part_sizes == []
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_aborts_the_multipart_upload(s3_settings):
+    s3_settings.setattr(settings, "S3_MULTIPART_THRESHOLD_BYTES", 10)
+    s3_settings.setattr(settings, "S3_MULTIPART_PART_BYTES", 10)
+
+    async def broken():
+        yield b"x" * 25
+        raise OSError("animator died")
+
+    async with _s3_stand_in(s3_settings) as (service, fake):
+        with pytest.raises(OSError):
+            await service.upload_stream(broken(), "videos/partial.mp4")
+        assert fake.aborted == 1 and fake.uploads == {}
+        assert ("avatars-test", "videos/partial.mp4") not in fake.objects
+
+
+@pytest.mark.asyncio
+async def test_delete_many_batches_delete_objects_and_reports_failures(s3_settings, monkeypatch):
+    monkeypatch.setattr(storage_module, "_DELETE_BATCH", 2)
+    async with _s3_stand_in(s3_settings) as (service, fake):
+        keys = [f"videos/s1/c{i}.mp4" for i in range(5)]
+        for key in keys:
+            fake.objects[("avatars-test", key)] = b"v"
+        fake.undeletable.add(keys[3])
+
+        assert await service.delete_many(keys + ["videos/s1/missing.mp4"]) == [keys[3]]
+        assert fake.bulk_deletes == 3
+        assert list(fake.objects) == [("avatars-test", keys[3])]
+
+
+def test_client_urls_are_presigned_and_reused_within_a_window(s3_settings):
+    import datetime as dt
+
+    import boto3
+    import botocore.auth
+    from botocore.config import Config
+
+    s3_settings.setattr(settings, "S3_ENDPOINT_URL", "")
+    s3_settings.setattr(settings, "AWS_REGION", "eu-west-1")
+    s3_settings.setattr(settings, "S3_PRESIGN_TTL_SECS", 600)
+    s3_settings.setattr(settings, "S3_PRESIGN_WINDOW_SECS", 300)
+    service = S3StorageService()
+    now = 1_800_000_123
+    s3_settings.setattr(storage_module.time, "time", lambda: now)
+
+    url = service.client_url("avatars/a1/image.jpg")
+    assert service.client_url("avatars/a1/image.jpg") is url  # cached
+    assert "X-Amz-Expires=900" in url  # ttl + window
+
+    # Same signature botocore produces for the window start.
+    window_start = dt.datetime.fromtimestamp(now - now % 300, dt.timezone.utc).replace(tzinfo=None)
+    s3_settings.setattr(botocore.auth, "get_current_datetime", lambda *a, **k: window_start)
+    expected = boto3.client(
+        "s3", region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test",
+        config=Config(signature_version="s3v4", s3={"addressing_style": "virtual"}),
+    ).generate_presigned_url(
+        "get_object", Params={"Bucket": "avatars-test", "Key": "avatars/a1/image.jpg"}, ExpiresIn=900,
+    )
+    assert parse_qs(urlsplit(url).query) == parse_qs(urlsplit(expected).query)
+
+    # Stored URLs are re-signed; foreign ones pass through.
+    stored = service.get_url("avatars/a1/image.jpg")
+    assert service.sign_url(stored) == url
+    assert service.sign_url("https://example.com/x.jpg") == "https://example.com/x.jpg"
+
+    now += 300
+    assert service.client_url("avatars/a1/image.jpg") != url
+
+    s3_settings.setattr(settings, "S3_PRESIGN_URLS", False)
+    assert service.client_url("avatars/a1/image.jpg") == stored
+
+
+def _count(operation: str, outcome: str) -> float:
+    return REGISTRY.get_sample_value(
+        "s3_request_seconds_count", {"operation": operation, "outcome": outcome},
+    ) or 0.0
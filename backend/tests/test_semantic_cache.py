@@ -0,0 +1,118 @@
+import pytest
+
+from app.services.embeddings import Embedder
+from app.services.semantic_cache import SemanticCache
+
+
+def _cache(**kwargs) -> SemanticCache:
+    # Empty model name → hashed n-gram embeddings, no model download.
+    return SemanticCache(embedder=Embedder(model_name=""), allow_hashed=True, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_rephrased_question_hits_and_unrelated_misses():
+    """A near-duplicate question is served from the cache; other questions and languages miss."""
+    cache = _cache(threshold=0.8)
+    probe = await cache.lookup("a1", "prompt", "What are your opening hours?", "en")
+    assert probe.entry is None
+    cache.store(probe, "We open at nine.")
+
+    hit = await cache.lookup("a1", "prompt", "what are your opening hours", "en")
+    assert hit.entry is not None and hit.entry.answer == "We open at nine."
+    assert hit.similarity >= 0.8
+    assert (await cache.lookup("a1", "prompt", "Do you sell gift cards online?", "en")).entry is None
+    assert (await cache.lookup("a1", "prompt", "What are your opening hours?", "fr")).entry is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["avatars"]["a1"]["hit_rate"] == 0.25
+
+
+@pytest.mark.asyncio
+async def test_hashed_embeddings_alone_never_serve_answers():
+    """Lexical similarity can't tell opposite questions apart, so without a model nothing is cached."""
+    cache = SemanticCache(embedder=Embedder(model_name=""), threshold=0.5)
+    assert cache.usable() is False
+    probe = await cache.lookup("a1", "prompt", "What time do you open on Saturday?", "en")
+    assert cache.store(probe, "At nine.") is None
+    assert (await cache.lookup("a1", "prompt", "What time do you close on Saturday?", "en")).entry is None
+    assert cache.stats()["enabled"] is False
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_change_invalidates_avatar_index():
+    """Answers cached under an old system prompt are never served under a new one."""
+    cache = _cache(threshold=0.8)
+    probe = await cache.lookup("a1", "old persona", "Where is the nearest exit?", "en")
+    cache.store(probe, "Behind you.")
+    other = await cache.lookup("a2", "old persona", "Where is the nearest exit?", "en")
+    cache.store(other, "To the left.")
+
+    assert (await cache.lookup("a1", "new persona", "Where is the nearest exit?", "en")).entry is None
+    assert cache.stats()["avatars"]["a1"]["entries"] == 0
+    # A probe taken under the old prompt can't repopulate the new index.
+    assert cache.store(probe, "Behind you.") is None
+    assert (await cache.lookup("a2", "old persona", "Where is the nearest exit?", "en")).entry is not None
+
+
+@pytest.mark.asyncio
+async def test_store_merges_duplicates_and_evicts_least_recently_used():
+    cache = _cache(threshold=0.8, max_entries=2)
+    first = await cache.lookup("a1", None, "How much does parking cost?", "en")
+    dup = await cache.lookup("a1", None, "How much does parking cost", "en")
+    assert cache.store(first, "Five euros.") is cache.store(dup, "Six euros.")
+
+    second = await cache.lookup("a1", None, "Is the museum wheelchair accessible?", "en")
+    cache.store(second, "Yes, fully.")
+    await cache.lookup("a1", None, "How much does parking cost?", "en")  # touch the first
+    third = await cache.lookup("a1", None, "Can I bring my dog inside?", "en")
+    cache.store(third, "Only guide dogs.")
+
+    assert cache.stats()["avatars"]["a1"]["entries"] == 2
+    assert (await cache.lookup("a1", None, "Is the museum wheelchair accessible?", "en")).entry is None
+    assert (await cache.lookup("a1", None, "How much does parking cost?", "en")).entry.answer == "Five euros."
+
+
+@pytest.mark.asyncio
+async def test_turn_replays_cached_answer_and_chunks_without_llm(monkeypatch):
+    """A hit with matching pre-rendered chunks skips the LLM, TTS and animation."""
+    import app.websocket as ws
+    from app.websocket import ConnectionManager
+
+    cache = _cache(threshold=0.8)
+    monkeypatch.setattr(ws, "semantic_cache", cache)
+
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM should not be called on a cache hit")
+
+    monkeypatch.setattr(ws.llm_service, "stream_response", no_llm)
+
+    manager = ConnectionManager()
+    sent = []
+
+    async def capture(session_id, message):
+        sent.append(message)
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(manager, "send_message", capture)
+    monkeypatch.setattr(manager, "_persist_message", noop)
+    monkeypatch.setattr(manager, "_ensure_conversation_title", noop)
+    manager.active_connections["s1"] = object()
+    data = manager.session_data["s1"] = {
+        "messages": [], "avatar_id": "a1", "semantic_cache": True, "language": "en",
+        "avatar_image_key": "avatars/a1/image.jpg", "voice_wav": None, "system_prompt": "kiosk",
+    }
+
+    probe = await cache.lookup("a1", "kiosk", "When does the gallery close?", "en")
+    entry = cache.store(probe, "At six tonight.")
+    cache.attach_chunks(entry, manager._render_key(data), [{"text": "At six tonight.", "video_key": "videos/x/c0.mp4"}])
+
+    await manager._handle_text_input_inner("s1", "when does the gallery close")
+
+    types = [m["type"] for m in sent]
+    assert types == ["message", "video_chunk_start", "video_chunk", "video_chunk_end"]
+    assert sent[0]["cached"] is True
+    assert sent[2]["video_url"].endswith("videos/x/c0.mp4")
+    assert [m["content"] for m in data["messages"]] == ["when does the gallery close", "At six tonight."]
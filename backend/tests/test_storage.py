@@ -0,0 +1,87 @@
+import errno
+import os
+
+import pytest
+
+from app.config import settings
+from app.services import storage
+from app.services.storage import LocalStorageService
+
+
+@pytest.fixture
+def local(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_STORAGE_PATH", str(tmp_path / "uploads"))
+    return LocalStorageService()
+
+
+@pytest.mark.asyncio
+async def test_upload_path_moves_file_into_place_without_copying(local, tmp_path):
+    src = tmp_path / "chunk.mp4"
+    src.write_bytes(b"video")
+    os.chmod(src, 0o600)
+    inode = src.stat().st_ino
+
+    url = await local.upload_path(str(src), "videos/s1/c0.mp4", content_type="video/mp4")
+
+    dest = tmp_path / "uploads" / "videos" / "s1" / "c0.mp4"
+    assert url.endswith("/uploads/videos/s1/c0.mp4")
+    assert not src.exists()
+    assert dest.stat().st_ino == inode  # renamed, not rewritten
+    assert dest.stat().st_mode & 0o777 == 0o644
+    assert await local.download_file("videos/s1/c0.mp4") == b"video"
+
+
+@pytest.mark.asyncio
+async def test_upload_path_keep_source_hardlinks(local, tmp_path):
+    src = tmp_path / "voice.wav"
+    src.write_bytes(b"wav")
+    await local.upload_path(str(src), "voices/v.wav", move=False)
+    dest = tmp_path / "uploads" / "voices" / "v.wav"
+    assert src.exists() and dest.stat().st_ino == src.stat().st_ino
+
+
+@pytest.mark.asyncio
+async def test_upload_path_falls_back_to_copy_across_filesystems(local, tmp_path, monkeypatch):
+    src = tmp_path / "chunk.mp4"
+    src.write_bytes(b"video")
+    real_replace = os.replace
+
+    def cross_device(a, b):
+        if str(a) == str(src):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_replace(a, b)
+
+    monkeypatch.setattr(storage.os, "replace", cross_device)
+    await local.upload_path(str(src), "videos/s1/c1.mp4")
+
+    assert not src.exists()
+    assert (tmp_path / "uploads" / "videos" / "s1" / "c1.mp4").read_bytes() == b"video"
+    assert list((tmp_path / "uploads" / "videos" / "s1").iterdir())[0].name == "c1.mp4"
+
+
+@pytest.mark.asyncio
+async def test_upload_file_and_delete_run_off_loop(local):
+    await local.upload_file(b"abc", "avatars/a/image.jpg")
+    assert await local.download_file("avatars/a/image.jpg") == b"abc"
+    await local.delete_file("avatars/a/image.jpg")
+    with pytest.raises(FileNotFoundError):
+        await local.download_file("avatars/a/image.jpg")
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_writes_chunks_atomically(local, tmp_path):
+    async def chunks():
+        yield b"vid"
+        yield b"eo"
+
+    url = await local.upload_stream(chunks(), "videos/s1/c2.mp4")
+    assert url.endswith("/uploads/videos/s1/c2.mp4")
+    assert await local.download_file("videos/s1/c2.mp4") == b"video"
+
+    async def broken():
+        yield b"partial"
+        raise OSError("stream cut")
+
+    with pytest.raises(OSError):
+        await local.upload_stream(broken(), "videos/s1/c3.mp4")
+    assert [p.name for p in (tmp_path / "uploads" / "videos" / "s1").iterdir()] == ["c2.mp4"]
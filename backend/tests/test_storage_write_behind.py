@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import write_behind as wb
+
+
+class _FlakyS3:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.uploaded = {}
+        self.release = asyncio.Event()
+
+    async def upload_path(self, src_path, key, content_type="application/octet-stream", move=True):
+        await self.release.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("S3 unreachable")
+        with open(src_path, "rb") as f:
+            self.uploaded[key] = f.read()
+        return self.get_url(key)
+
+    def get_url(self, key):
+        return f"https://cdn.example.com/{key}"
+
+    def client_url(self, key):
+        return f"https://cdn.example.com/{key}?signed"
+
+
+@pytest.fixture
+def uploader(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_STORAGE_PATH", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "USE_LOCAL_STORAGE", False)
+    monkeypatch.setattr(settings, "STORAGE_WRITE_BEHIND", True)
+    monkeypatch.setattr(settings, "WRITE_BEHIND_RETRY_BASE_SECS", 0)
+    monkeypatch.setattr(settings, "WRITE_BEHIND_LOCAL_RETENTION_SECS", 0)
+    monkeypatch.setattr(settings, "WRITE_BEHIND_MAX_ATTEMPTS", 3)
+    return wb.WriteBehindUploader()
+
+
+def _chunk(tmp_path, name="c0.mp4"):
+    src = tmp_path / name
+    src.write_bytes(b"video")
+    return str(src)
+
+
+@pytest.mark.asyncio
+async def test_chunk_is_served_locally_until_the_upload_lands(uploader, tmp_path, monkeypatch):
+    s3 = _FlakyS3(failures=1)
+    monkeypatch.setattr(wb, "storage_service", s3)
+    recorded = []
+
+    async def record(urls):
+        recorded.append(urls)
+
+    url = await uploader.upload_path(_chunk(tmp_path), "videos/s1/c0.mp4", content_type="video/mp4")
+    assert url.endswith("/uploads/videos/s1/c0.mp4")  # before any S3 traffic
+    assert uploader.url_for("videos/s1/c0.mp4") == url
+    uploader.after_durable(["videos/s1/c0.mp4"], record)
+
+    s3.release.set()  # first attempt fails, the retry succeeds
+    urls = await uploader.wait_durable(["videos/s1/c0.mp4"])
+    assert urls == {"videos/s1/c0.mp4": "https://cdn.example.com/videos/s1/c0.mp4"}
+    assert s3.uploaded == {"videos/s1/c0.mp4": b"video"}
+
+    # The follow-up and the local-copy cleanup (on a storage worker thread)
+    # run in the background after the upload.
+    local = tmp_path / "uploads" / "videos" / "s1" / "c0.mp4"
+    for _ in range(200):
+        if recorded and not local.exists():
+            break
+        await asyncio.sleep(0.01)
+    assert recorded == [urls]
+    assert not local.exists()
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retries_keep_the_local_copy(uploader, tmp_path, monkeypatch):
+    s3 = _FlakyS3(failures=10)
+    s3.release.set()
+    monkeypatch.setattr(wb, "storage_service", s3)
+
+    url = await uploader.upload_path(_chunk(tmp_path), "videos/s1/c1.mp4")
+    assert await uploader.wait_durable(["videos/s1/c1.mp4"]) == {"videos/s1/c1.mp4": url}
+    assert (tmp_path / "uploads" / "videos" / "s1" / "c1.mp4").read_bytes() == b"video"
+    assert uploader.stats() == {"enabled": True, "pending": 0, "failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_disabled_passes_straight_through(uploader, tmp_path, monkeypatch):
+    s3 = _FlakyS3()
+    s3.release.set()
+    monkeypatch.setattr(wb, "storage_service", s3)
+    monkeypatch.setattr(settings, "STORAGE_WRITE_BEHIND", False)
+
+    url = await uploader.upload_path(_chunk(tmp_path), "videos/s1/c2.mp4")
+    assert url == "https://cdn.example.com/videos/s1/c2.mp4?signed"
+    assert uploader.url_for("videos/s1/c2.mp4") == url
+    assert uploader.stored_url("videos/s1/c2.mp4") == "https://cdn.example.com/videos/s1/c2.mp4"
@@ -0,0 +1,170 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.stt import BatchCollector
+
+
+def _clip(value: float) -> np.ndarray:
+    return np.full(160, value, dtype=np.float32)
+
+
+@pytest.mark.asyncio
+async def test_collector_batches_clips_within_window():
+    """Clips submitted inside one window are decoded by a single runner call."""
+    calls = []
+
+    def runner(clips, language, beam_size):
+        calls.append((len(clips), language, beam_size))
+        return [f"clip-{int(c[0])}" for c in clips]
+
+    collector = BatchCollector(runner, lambda load: 1 if load >= 3 else 5, window_ms=20, max_batch=8)
+    results = await asyncio.gather(*(collector.submit(_clip(i), "en") for i in range(3)))
+
+    assert results == ["clip-0", "clip-1", "clip-2"]
+    assert calls == [(3, "en", 1)]
+
+
+@pytest.mark.asyncio
+async def test_collector_groups_by_language():
+    """A Whisper batch shares one decoder prompt, so languages never mix."""
+    calls = []
+
+    def runner(clips, language, beam_size):
+        calls.append((len(clips), language))
+        return [language for _ in clips]
+
+    collector = BatchCollector(runner, lambda load: 5, window_ms=20, max_batch=8)
+    results = await asyncio.gather(
+        collector.submit(_clip(0), "en"),
+        collector.submit(_clip(1), "fr"),
+        collector.submit(_clip(2), "en"),
+    )
+
+    assert results == ["en", "fr", "en"]
+    assert sorted(calls) == [(1, "fr"), (2, "en")]
+
+
+@pytest.mark.asyncio
+async def test_collector_flushes_early_when_batch_is_full():
+    calls = []
+
+    def runner(clips, language, beam_size):
+        calls.append(len(clips))
+        return ["" for _ in clips]
+
+    # Window far longer than the test — only the size cap can trigger flushes.
+    collector = BatchCollector(runner, lambda load: 5, window_ms=60_000, max_batch=2)
+    await asyncio.wait_for(
+        asyncio.gather(*(collector.submit(_clip(i), "en") for i in range(4))),
+        timeout=2,
+    )
+    assert calls == [2, 2]
+
+
+@pytest.mark.asyncio
+async def test_collector_propagates_runner_errors():
+    def runner(clips, language, beam_size):
+        raise RuntimeError("decoder crashed")
+
+    collector = BatchCollector(runner, lambda load: 5, window_ms=5, max_batch=4)
+    with pytest.raises(RuntimeError, match="decoder crashed"):
+        await collector.submit(_clip(0), "en")
+
+
+def _encode(samples: np.ndarray, sample_rate: int, fmt: str, codec: str) -> bytes:
+    """Encode a mono float clip in-memory with PyAV (stand-in for MediaRecorder output)."""
+    import io
+
+    import av
+
+    buf = io.BytesIO()
+    with av.open(buf, mode="w", format=fmt) as container:
+        stream = container.add_stream(codec, rate=48000 if codec == "libopus" else sample_rate)
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="flt", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
+
+
+def test_load_audio_decodes_wav_to_16k_mono():
+    import io
+
+    import soundfile as sf
+
+    from app.services.stt import STTService
+
+    sr = 44100
+    stereo = np.stack([np.sin(np.arange(sr) / 10), np.zeros(sr)], axis=1).astype(np.float32)
+    buf = io.BytesIO()
+    sf.write(buf, stereo, sr, format="WAV")
+
+    audio = STTService()._load_audio(buf.getvalue())
+
+    assert audio.dtype == np.float32
+    assert audio.ndim == 1
+    assert abs(len(audio) - 16000) <= 1
+
+
+def test_load_audio_decodes_webm_opus_in_memory():
+    from app.services.stt import STTService
+
+    sr = 48000
+    tone = (0.3 * np.sin(2 * np.pi * 440 * np.arange(sr) / sr)).astype(np.float32)
+    webm = _encode(tone, sr, "webm", "libopus")
+
+    audio = STTService()._load_audio(webm)
+
+    assert audio.dtype == np.float32
+    # One second at 16 kHz, give or take codec priming/padding.
+    assert 15000 <= len(audio) <= 17000
+    assert np.abs(audio).max() > 0.1
+
+
+@pytest.mark.asyncio
+async def test_collector_keeps_greedy_clips_out_of_beam_batches():
+    """Latency-profile clips decode greedily even alongside beam-search clips."""
+    calls = []
+
+    def runner(clips, language, beam_size):
+        calls.append((len(clips), beam_size))
+        return ["" for _ in clips]
+
+    collector = BatchCollector(runner, lambda load: 5, window_ms=20, max_batch=8)
+    await asyncio.gather(
+        collector.submit(_clip(0), "en"),
+        collector.submit(_clip(1), "en", greedy=True),
+        collector.submit(_clip(2), "en"),
+    )
+    assert sorted(calls) == [(1, 1), (2, 5)]
+
+
+def test_profile_resolution(monkeypatch):
+    """Session override wins; auto flips to latency under load; only short clips get the fast tier."""
+    from app.config import settings
+    from app.services.stt import STTService
+
+    monkeypatch.setattr(settings, "STT_PROFILE", "auto")
+    monkeypatch.setattr(settings, "STT_DECODE_POLICY", "beam")
+    monkeypatch.setattr(settings, "STT_GREEDY_LOAD_THRESHOLD", 4)
+    monkeypatch.setattr(settings, "WHISPER_FAST_MODEL", "base")
+    monkeypatch.setattr(settings, "STT_SHORT_CLIP_SECS", 6.0)
+    svc = STTService()
+    svc.model_name = "large-v3-turbo"
+
+    quiet = svc._resolve_profile(None, duration=3.0, load=1)
+    assert (quiet.name, quiet.beam_size, quiet.vad_silence_ms) == ("accuracy", 5, 500)
+
+    busy = svc._resolve_profile(None, duration=3.0, load=4)
+    assert (busy.name, busy.beam_size, busy.use_fast_model) == ("latency", 1, True)
+    assert busy.vad_silence_ms == settings.STT_LATENCY_VAD_SILENCE_MS
+
+    long_clip = svc._resolve_profile("latency", duration=20.0, load=1)
+    assert long_clip.name == "latency" and not long_clip.use_fast_model
+
+    pinned = svc._resolve_profile("accuracy", duration=3.0, load=10)
+    assert pinned.name == "accuracy"
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import Message
+from app.services import summaries
+
+
+@pytest.mark.asyncio
+async def test_transcript_tail_reads_only_newest_turns_within_budget(db_session):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    db_session.add_all(
+        Message(
+            session_id="sum-s1",
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"turn {i:02d}",
+            created_at=start + timedelta(seconds=i),
+        )
+        for i in range(10)
+    )
+    await db_session.commit()
+
+    # 19 + 14 chars (with newlines) fit; the next line would overflow.
+    lines, truncated = await summaries.fetch_transcript_tail(db_session, "sum-s1", max_chars=45)
+    assert lines == ["User: turn 08", "Assistant: turn 09"] and truncated
+
+    everything, truncated = await summaries.fetch_transcript_tail(db_session, "sum-s1", max_chars=10_000)
+    assert len(everything) == 10 and everything[0] == "User: turn 00" and not truncated
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_coalesce_onto_one_local_job(monkeypatch):
+    """Without Redis, repeat requests join the in-process job instead of re-running it."""
+    calls = []
+    release = asyncio.Event()
+
+    async def fake_summarize(conversation_id, session_factory=None):
+        calls.append(conversation_id)
+        await release.wait()
+        return "short summary"
+
+    monkeypatch.setattr(summaries.cache_service, "redis", None)
+    monkeypatch.setattr(summaries, "summarize_conversation", fake_summarize)
+
+    first = await summaries.enqueue_summary("conv-1")
+    second = await summaries.enqueue_summary("conv-1")
+    assert second.job_id == first.job_id and second.coalesced
+    await asyncio.sleep(0)
+    assert summaries.job_status(first.job_id) == "running"
+
+    release.set()
+    await summaries._local_tasks[first.job_id]
+    assert calls == ["conv-1"]
+    assert summaries.job_status(first.job_id) == "done"
+    # Once finished, a new request starts a fresh job.
+    third = await summaries.enqueue_summary("conv-1")
+    assert third.job_id != first.job_id and not third.coalesced
+    await summaries._local_tasks[third.job_id]
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def delete(self, key):
+        self.store.pop(key, None)
+
+
+@pytest.mark.asyncio
+async def test_redis_claim_dispatches_one_celery_task(monkeypatch):
+    from app.celery_app import celery_app
+
+    sent = []
+    monkeypatch.setattr(summaries.cache_service, "redis", _FakeRedis())
+    monkeypatch.setattr(celery_app, "send_task", lambda name, args, task_id, retry: sent.append((name, args, task_id)))
+    monkeypatch.setattr(summaries, "job_status", lambda job_id: "running")
+
+    first = await summaries.enqueue_summary("conv-2")
+    second = await summaries.enqueue_summary("conv-2")
+    assert sent == [("summarize_conversation", ["conv-2"], first.job_id)]
+    assert (second.job_id, second.status, second.coalesced) == (first.job_id, "running", True)
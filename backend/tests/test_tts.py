@@ -0,0 +1,187 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.executors import InstrumentedExecutor
+from app.services.tts import TTSEngine, TTSService
+
+
+class StandInEngine(TTSEngine):
+    """Local engine with controllable latency — writes its own name as 'audio'."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False, clones: bool = False):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.clones = clones
+
+    async def _synthesize(self, text, output_path, speaker_wav, language) -> bool:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} exploded")
+        Path(output_path).write_bytes(self.name.encode())
+        return self.clones and bool(speaker_wav)
+
+
+class ThreadEngine(TTSEngine):
+    """Renders on a worker thread, like Chatterbox — cancellation can't stop the write."""
+
+    def __init__(self, name: str, pool: InstrumentedExecutor, delay: float):
+        super().__init__()
+        self.name = name
+        self.pool = pool
+        self.delay = delay
+
+    def _render(self, output_path):
+        time.sleep(self.delay)
+        Path(output_path).write_bytes(self.name.encode())
+
+    async def _synthesize(self, text, output_path, speaker_wav, language) -> bool:
+        await self._offload(self.pool, (output_path,), self._render, output_path)
+        return False
+
+
+class LoadingEngine(StandInEngine):
+    """Has a model to load first, like Chatterbox."""
+
+    def __init__(self, name: str, load_secs: float):
+        super().__init__(name)
+        self.load_secs = load_secs
+        self.loads = 0
+        self.loaded = False
+        self._load_task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded
+
+    def start_loading(self) -> None:
+        if self._load_task is None:
+            self.loads += 1
+            self._load_task = asyncio.create_task(self._load())
+
+    async def _load(self):
+        await asyncio.sleep(self.load_secs)
+        self.loaded = True
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_wins_without_hedge(tmp_path):
+    """A primary that beats the deadline is used and the secondary never starts."""
+    primary = StandInEngine("primary", delay=0.01, clones=True)
+    secondary = StandInEngine("secondary")
+    svc = TTSService(primary=primary, secondary=secondary, hedge_deadline=0.5)
+
+    out = tmp_path / "out.wav"
+    result = await svc.synthesize("hello", str(out), speaker_wav="ref.wav")
+
+    assert result.engine == "primary"
+    assert result.fallback is False
+    assert result.hedged is False
+    assert result.voice_cloned is True
+    assert out.read_bytes() == b"primary"
+    assert secondary.stats.calls == 0
+    assert primary.stats.ewma_secs is not None
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_loses_race_to_secondary(tmp_path):
+    """Past the deadline the secondary starts in parallel and the first result wins."""
+    primary = StandInEngine("primary", delay=1.0, clones=True)
+    secondary = StandInEngine("secondary", delay=0.01)
+    svc = TTSService(primary=primary, secondary=secondary, hedge_deadline=0.05)
+
+    out = tmp_path / "out.wav"
+    result = await svc.synthesize("hello", str(out), speaker_wav="ref.wav")
+
+    assert result.engine == "secondary"
+    assert result.fallback is True
+    assert result.hedged is True
+    assert result.voice_cloned is False
+    assert out.read_bytes() == b"secondary"
+    assert primary.stats.cancelled == 1
+    # Scratch files for both engines are cleaned up.
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.wav"]
+
+
+@pytest.mark.asyncio
+async def test_primary_still_wins_after_hedge_if_first(tmp_path):
+    """Hedging doesn't mean the secondary wins — whichever finishes first does."""
+    primary = StandInEngine("primary", delay=0.1)
+    secondary = StandInEngine("secondary", delay=1.0)
+    svc = TTSService(primary=primary, secondary=secondary, hedge_deadline=0.02)
+
+    out = tmp_path / "out.wav"
+    result = await svc.synthesize("hello", str(out))
+
+    assert result.engine == "primary"
+    assert result.fallback is False
+    assert result.hedged is True
+    assert out.read_bytes() == b"primary"
+    assert secondary.stats.cancelled == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_before_deadline(tmp_path):
+    primary = StandInEngine("primary", fail=True)
+    secondary = StandInEngine("secondary", delay=0.01)
+    svc = TTSService(primary=primary, secondary=secondary, hedge_deadline=5.0)
+
+    result = await svc.synthesize("hello", str(tmp_path / "out.wav"))
+
+    assert result.engine == "secondary"
+    assert result.fallback is True
+    assert result.hedged is False
+    assert primary.stats.failures == 1
+
+
+@pytest.mark.asyncio
+async def test_all_engines_failing_raises(tmp_path):
+    svc = TTSService(
+        primary=StandInEngine("primary", fail=True),
+        secondary=StandInEngine("secondary", fail=True),
+        hedge_deadline=0.05,
+    )
+    with pytest.raises(RuntimeError, match="All TTS engines failed"):
+        await svc.synthesize("hello", str(tmp_path / "out.wav"))
+
+
+@pytest.mark.asyncio
+async def test_cancelled_thread_backed_loser_removes_its_late_scratch_file(tmp_path):
+    """The loser's thread writes after the race is over; its file is still cleaned up."""
+    pool = InstrumentedExecutor("test-tts-scratch", max_workers=2)
+    try:
+        svc = TTSService(
+            primary=ThreadEngine("primary", pool, delay=0.3),
+            secondary=StandInEngine("secondary", delay=0.01),
+            hedge_deadline=0.05,
+        )
+        out = tmp_path / "out.wav"
+        result = await svc.synthesize("hello", str(out))
+        assert result.engine == "secondary"
+
+        await asyncio.sleep(0.5)  # the primary's thread finishes and writes
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["out.wav"]
+        assert out.read_bytes() == b"secondary"
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_loading_primary_is_skipped_not_raced(tmp_path):
+    """Turns use the secondary while the model loads once in the background, then the primary."""
+    primary = LoadingEngine("primary", load_secs=0.2)
+    secondary = StandInEngine("secondary", delay=0.01)
+    svc = TTSService(primary=primary, secondary=secondary, hedge_deadline=0.05)
+
+    for i in range(3):
+        result = await svc.synthesize("hello", str(tmp_path / f"out{i}.wav"))
+        assert result.engine == "secondary" and result.fallback is True
+    assert primary.loads == 1 and primary.stats.calls == 0
+
+    await asyncio.sleep(0.3)
+    result = await svc.synthesize("hello", str(tmp_path / "ready.wav"))
+    assert result.engine == "primary" and primary.loads == 1
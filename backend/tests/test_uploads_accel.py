@@ -0,0 +1,23 @@
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.api import uploads
+
+
+@pytest.mark.asyncio
+async def test_authorized_keys_are_handed_to_nginx():
+    app = FastAPI()
+    app.include_router(uploads.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/uploads/videos/s1/1700000000000_c0.mp4")
+        assert resp.status_code == 200 and resp.content == b""
+        assert resp.headers["x-accel-redirect"] == "/_uploads/videos/s1/1700000000000_c0.mp4"
+        assert "max-age" in resp.headers["cache-control"]
+
+        head = await ac.head("/uploads/avatars/a 1/image.jpg")
+        assert head.headers["x-accel-redirect"] == "/_uploads/avatars/a%201/image.jpg"
+
+        for path in ("/uploads/voices/x.wav", "/uploads/videos", "/uploads/videos/%2E%2E/secret", "/uploads/videos//x"):
+            resp = await ac.get(path)
+            assert resp.status_code == 404 and "x-accel-redirect" not in resp.headers, path
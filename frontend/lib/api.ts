@@ -235,7 +235,15 @@ export const api = {
 
   summarizeConversation: async (conversationId: string) => {
     const response = await apiClient.post(`/api/v1/conversations/${conversationId}/summarize`)
-    return response.data
+    let job = response.data
+    // Summaries run as a background job — poll until it settles.
+    for (let i = 0; i < 60 && (job.status === 'queued' || job.status === 'running'); i++) {
+      await new Promise(resolve => setTimeout(resolve, 1000))
+      const poll = await apiClient.get(`/api/v1/conversations/${conversationId}/summarize/${job.job_id}`)
+      job = poll.data
+    }
+    if (job.status !== 'done') throw new Error(`Summary job ${job.status}`)
+    return job
   },
 
   deleteConversation: async (conversationId: string) => {